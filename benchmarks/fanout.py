@@ -0,0 +1,176 @@
+"""Масштабирование NotificationService на синтетических пользователях и проектах.
+
+Для каждого числа пользователей строится индекс подписчиков, затем поток
+проектов прогоняется через подбор получателей (p50/p99 на проект), полный
+handle_project (подбор, рендер, постановка в очередь — projects/s) и доставку
+фейковым ботом (sends/s). Результат — JSON со значениями параметров и коммитом;
+--output сохраняет его в файл, --compare сравнивает с сохранённым прогоном.
+
+Запуск: python -m benchmarks.fanout [--users 10000 100000] [--projects 300] [--output result.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from src.models import Project
+from src.notifications import NotificationService, DeliveryScheduler
+
+from .synthetic import KeywordSampler, MemoryRedis, make_project_stream, make_users, make_vocabulary
+
+
+class FakeBot:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+
+
+class FakeDatabase:
+    USERS_CHANNEL = 'users_updates'
+
+    def __init__(self, users):
+        self.users = users
+
+    async def get_users(self):
+        return self.users
+
+    async def iter_users(self, channel=None, batch_size=1000):
+        for start in range(0, len(self.users), batch_size):
+            yield self.users[start:start + batch_size]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run_case(users, projects, args):
+    bot = FakeBot(args.send_latency)
+    service = NotificationService(MemoryRedis(), FakeDatabase(users), None, bot)
+    # Ограничения Telegram в бенчмарке не нужны: меряем собственную пропускную способность
+    service.scheduler = DeliveryScheduler(bot, workers=args.workers, rate=10 ** 9, per_chat_interval=0)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        await service.load_index()
+    load_time = time.perf_counter() - started
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    match_latencies = []
+    recipients = []
+    for channel, data in projects:
+        project = Project.decode(data, channel)
+        started = time.perf_counter()
+        matched = service.index.recipients(channel, project.text)
+        match_latencies.append(time.perf_counter() - started)
+        recipients.append(len(matched))
+
+    started = time.perf_counter()
+    for channel, data in projects:
+        await service.handle_project(None, channel, data)
+    handle_time = time.perf_counter() - started
+
+    queued = service.scheduler.qsize()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        service.scheduler.start()
+        await service.scheduler.queue.join()
+        await service.scheduler.stop()
+    drain_time = time.perf_counter() - started
+
+    return {
+        'users': len(users),
+        'projects': len(projects),
+        'index_load_s': round(load_time, 3),
+        'index_mb': round(index_bytes / 2 ** 20, 1),
+        'match_p50_ms': round(percentile(match_latencies, 0.5) * 1000, 3),
+        'match_p99_ms': round(percentile(match_latencies, 0.99) * 1000, 3),
+        'recipients_avg': round(statistics.mean(recipients), 1),
+        'projects_per_s': round(len(projects) / handle_time, 1),
+        'sends': bot.sent,
+        'sends_per_s': round(queued / drain_time, 1) if drain_time else None,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {case['users']: case for case in json.load(f)['results']}
+    for case in results:
+        base = baseline.get(case['users'])
+        if not base:
+            continue
+        deltas = {
+            key: f'{(case[key] - base[key]) / base[key] * 100:+.1f}%'
+            for key in ('match_p50_ms', 'match_p99_ms', 'projects_per_s', 'sends_per_s', 'index_mb')
+            if base.get(key) and case.get(key) is not None
+        }
+        print(json.dumps({'users': case['users'], 'vs': baseline_path, **deltas}, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--projects', type=int, default=300)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf-показатель популярности ключевых слов (больше — сильнее пересечение)')
+    parser.add_argument('--min-keywords', type=int, default=1)
+    parser.add_argument('--max-keywords', type=int, default=5)
+    parser.add_argument('--catch-all', type=float, default=0.05, help='доля пользователей без ключевых слов')
+    parser.add_argument('--platform-mix', type=float, nargs=3, default=[0.8, 0.6, 0.4], metavar=('KWORK', 'FL', 'FREELANCER'))
+    parser.add_argument('--hit-rate', type=float, default=0.03, help='доля слов описания из словаря ключевых слов')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--send-latency', type=float, default=0.0, help='задержка фейкового send_message, с')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sampler = KeywordSampler(make_vocabulary(args.vocabulary, rng), args.skew, rng)
+    projects = make_project_stream(args.projects, sampler, rng, hit_rate=args.hit_rate)
+
+    results = []
+    for users_count in args.users:
+        users = make_users(
+            users_count, sampler, rng,
+            min_keywords=args.min_keywords,
+            max_keywords=args.max_keywords,
+            catch_all=args.catch_all,
+            platform_mix=args.platform_mix
+        )
+        case = asyncio.run(run_case(users, projects, args))
+        print(json.dumps(case))
+        results.append(case)
+
+    report = {'benchmark': 'fanout', 'commit': git_commit(), 'params': vars(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Стоимость подготовки уведомлений для одного проекта: рендер на каждого получателя против рендера один раз.
+
+Запуск: python -m benchmarks.fanout_rendering [--recipients 1000 10000]
+Redis не нужен: кэш рендера подменяется словарём в памяти.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from src.models import Project
+from src.notifications.message_renderer import MessageRenderer
+
+from .keyword_matching import make_payload, make_vocabulary
+from .synthetic import MemoryRedis
+
+
+def per_recipient(data, channel, recipients):
+    # Прежнее поведение: разбор, рендер и клавиатура заново для каждого получателя
+    for _ in range(recipients):
+        project = Project.decode(data, channel)
+        MessageRenderer.build(project.id, channel, *MessageRenderer.render_text(project, channel))
+
+
+async def render_once(renderer, data, channel, recipients):
+    prepared = await renderer.prepare(channel, Project.decode(data, channel))
+    for _ in range(recipients):
+        prepared.text, prepared.keyboard
+
+
+def bench(recipients, seed):
+    rng = random.Random(seed)
+    data = make_payload(make_vocabulary(500, rng), rng)
+    channel = 'kwork_projects'
+
+    started = time.perf_counter()
+    per_recipient(data, channel, recipients)
+    per_recipient_time = time.perf_counter() - started
+
+    renderer = MessageRenderer(MemoryRedis())
+    started = time.perf_counter()
+    asyncio.run(render_once(renderer, data, channel, recipients))
+    render_once_time = time.perf_counter() - started
+
+    return {
+        'recipients': recipients,
+        'per_recipient_ms': round(per_recipient_time * 1000, 2),
+        'render_once_ms': round(render_once_time * 1000, 2),
+        'json_decodes_saved': recipients - 1
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipients', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for recipients in args.recipients:
+        print(json.dumps(bench(recipients, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Память и CPU сбора проектов: процесс на парсер против одного asyncio-рантайма.
+
+Каждый режим запускается в дочернем процессе на --seconds секунд; раз в секунду
+снимается суммарный RSS всего дерева процессов (включая Chrome и пул разбора),
+в конце — суммарное процессорное время. Большую часть окна парсеры простаивают
+между опросами, поэтому cpu_percent близок к стоимости простоя.
+
+Запуск: python -m benchmarks.ingestion_footprint [--seconds 120] [--interval 60]
+Нужны Redis, Chrome/chromedriver и доступ к источникам из .env.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+import psutil
+
+
+def run_child(mode, interval):
+    from src import REDIS_CLIENT, REDIS_CLIENT_ASYNCIO
+    from src import ApplicationParser, IngestionRuntime
+
+    if mode == 'asyncio':
+        runtime = IngestionRuntime(REDIS_CLIENT, REDIS_CLIENT_ASYNCIO, interval=interval)
+        asyncio.run(runtime.run())
+    else:
+        ApplicationParser(REDIS_CLIENT).run_parsers()
+
+
+def tree(proc):
+    try:
+        return [proc] + proc.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def measure(mode, seconds, interval):
+    child = subprocess.Popen([sys.executable, '-m', 'benchmarks.ingestion_footprint', '--child', mode, '--interval', str(interval)])
+    root = psutil.Process(child.pid)
+    cpu_seconds = {}
+    rss_samples = []
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < seconds and child.poll() is None:
+            rss = 0
+            for proc in tree(root):
+                try:
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+                    cpu_seconds[proc.pid] = times.user + times.system
+                except psutil.NoSuchProcess:
+                    continue
+            rss_samples.append(rss / 2 ** 20)
+            time.sleep(1)
+    finally:
+        for proc in reversed(tree(root)):
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+        child.wait()
+
+    elapsed = time.monotonic() - started
+    return {
+        'mode': mode,
+        'seconds': round(elapsed, 1),
+        'processes_seen': len(cpu_seconds),
+        'rss_avg_mb': round(sum(rss_samples) / max(len(rss_samples), 1), 1),
+        'rss_peak_mb': round(max(rss_samples, default=0), 1),
+        'cpu_seconds': round(sum(cpu_seconds.values()), 2),
+        'cpu_percent': round(100 * sum(cpu_seconds.values()) / elapsed, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=int, default=120)
+    parser.add_argument('--interval', type=int, default=60, help='интервал опроса источников в режиме asyncio')
+    parser.add_argument('--child', choices=('processes', 'asyncio'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.interval)
+        return
+
+    for mode in ('processes', 'asyncio'):
+        print(json.dumps(measure(mode, args.seconds, args.interval)))
+
+
+if __name__ == '__main__':
+    main()
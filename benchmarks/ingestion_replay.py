@@ -0,0 +1,279 @@
+"""Запись и воспроизведение ответов площадок для офлайн-замеров сбора проектов.
+
+record — сохраняет сырые ответы в каталог фикстур:
+  fl/rss-<время>.xml, kwork/page-<n>.html, freelancer/projects-<время>.json
+replay — прогоняет фикстуры через боевые методы парсеров (fl_parser_run,
+kwork_parser_run, freelancer_parser_run), подменив только сетевой слой, на
+локальном Redis и печатает время и пиковые аллокации по этапам (extract →
+filter → dedup → publish) и за весь повтор.
+Курсоры, SeenStore и поток проектов при воспроизведении живут под префиксом
+replay и очищаются перед каждым повтором, боевые ключи не затрагиваются.
+
+Запуск:
+  python -m benchmarks.ingestion_replay record [--sources fl kwork freelancer] [--kwork-pages 3]
+  python -m benchmarks.ingestion_replay replay [--repeat 20]
+Нужен Redis из .env; для записи Kwork — Chrome/chromedriver.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+from dotenv import load_dotenv
+
+from src import REDIS_CLIENT
+from src.parsers import FlParser, KworkParser, FreelancerParser
+from src.parsers.ingestion_cursor import IngestionCursor
+from src.metrics import METRICS
+from src.parsers.seen_store import SeenStore
+
+
+SOURCES = ('fl', 'kwork', 'freelancer')
+PARSERS = {'fl': FlParser, 'kwork': KworkParser, 'freelancer': FreelancerParser}
+REPLAY_STREAM = 'replay:projects'
+# Окно, при котором курсор считает новыми все проекты из старых записей
+REPLAY_WINDOW = 10 * 365 * 86400
+
+
+def fixture_dir(root, source):
+    path = os.path.join(root, source)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_fixture(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+    print(f'Записано {len(content)} байт в {path}')
+
+
+def record(args):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    for source in args.sources:
+        parser = PARSERS[source](REDIS_CLIENT, start=False)
+        try:
+            if source == 'fl':
+                content = parser.fetch_rss_feed()
+                if content:
+                    write_fixture(os.path.join(fixture_dir(args.fixtures, 'fl'), f'rss-{stamp}.xml'), content)
+            elif source == 'kwork':
+                for page in range(1, args.kwork_pages + 1):
+                    html = parser.fetch_page_html(page)
+                    write_fixture(os.path.join(fixture_dir(args.fixtures, 'kwork'), f'page-{page}.html'), html.encode('utf-8'))
+            else:
+                data = parser.client.fetch_since(time.time() - args.freelancer_window)
+                if data:
+                    content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                    write_fixture(os.path.join(fixture_dir(args.fixtures, 'freelancer'), f'projects-{stamp}.json'), content)
+        finally:
+            close = getattr(parser, 'close', None)
+            if close:
+                close()
+
+
+def load_fixtures(root, source):
+    pattern = {'fl': '*.xml', 'kwork': 'page-*.html', 'freelancer': '*.json'}[source]
+    paths = sorted(glob.glob(os.path.join(root, source, pattern)))
+    fixtures = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            fixtures.append(f.read())
+    return fixtures
+
+
+def reset_replay_state(redis_client, source):
+    keys = list(redis_client.scan_iter(f'cursor:replay:{source}'))
+    keys += list(redis_client.scan_iter(f'seen:replay:{source}:*'))
+    if keys:
+        redis_client.delete(*keys)
+
+
+class StageTimer:
+    """Время и пиковые аллокации по этапам; этап, вызванный несколько раз за повтор, суммируется.
+    total — весь повтор целиком, включая код парсера между этапами"""
+
+    def __init__(self, allocations: bool):
+        self.allocations = allocations
+        self.seconds = {}
+        self.peak_bytes = {}
+        self._current = {}
+
+    @contextmanager
+    def run(self):
+        self._current = {}
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current['total'] = time.perf_counter() - started
+            for name, elapsed in self._current.items():
+                self.seconds.setdefault(name, []).append(elapsed)
+
+    @contextmanager
+    def stage(self, name):
+        if self.allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - started
+            if self.allocations:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+
+
+class Replay:
+    """Прогон фикстур через боевые методы парсера.
+
+    Подменяется только сетевой слой (fetch_rss_feed, fetch_page_html/fetch_pages_html,
+    client.fetch_since) — разбор, фильтрация по курсору, SeenStore и публикация
+    идут кодом парсера. Его методы оборачиваются замером, и этапы считаются
+    по тем вызовам, которые сделал сам парсер.
+    """
+
+    def __init__(self, parser, source, fixtures):
+        self.parser = parser
+        self.source = source
+        self.fixtures = fixtures
+        self.timer = None
+        self._feed = iter(())
+
+        # Только в отдельный поток: в режиме pubsub проекты ушли бы живым подписчикам
+        parser.publisher.transport = 'streams'
+        parser.publisher.stream = REPLAY_STREAM
+        parser.publisher.maxlen = 1000
+        parser.publisher.archive = None
+
+        if source == 'fl':
+            parser.fetch_rss_feed = lambda: next(self._feed)
+            self.instrument(parser, 'parse_rss', 'extract')
+            self.instrument(parser, 'filter_new_items', 'filter')
+        elif source == 'kwork':
+            pages = [html.decode('utf-8') for html in fixtures]
+            parser.crawl_max_pages = len(pages)
+            parser.fetch_page_html = lambda page=1: pages[page - 1]
+            parser.fetch_pages_html = lambda numbers: [pages[page - 1] for page in numbers]
+            self.instrument(parser, 'extract_projects_from_json', 'extract')
+            self.instrument(parser, 'filter_new_projects', 'filter')
+        else:
+            parser.client.fetch_since = self.fetch_freelancer
+            self.instrument(parser, 'filter_new_projects', 'filter')
+        self.instrument(parser.publisher, 'publish_many', 'publish')
+
+    def instrument(self, obj, name, stage):
+        method = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            with self.timer.stage(stage):
+                return method(*args, **kwargs)
+
+        setattr(obj, name, timed)
+
+    def fetch_freelancer(self, since):
+        # Ответ SDK — уже разобранный JSON, поэтому разбор фикстуры и есть extract
+        with self.timer.stage('extract'):
+            return json.loads(next(self._feed))
+
+    def poll(self):
+        """Один цикл сбора боевым методом парсера; возвращает число новых проектов"""
+        if self.source == 'fl':
+            return self.parser.fl_parser_run()
+        if self.source == 'kwork':
+            return self.parser.kwork_parser_run()
+        return self.parser.freelancer_parser_run()
+
+    def once(self, timer):
+        """Повтор с чистыми курсором и SeenStore: RSS и ответы Freelancer — по опросу на фикстуру,
+        страницы Kwork — один обход"""
+        parser = self.parser
+        reset_replay_state(parser.redis_client, self.source)
+        parser.cursor = IngestionCursor(parser.redis_client, f'replay:{self.source}', initial_window=REPLAY_WINDOW)
+        parser.seen = SeenStore(parser.redis_client, f'replay:{self.source}')
+        self.instrument(parser.seen, 'filter_new', 'dedup')
+        self.instrument(parser.seen, 'mark', 'publish')
+        self.instrument(parser.cursor, 'advance', 'publish')
+
+        self.timer = timer
+        polls = 1 if self.source == 'kwork' else len(self.fixtures)
+        self._feed = iter(self.fixtures)
+        fetched = counter('items_fetched_total', self.source)
+        new = 0
+        with timer.run():
+            for _ in range(polls):
+                new += self.poll()
+        return counter('items_fetched_total', self.source) - fetched, new
+
+
+def counter(name, source):
+    return METRICS.snapshot()['counters'].get(name, {}).get(METRICS.labels_key({'source': source}), 0)
+
+
+def replay(args):
+    for source in args.sources:
+        fixtures = load_fixtures(args.fixtures, source)
+        if not fixtures:
+            print(json.dumps({'source': source, 'error': 'нет фикстур'}, ensure_ascii=False))
+            continue
+
+        parser = PARSERS[source](REDIS_CLIENT, start=False)
+        try:
+            harness = Replay(parser, source, fixtures)
+            # Вывод парсера — в stderr, чтобы в stdout остались только строки JSON
+            with redirect_stdout(sys.stderr):
+                timer = StageTimer(allocations=False)
+                for _ in range(args.repeat):
+                    items, new = harness.once(timer)
+
+                tracemalloc.start()
+                allocations = StageTimer(allocations=True)
+                harness.once(allocations)
+                tracemalloc.stop()
+        finally:
+            close = getattr(parser, 'close', None)
+            if close:
+                close()
+
+        print(json.dumps({
+            'source': source,
+            'fixtures': len(fixtures),
+            'bytes': sum(len(f) for f in fixtures),
+            'items': items,
+            'new': new,
+            'repeat': args.repeat,
+            'stages': {
+                name: {
+                    'p50_ms': round(statistics.median(seconds) * 1000, 3),
+                    'max_ms': round(max(seconds) * 1000, 3),
+                    **({'peak_alloc_kb': round(allocations.peak_bytes[name] / 1024, 1)} if name in allocations.peak_bytes else {})
+                }
+                for name, seconds in timer.seconds.items()
+            }
+        }, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=('record', 'replay'))
+    parser.add_argument('--fixtures', default=os.path.join('benchmarks', 'fixtures'))
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, default=list(SOURCES))
+    parser.add_argument('--kwork-pages', type=int, default=3)
+    parser.add_argument('--freelancer-window', type=int, default=3600, help='за сколько секунд записывать проекты Freelancer')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.mode == 'record':
+        record(args)
+    else:
+        replay(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Сравнение построчной проверки ключевых слов с автоматом Ахо-Корасик.
+
+Запуск: python -m benchmarks.keyword_matching [--users 10000 100000]
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from src.notifications.keyword_matcher import KeywordMatcher
+
+
+def make_vocabulary(size, rng):
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(size)]
+
+
+def make_users(count, vocabulary, rng, max_keywords=5):
+    users = []
+    for i in range(count):
+        keywords = ', '.join(rng.sample(vocabulary, rng.randint(0, max_keywords)))
+        users.append((str(100000000 + i), keywords))
+    return users
+
+
+def make_payload(vocabulary, rng, words=120):
+    description = ' '.join(rng.choice(vocabulary) if rng.random() < 0.05 else 'lorem' for _ in range(words))
+    return json.dumps({
+        'id': rng.randint(1, 10 ** 7),
+        'title': 'Нужен разработчик',
+        'description': description,
+        'url': 'https://example.com/projects/1',
+        'budget': {'minimum': 1000, 'maximum': 5000, 'currency': '₽'}
+    })
+
+
+def naive_match(users, data):
+    eligible = []
+    for chat_id, keywords in users:
+        msg_text = data.lower()
+        if keywords and keywords.strip():
+            keyword_list = [kw.strip().lower() for kw in keywords.split(',') if kw.strip()]
+            if any(kw in msg_text for kw in keyword_list):
+                eligible.append(chat_id)
+        else:
+            eligible.append(chat_id)
+    return eligible
+
+
+def bench(users_count, projects, vocabulary_size, seed):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    users = make_users(users_count, vocabulary, rng)
+    payloads = [make_payload(vocabulary, rng) for _ in range(projects)]
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher()
+    matcher.load(users)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive = [naive_match(users, data) for data in payloads]
+    naive_time = (time.perf_counter() - started) / projects
+
+    started = time.perf_counter()
+    compiled = [matcher.match(data) for data in payloads]
+    compiled_time = (time.perf_counter() - started) / projects
+
+    assert all(set(a) == b for a, b in zip(naive, compiled)), 'результаты сопоставления расходятся'
+
+    started = time.perf_counter()
+    for chat_id, _ in users[:1000]:
+        matcher.set_user(chat_id, ', '.join(rng.sample(vocabulary, 3)))
+    matcher.match(payloads[0])
+    update_time = time.perf_counter() - started
+
+    return {
+        'users': users_count,
+        'build_s': round(build_time, 4),
+        'naive_ms_per_project': round(naive_time * 1000, 3),
+        'automaton_ms_per_project': round(compiled_time * 1000, 3),
+        'speedup': round(naive_time / compiled_time, 1) if compiled_time else None,
+        'update_1000_users_s': round(update_time, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for users_count in args.users:
+        print(json.dumps(bench(users_count, args.projects, args.vocabulary, args.seed), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Латентность опроса Kwork и пиковая память Chrome: новый браузер на каждый опрос против тёплой сессии.
+
+Запуск: python -m benchmarks.kwork_browser [--polls 10]
+Нужны Chrome/chromedriver и доступ к KWORK_URL.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from src.parsers.browser_session import BrowserSession
+
+
+def run_polls(url, polls, warm):
+    session = BrowserSession(max_pages=polls + 1, max_rss_mb=10 ** 6)
+    latencies = []
+    peak_rss = 0.0
+    try:
+        for _ in range(polls):
+            started = time.perf_counter()
+            session.fetch(url)
+            latencies.append(time.perf_counter() - started)
+            peak_rss = max(peak_rss, session.peak_rss_mb)
+            if not warm:
+                # Прежнее поведение: браузер создаётся и закрывается на каждый опрос
+                session.quit()
+    finally:
+        session.quit()
+
+    return {
+        'mode': 'warm' if warm else 'cold',
+        'polls': polls,
+        'p50_s': round(statistics.median(latencies), 3),
+        'max_s': round(max(latencies), 3),
+        'total_s': round(sum(latencies), 3),
+        'peak_rss_mb': round(peak_rss, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--polls', type=int, default=10)
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = f"{os.getenv('KWORK_URL')}?a=1&view=0&page=1"
+    for warm in (False, True):
+        print(json.dumps(run_polls(url, args.polls, warm)))
+
+
+if __name__ == '__main__':
+    main()
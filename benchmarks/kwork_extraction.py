@@ -0,0 +1,87 @@
+"""Извлечение wantsListData из HTML Kwork: посимвольный обход скобок против json.JSONDecoder.raw_decode.
+
+Запуск: python -m benchmarks.kwork_extraction [page1.html page2.html ...] [--repeat 50]
+Без файлов используется синтетическая страница похожей структуры.
+"""
+import argparse
+import json
+import time
+
+from src.parsers.kwork_parser import KworkParser
+
+
+def legacy_extract_json_object(text, start_index):
+    counter = 0
+    for i, char in enumerate(text[start_index:], start=start_index):
+        if char == '{':
+            counter += 1
+        elif char == '}':
+            counter -= 1
+            if counter == 0:
+                return text[start_index:i+1]
+    return ""
+
+
+def legacy_extract_projects(html):
+    index = html.find('"wantsListData":')
+    if index == -1:
+        return []
+    start_index = html.find('{', index)
+    json_text = legacy_extract_json_object(html, start_index)
+    if not json_text:
+        return []
+    try:
+        return json.loads(json_text).get("pagination", {}).get("data", [])
+    except json.JSONDecodeError:
+        return []
+
+
+def synthetic_page(projects=50):
+    data = [{
+        "id": 2800000 + i,
+        "name": f"Проект {i}: парсер {{сайта}}",
+        "description": "Нужно собрать данные с сайта и выгрузить в CSV. " * 20,
+        "priceLimit": "5000",
+        "possiblePriceLimit": 15000,
+        "date_create": "2025-06-01 12:00:00"
+    } for i in range(projects)]
+    state = {"wantsListData": {"pagination": {"current_page": 1, "data": data}}, "other": "x" * 50000}
+    return '<html><head>' + 'x' * 200000 + '</head><body><script>window.stateData=' + json.dumps(state, ensure_ascii=False) + ';</script></body></html>'
+
+
+def timed(func, html, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(html)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('pages', nargs='*')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding='utf-8') as f:
+            pages.append((path, f.read()))
+    if not pages:
+        pages.append(('synthetic', synthetic_page()))
+
+    for name, html in pages:
+        legacy_time, legacy = timed(legacy_extract_projects, html, args.repeat)
+        fast_time, fast = timed(KworkParser.extract_projects_from_json, html, args.repeat)
+        print(json.dumps({
+            'page': name,
+            'html_kb': len(html) // 1024,
+            'projects': len(fast),
+            'legacy_projects': len(legacy),
+            'legacy_ms': round(legacy_time * 1000, 3),
+            'raw_decode_ms': round(fast_time * 1000, 3),
+            'speedup': round(legacy_time / fast_time, 1) if fast_time else None
+        }, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Стоимость формата проекта на проводе: прежний JSON-словарь против Project в msgpack.
+
+json — парсер делает json.dumps словаря, NotificationService разбирает его
+json.loads дважды (подбор получателей и рендер); msgpack — Project.encode
+и один Project.decode. Печатает байты на сообщение и время кодирования
+и разбора на одно сообщение для синтетических проектов всех площадок.
+
+Запуск: python -m benchmarks.project_wire [--projects 3000]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from src.models import Project
+
+from .synthetic import KeywordSampler, make_project_stream, make_vocabulary
+
+
+def per_message(function, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - started) / (len(items) * repeat)
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    sampler = KeywordSampler(make_vocabulary(args.vocabulary, rng), 1.0, rng)
+    stream = make_project_stream(args.projects, sampler, rng, words=args.words, wire_format='json')
+    messages = [(channel, json.loads(data)) for channel, data in stream]
+    projects = [Project.decode(data, channel) for channel, data in stream]
+
+    json_payloads = [json.dumps(message) for _, message in messages]
+    msgpack_payloads = [project.encode() for project in projects]
+
+    def json_consume(data):
+        json.loads(data)
+        json.loads(data)
+
+    return {
+        'projects': len(projects),
+        'json_bytes_avg': round(statistics.mean(len(data.encode('utf-8')) for data in json_payloads), 1),
+        'msgpack_bytes_avg': round(statistics.mean(len(data) for data in msgpack_payloads), 1),
+        'json_encode_us': round(per_message(json.dumps, [message for _, message in messages], args.repeat) * 1e6, 2),
+        'msgpack_encode_us': round(per_message(Project.encode, projects, args.repeat) * 1e6, 2),
+        'json_decode_us': round(per_message(json_consume, json_payloads, args.repeat) * 1e6, 2),
+        'msgpack_decode_us': round(per_message(Project.decode, msgpack_payloads, args.repeat) * 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=3000)
+    parser.add_argument('--words', type=int, default=120, help='слов в описании проекта')
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(bench(args), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
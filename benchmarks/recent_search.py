@@ -0,0 +1,95 @@
+"""Поиск по проектам за сутки: полный перебор окна против RecentProjectsIndex.
+
+scan — проверка основ каждого проекта окна, как пришлось бы делать без
+индекса; index — пересечение списков обратного индекса. Печатает время
+добавления проекта (с вытеснением), p50/p99 запроса из нескольких ключевых
+слов и память окна. Запуск: python -m benchmarks.recent_search [--projects 20000]
+"""
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from src.models import Project
+from src.notifications import RecentProjectsIndex, StemMatcher
+from src.notifications.stem_matcher import text_stems
+
+from .synthetic import KeywordSampler, make_project_stream, make_vocabulary
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timed(function, queries):
+    durations = []
+    for query in queries:
+        started = time.perf_counter()
+        function(query)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    sampler = KeywordSampler(make_vocabulary(args.vocabulary, rng), args.skew, rng)
+    stream = make_project_stream(args.projects, sampler, rng, words=args.words)
+    projects = [(channel, Project.decode(data, channel)) for channel, data in stream]
+    queries = [', '.join(sampler.sample(rng.randint(1, 5))) for _ in range(args.queries)]
+
+    gc.collect()
+    tracemalloc.start()
+    index = RecentProjectsIndex(window=86400, max_items=args.projects)
+    started = time.perf_counter()
+    for channel, project in projects:
+        index.add(channel, project)
+    add_seconds = (time.perf_counter() - started) / len(projects)
+    gc.collect()
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    window = [(channel, project, text_stems(project.text)) for channel, project in projects]
+
+    def scan(query):
+        keywords = StemMatcher.parse_keywords(query)
+        found = []
+        for channel, project, stems in window:
+            score = sum(1 for keyword in keywords if stems.issuperset(keyword))
+            if score:
+                found.append((score, project))
+        return sorted(found, key=lambda item: item[0], reverse=True)[:args.limit]
+
+    scan_durations = timed(scan, queries)
+    index_durations = timed(lambda query: index.search(query, limit=args.limit), queries)
+    return {
+        'projects': len(index),
+        'add_us': round(add_seconds * 1e6, 1),
+        'index_mb': round(index_bytes / 2 ** 20, 1),
+        'scan_p50_ms': round(statistics.median(scan_durations) * 1000, 3),
+        'scan_p99_ms': round(percentile(scan_durations, 0.99) * 1000, 3),
+        'index_p50_ms': round(statistics.median(index_durations) * 1000, 3),
+        'index_p99_ms': round(percentile(index_durations, 0.99) * 1000, 3),
+        'results_avg': round(statistics.mean(len(index.search(query, limit=args.limit)) for query in queries), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=20000, help='проектов в окне')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--words', type=int, default=120, help='слов в описании проекта')
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(bench(args), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Сравнение подстрочного сопоставления ключевых слов с индексом по основам слов.
+
+Словарь — русские слова; ключевые слова пользователей и текст проектов берут их
+в разных падежных формах. Для каждого числа пользователей печатается время на
+проект для построчной проверки подстрок, автомата Ахо-Корасик и StemMatcher,
+среднее число получателей (сколько совпадений теряет подстрока) и попадания
+в LRU-кэш основ. Перед замером проверяется, что SubscriberIndex со StemMatcher
+(как при KEYWORD_MATCHING=stems) действительно подбирает получателей по основам.
+
+Запуск: python -m benchmarks.stem_matching [--users 10000 100000]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from src.notifications.keyword_matcher import KeywordMatcher
+from src.notifications.stem_matcher import StemMatcher, stem_cache
+from src.notifications.subscriber_index import SubscriberIndex
+
+from .keyword_matching import naive_match
+
+
+CONSONANTS = 'бвгджзклмнпрстфхцчшщ'
+VOWELS = 'аеиоуыэюя'
+ENDINGS = ('', 'а', 'ы', 'ов', 'ам', 'ами', 'ах', 'ом', 'е', 'у')
+FILLER = ('нужен', 'сделать', 'проект', 'срочно', 'разработка', 'задача', 'опыт', 'бюджет')
+
+
+def make_roots(size, rng):
+    roots = set()
+    while len(roots) < size:
+        syllables = rng.randint(2, 3)
+        roots.add(''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(syllables)) + rng.choice(CONSONANTS))
+    return sorted(roots)
+
+
+def make_users(count, roots, rng, max_keywords=5):
+    users = []
+    for i in range(count):
+        keywords = ', '.join(root + rng.choice(ENDINGS) for root in rng.sample(roots, rng.randint(0, max_keywords)))
+        users.append((str(100000000 + i), keywords))
+    return users
+
+
+def make_text(roots, rng, words=120, hit_rate=0.05):
+    return ' '.join(
+        rng.choice(roots) + rng.choice(ENDINGS) if rng.random() < hit_rate else rng.choice(FILLER)
+        for _ in range(words)
+    )
+
+
+def check_index():
+    """Индекс подписчиков в режиме stems: ключевое слово «сайт» должно находить «сайты»"""
+    index = SubscriberIndex(matcher=StemMatcher())
+    index.load([(1, '1', 'сайт', True, True, True)])
+    if not isinstance(index.matcher, StemMatcher):
+        raise SystemExit(f'SubscriberIndex заменил StemMatcher на {type(index.matcher).__name__}')
+    recipients = index.recipients('fl_projects', 'Нужны сайты под ключ')
+    if recipients != {'1'}:
+        raise SystemExit(f'Индекс по основам не нашёл «сайты» по слову «сайт»: {recipients}')
+
+
+def per_project(match, texts):
+    started = time.perf_counter()
+    results = [match(text) for text in texts]
+    return (time.perf_counter() - started) / len(texts), results
+
+
+def bench(users_count, projects, vocabulary_size, seed):
+    rng = random.Random(seed)
+    roots = make_roots(vocabulary_size, rng)
+    users = make_users(users_count, roots, rng)
+    texts = [make_text(roots, rng) for _ in range(projects)]
+
+    automaton = KeywordMatcher()
+    automaton.load(users)
+
+    stem_cache().cache_clear()
+    started = time.perf_counter()
+    stems = StemMatcher()
+    stems.load(users)
+    stem_build_time = time.perf_counter() - started
+
+    naive_time, naive = per_project(lambda text: naive_match(users, text), texts)
+    automaton_time, _ = per_project(automaton.match, texts)
+    stem_time, stemmed = per_project(stems.match, texts)
+
+    # Подстрока, найденная целиком в словоформе, должна находиться и по основе
+    missed = sum(len(set(a) - b) for a, b in zip(naive, stemmed))
+    cache = stem_cache().cache_info()
+
+    return {
+        'users': users_count,
+        'stem_build_s': round(stem_build_time, 4),
+        'naive_ms_per_project': round(naive_time * 1000, 3),
+        'automaton_ms_per_project': round(automaton_time * 1000, 3),
+        'stems_ms_per_project': round(stem_time * 1000, 3),
+        'speedup_vs_naive': round(naive_time / stem_time, 1) if stem_time else None,
+        'substring_recipients_avg': round(statistics.mean(len(r) for r in naive), 1),
+        'stem_recipients_avg': round(statistics.mean(len(r) for r in stemmed), 1),
+        'substring_only_recipients': missed,
+        'stem_cache_hit_rate': round(cache.hits / (cache.hits + cache.misses), 3) if cache.hits + cache.misses else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    check_index()
+    for users_count in args.users:
+        print(json.dumps(bench(users_count, args.projects, args.vocabulary, args.seed), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
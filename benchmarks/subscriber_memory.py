@@ -0,0 +1,84 @@
+"""Память на пользователя: список строк users против колоночного SubscriberIndex.
+
+tuples — строки в том виде, в каком их возвращает Database.get_users (кортеж,
+chat_id, строка ключевых слов, флаги). index — SubscriberIndex после загрузки
+тех же строк и освобождения списка: номера пользователей, карты платформ,
+общий массив номеров слов (CSR) и автомат ключевых слов; store — то же без автомата,
+размер которого зависит только от словаря. Замер — tracemalloc.
+
+Запуск: python -m benchmarks.subscriber_memory [--users 100000]
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from src.notifications import KeywordMatcher, SubscriberIndex
+
+from .synthetic import KeywordSampler, make_users, make_vocabulary
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench(users_count, args):
+    rng = random.Random(args.seed)
+    sampler = KeywordSampler(make_vocabulary(args.vocabulary, rng), args.skew, rng)
+
+    def rows():
+        return make_users(users_count, sampler, random.Random(args.seed))
+
+    _, tuples_bytes = traced(rows)
+
+    def index():
+        index = SubscriberIndex()
+        index.load(rows())
+        return index
+
+    index, index_bytes = traced(index)
+
+    bitmaps = sum(1 for posting in index.postings if isinstance(posting, int))
+
+    def matcher():
+        # Автомат по словам — постоянная часть, не зависящая от числа пользователей
+        matcher = KeywordMatcher()
+        matcher.load((keyword_id, key) for keyword_id, key in enumerate(index.keywords) if key)
+        return matcher
+
+    _, matcher_bytes = traced(matcher)
+
+    return {
+        'users': users_count,
+        'tuples_bytes_per_user': round(tuples_bytes / users_count, 1),
+        'index_bytes_per_user': round(index_bytes / users_count, 1),
+        'store_bytes_per_user': round((index_bytes - matcher_bytes) / users_count, 1),
+        'index_mb': round(index_bytes / 2 ** 20, 1),
+        'matcher_mb': round(matcher_bytes / 2 ** 20, 1),
+        'keywords': len(index.keyword_ids),
+        'bitmap_postings': bitmaps,
+        'platform_bitmap_kb': round(max(m.bit_length() for m in index.platforms.values()) / 8 / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[100000])
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for users_count in args.users:
+        print(json.dumps(bench(users_count, args), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
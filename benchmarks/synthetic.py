@@ -0,0 +1,96 @@
+"""Генераторы синтетических пользователей и проектов для бенчмарков рассылки."""
+import itertools
+import json
+import string
+
+from src.models import Project
+from src.models.project import SOURCES
+
+
+CHANNELS = ('fl_projects', 'kwork_projects', 'freelancer_projects')
+FILLER = ('нужен', 'сделать', 'проект', 'срочно', 'разработка', 'сайт', 'задача', 'опыт', 'бюджет', 'lorem')
+
+
+def make_vocabulary(size, rng):
+    return [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(size)]
+
+
+class KeywordSampler:
+    """Выбор ключевых слов по Zipf: чем больше skew, тем сильнее пересекаются списки пользователей"""
+
+    def __init__(self, vocabulary, skew, rng):
+        self.vocabulary = vocabulary
+        self.rng = rng
+        weights = [1 / (rank + 1) ** skew for rank in range(len(vocabulary))]
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def sample(self, count):
+        words = set()
+        while len(words) < min(count, len(self.vocabulary)):
+            words.add(self.rng.choices(self.vocabulary, cum_weights=self.cumulative)[0])
+        return list(words)
+
+
+def make_users(count, sampler, rng, min_keywords=1, max_keywords=5, catch_all=0.05, platform_mix=(0.8, 0.6, 0.4)):
+    """Строки в формате Database.get_users: (id, chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer).
+
+    catch_all — доля пользователей без ключевых слов (получают всё);
+    platform_mix — вероятности включённой рассылки Kwork, FL и Freelancer.
+    """
+    users = []
+    for i in range(count):
+        if rng.random() < catch_all:
+            keywords = ''
+        else:
+            keywords = ', '.join(sampler.sample(rng.randint(min_keywords, max_keywords)))
+        flags = tuple(rng.random() < share for share in platform_mix)
+        users.append((i + 1, str(100000000 + i), keywords, *flags))
+    return users
+
+
+def make_project(channel, number, sampler, rng, words=120, hit_rate=0.03, wire_format='msgpack'):
+    """Полезная нагрузка в том виде, в каком её публикуют парсеры соответствующей площадки.
+
+    wire_format='json' — прежний JSON-объект, который парсеры публиковали до Project.
+    """
+    description = ' '.join(
+        sampler.sample(1)[0] if rng.random() < hit_rate else rng.choice(FILLER)
+        for _ in range(words)
+    )
+    title = ' '.join(rng.choice(FILLER) for _ in range(5)).capitalize()
+
+    if channel == 'fl_projects':
+        project_id = f'https://www.fl.ru/projects/{5000000 + number}/'
+        message = {'id': project_id, 'title': title, 'description': description, 'url': project_id,
+                   'budget': {'minimum': rng.choice([None, 5000, 15000]), 'maximum': None, 'currency': '₽'}}
+    elif channel == 'kwork_projects':
+        project_id = 2000000 + number
+        message = {'id': project_id, 'title': title, 'description': description,
+                   'url': f'https://kwork.ru/projects/{project_id}',
+                   'budget': {'minimum': '3000.00', 'maximum': '9000.00', 'currency': '₽'}}
+    else:
+        project_id = 39000000 + number
+        message = {'id': project_id, 'title': title, 'description': description,
+                   'url': f'https://www.freelancer.com/projects/synthetic-{project_id}',
+                   'budget': {'minimum': 30.0, 'maximum': 250.0, 'currency': '$'}}
+    if wire_format == 'json':
+        return json.dumps(message)
+    return Project.from_dict(SOURCES[channel], message).encode()
+
+
+def make_project_stream(count, sampler, rng, channels=CHANNELS, **kwargs):
+    """Список пар (channel, data) с равномерной смесью площадок"""
+    return [(channels[i % len(channels)], make_project(channels[i % len(channels)], i, sampler, rng, **kwargs)) for i in range(count)]
+
+
+class MemoryRedis:
+    """Минимальная замена асинхронного Redis для кэша рендера: бенчмарки не зависят от сервера"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
@@ -9,7 +9,7 @@ import signal
 from aiogram import Bot, Dispatcher, html
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.types import Message
 from aiogram.types import InlineKeyboardButton, ReplyKeyboardMarkup, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 
@@ -20,28 +20,45 @@ from aiogram.types import CallbackQuery
 
 from src import REDIS_CLIENT, REDIS_CLIENT_ASYNCIO
 from src import ApplicationParser
+from src import IngestionRuntime
+from src.parsers import PollScheduler
+from src.metrics import MetricsFlusher, MetricsExporter
 from src import NotificationService
-from src import Database
+from src.notifications.stem_matcher import keyword_stems
+from src.notifications import RecentProjectsIndex
+from src.notifications.message_renderer import SOURCES
+from src.events import ProjectConsumer
+from src import AsyncDatabase
 
 load_dotenv()
 TOKEN = getenv("BOT_TOKEN")
 ADMIN_USERNAME = getenv("ADMIN_USERNAME")
 
 dp = Dispatcher()
-db = Database()
 redis_client = REDIS_CLIENT
 redis_client_asyncio = REDIS_CLIENT_ASYNCIO
+db = AsyncDatabase(redis_client_asyncio)
 
+# asyncio — все парсеры корутинами в процессе бота, processes — отдельный процесс на парсер
+INGESTION_MODE = getenv("INGESTION_MODE", "asyncio")
 application_parser = ApplicationParser(redis_client)
+ingestion_runtime = IngestionRuntime(
+    redis_client,
+    redis_client_asyncio,
+    cpu_workers=int(getenv("INGESTION_CPU_WORKERS", 1))
+)
+# Проекты за последние сутки для /search; в режиме embedded его же наполняет NotificationService
+recent_projects = RecentProjectsIndex()
+SEARCH_LIMIT = int(getenv("SEARCH_LIMIT", 10))
 
 @dp.message(CommandStart())
 async def command_start_handler(message: Message) -> None:
     chat_id = str(message.from_user.id)
-    user = db.get_user(chat_id)
+    user = await db.get_user(chat_id)
     
     if user is None:
         default_keywords = ""
-        db.add_user(
+        await db.add_user(
             chat_id,
             keywords=default_keywords,
             mailing_kwork=True,
@@ -80,6 +97,7 @@ async def help_command(message: Message):
         "📚 <b>Справка по командам бота</b>\n\n"
         "👋 <b>/start</b> - Начало работы с ботом\n"
         "⚙️ <b>/settings</b> - Настройки уведомлений и ключевых слов\n"
+        "🔎 <b>/search слова</b> - Поиск по проектам за последние сутки\n"
         "🔍 <b>Как это работает?</b>\n"
         "1. Я постоянно отслеживаю новые проекты на:\n"
         "   • Kwork.ru\n"
@@ -97,6 +115,7 @@ async def help_command(message: Message):
         help_text += (
             "👑 <b>Команды администратора:</b>\n"
             "• <b>/force_update</b> - Экстренная проверка новых заказов\n"
+            "• <b>/polling</b> - Интервалы опроса площадок\n"
             "• <b>/shutdown</b> - Остановка бота\n\n"
         )
     
@@ -108,6 +127,30 @@ async def help_command(message: Message):
         reply_markup=get_main_keyboard()
     )
 
+@dp.message(Command("search"))
+async def search_command(message: Message, command: CommandObject):
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(
+            "🔎 Укажите ключевые слова через запятую, например:\n<code>/search python, парсинг сайтов</code>",
+            parse_mode=ParseMode.HTML
+        )
+        return
+
+    found = recent_projects.search(query, limit=SEARCH_LIMIT)
+    if not found:
+        await message.answer("🔎 За последние сутки подходящих проектов не было.")
+        return
+
+    lines = [f"🔎 <b>Найдено проектов за последние сутки: {len(found)}</b>\n"]
+    for number, item in enumerate(found, 1):
+        source_emoji, source_text = SOURCES.get(item.channel, ("", ""))
+        title = html.quote(item.project.title or "Без названия")
+        if item.project.url:
+            title = f'<a href="{html.quote(item.project.url)}">{title}</a>'
+        lines.append(f"{number}. {source_emoji} {title} ({source_text})")
+    await message.answer("\n".join(lines), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
 @dp.message(lambda message: message.text == "⚙️ Настройки")
 async def settings_text_command(message: Message):
     await cmd_settings(message)
@@ -127,13 +170,16 @@ async def shutdown(loop, bot):
 
     try:
         logging.info("Завершение процессов парсеров...")
-        await asyncio.get_event_loop().run_in_executor(None, application_parser.kill_processes)
+        if INGESTION_MODE == "asyncio":
+            await ingestion_runtime.stop()
+        else:
+            await asyncio.get_event_loop().run_in_executor(None, application_parser.kill_processes)
         logging.info("Процессы парсеров завершены")
     except Exception as e:
         logging.error(f"Ошибка при завершении парсеров: {e}")
 
     try:
-        db.disconnect()
+        await db.disconnect()
         logging.info("Соединение с БД закрыто")
     except Exception as e:
         logging.error(f"Ошибка при закрытии БД: {e}")
@@ -165,7 +211,7 @@ def get_main_keyboard():
 
 async def cmd_settings(message: Message, update: bool = False):
     chat_id = str(message.chat.id)
-    user = db.get_user(chat_id)
+    user = await db.get_user(chat_id)
     
     if not user:
         return
@@ -232,11 +278,11 @@ async def toggle_service(callback: CallbackQuery):
     chat_id = str(callback.from_user.id)
 
     if service == "kwork":
-        db.update_user(chat_id, mailing_kwork=(action == "on"))
+        await db.update_user(chat_id, mailing_kwork=(action == "on"))
     elif service == "fl":
-        db.update_user(chat_id, mailing_fl=(action == "on"))
+        await db.update_user(chat_id, mailing_fl=(action == "on"))
     elif service == "freelancer":
-        db.update_user(chat_id, mailing_freelancer=(action == "on"))
+        await db.update_user(chat_id, mailing_freelancer=(action == "on"))
 
     await cmd_settings(callback.message, update=True)
     await callback.answer(f"Настройки для {service} обновлены")
@@ -245,7 +291,7 @@ async def toggle_service(callback: CallbackQuery):
 @dp.callback_query(lambda c: c.data == "set_keywords")
 async def set_keywords_start(callback: CallbackQuery, state: FSMContext):
     chat_id = str(callback.message.chat.id)
-    user = db.get_user(chat_id)
+    user = await db.get_user(chat_id)
     current_keywords = user[2] if user and user[2] else "Нет установленных ключевых слов"
     
     await state.set_state(SettingsState.SETTING_KEYWORDS)
@@ -286,6 +332,26 @@ async def force_update_command(message: Message):
     else:
         await message.answer("⛔ Эта команда доступна только администратору")
 
+@dp.message(Command("polling"))
+async def polling_command(message: Message):
+    if not (message.from_user.username and message.from_user.username.lower() == ADMIN_USERNAME.lower()):
+        await message.answer("⛔ Эта команда доступна только администратору")
+        return
+
+    sources = sorted(source.decode() for source in await redis_client_asyncio.smembers(PollScheduler.SOURCES_KEY))
+    if not sources:
+        await message.answer("Парсеры ещё не сообщали о своих опросах")
+        return
+
+    lines = ["⏱ <b>Опрос площадок</b>\n"]
+    for source in sources:
+        state = {k.decode(): v.decode() for k, v in (await redis_client_asyncio.hgetall(PollScheduler.KEY.format(source=source))).items()}
+        lines.append(
+            f"<b>{source}</b>: интервал {state.get('interval')} с, ~{state.get('rate_per_hour')} проектов/ч, "
+            f"запросов за час {state.get('requests_last_hour')}/{state.get('max_requests_per_hour')}"
+        )
+    await message.answer("\n".join(lines), parse_mode=ParseMode.HTML)
+
 @dp.message(SettingsState.SETTING_KEYWORDS)
 async def save_keywords(message: Message, state: FSMContext):
     chat_id = str(message.chat.id)
@@ -299,7 +365,7 @@ async def save_keywords(message: Message, state: FSMContext):
     validated_keywords = ", ".join(keywords_list)
     
     try:
-        db.update_user(chat_id, keywords=validated_keywords)
+        await db.update_user(chat_id, keywords=validated_keywords)
         await state.clear()
     except Exception as e:
         logging.error(f"Ошибка обновления ключевых слов в БД: {e}")
@@ -312,6 +378,13 @@ async def save_keywords(message: Message, state: FSMContext):
         f"✅ Ключевые слова сохранены:\n<code>{validated_keywords}</code>", 
         parse_mode=ParseMode.HTML
     )
+    if getenv("KEYWORD_MATCHING", "memory") == "stems":
+        # Те же основы, что попадут в индекс подписчиков по событию изменения пользователя
+        stemmed_keywords = ", ".join(" ".join(keyword_stems(kw)) for kw in keywords_list)
+        await message.answer(
+            f"🔤 Поиск идёт по основам слов с любыми окончаниями:\n<code>{stemmed_keywords}</code>",
+            parse_mode=ParseMode.HTML
+        )
     await message.answer(
         "Вы в главном меню",
         reply_markup=get_main_keyboard()
@@ -337,10 +410,25 @@ async def main() -> None:
     global bot
     bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
-    db.connect()
+    await db.connect()
 
-    notification_service = NotificationService(redis_client_asyncio, db, dp, bot)
-    asyncio.create_task(notification_service.listen())
+    MetricsFlusher(redis_client, "bot").start()
+    metrics_port = int(getenv("METRICS_PORT", 9108))
+    if metrics_port:
+        await MetricsExporter(redis_client_asyncio, getenv("METRICS_HOST", "127.0.0.1"), metrics_port).start()
+
+    # В режиме workers рассылку ведут отдельные процессы worker.py
+    if getenv("NOTIFICATION_MODE", "embedded") == "embedded":
+        notification_service = NotificationService(redis_client_asyncio, db, dp, bot, recent=recent_projects)
+        asyncio.create_task(notification_service.listen())
+    else:
+        # Воркеры держат свои окна недавних проектов; боту для /search нужна своя группа чтения
+        search_consumer = ProjectConsumer(
+            redis_client_asyncio,
+            ['fl_projects', 'kwork_projects', 'freelancer_projects'],
+            group=getenv("SEARCH_GROUP", "search")
+        )
+        asyncio.create_task(recent_projects.follow(search_consumer))
 
     loop = asyncio.get_running_loop()
     for signame in ('SIGINT', 'SIGTERM'):
@@ -350,9 +438,12 @@ async def main() -> None:
         )
 
     try:
-        parser_task = asyncio.create_task(
-            asyncio.to_thread(application_parser.run_parsers)
-        )
+        if INGESTION_MODE == "asyncio":
+            parser_task = asyncio.create_task(ingestion_runtime.run())
+        else:
+            parser_task = asyncio.create_task(
+                asyncio.to_thread(application_parser.run_parsers)
+            )
 
         async with bot:
             await dp.start_polling(bot)
@@ -362,7 +453,7 @@ async def main() -> None:
     except Exception as e:
         logging.error(f"Ошибка: {e}")
     finally:
-        db.disconnect()
+        await db.disconnect()
         listen_task.cancel()
 
 if __name__ == "__main__":
@@ -1,11 +1,11 @@
 from .config import REDIS_CLIENT, REDIS_CLIENT_ASYNCIO
-from .db import Database
+from .db import Database, AsyncDatabase
 from .notifications import NotificationService
-from .parsers import ApplicationParser
+from .parsers import ApplicationParser, IngestionRuntime
 
 __all__ = [
 	'REDIS_CLIENT', 'REDIS_CLIENT_ASYNCIO',
-	'Database', 
+	'Database', 'AsyncDatabase',
 	'NotificationService', 
-	'ApplicationParser'
+	'ApplicationParser', 'IngestionRuntime'
 ]
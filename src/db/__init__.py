@@ -1,3 +1,4 @@
-from .database import Database
+from .database import Database, project_tokens
+from .async_database import AsyncDatabase
 
-__all__ = ['Database']
+__all__ = ['Database', 'AsyncDatabase', 'project_tokens']
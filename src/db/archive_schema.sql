@@ -0,0 +1,19 @@
+-- Архив опубликованных проектов, секционированный по дням публикации.
+-- Секции projects_pYYYYMMDD создаёт ProjectArchive по мере записи и удаляет по сроку хранения.
+CREATE TABLE IF NOT EXISTS projects (
+    source TEXT NOT NULL,
+    project_id TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    url TEXT,
+    budget_min NUMERIC,
+    budget_max NUMERIC,
+    currency TEXT,
+    published_at TIMESTAMPTZ NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (source, project_id, published_at)
+) PARTITION BY RANGE (published_at);
+
+-- Выборки «проекты площадки за период» и «все проекты за период»
+CREATE INDEX IF NOT EXISTS idx_projects_source_published ON projects (source, published_at DESC);
+CREATE INDEX IF NOT EXISTS idx_projects_published ON projects (published_at DESC);
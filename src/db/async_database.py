@@ -0,0 +1,230 @@
+import json
+import os
+import uuid
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from .database import Database, build_dsn, read_schema, match_users_query, users_query
+from .profile_cache import ProfileCache
+
+
+class AsyncDatabase:
+    """Асинхронный доступ к PostgreSQL на psycopg 3 через пул соединений.
+
+    Повторяет интерфейс Database, но не блокирует event loop бота:
+    каждый запрос берёт соединение из пула, а частые запросы
+    выполняются как подготовленные выражения.
+    """
+
+    USERS_CHANNEL = Database.USERS_CHANNEL
+
+    GET_USER_QUERY = 'SELECT * FROM users WHERE chat_id = %s;'
+    ADD_USER_QUERY = """
+        INSERT INTO users (chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (chat_id) DO NOTHING
+        RETURNING *;
+    """
+    # Один текст запроса на любые сочетания полей. psycopg различает подготовленные выражения
+    # по тексту и типам параметров: None и строки передаются без типа (oid 0), bool — как boolean,
+    # поэтому на каждое сочетание заданных флагов готовится своё выражение. Бот меняет за раз
+    # либо ключевые слова, либо один флаг, так что их не больше четырёх на соединение
+    # Прежние ключевые слова возвращаются последним столбцом: по ним служба уведомлений
+    # досылает проекты только по новым словам
+    UPDATE_USER_QUERY = """
+        UPDATE users SET
+            keywords = COALESCE(%s, users.keywords),
+            mailing_kwork = COALESCE(%s, users.mailing_kwork),
+            mailing_fl = COALESCE(%s, users.mailing_fl),
+            mailing_freelancer = COALESCE(%s, users.mailing_freelancer)
+        FROM (SELECT id, keywords FROM users WHERE chat_id = %s FOR UPDATE) AS previous
+        WHERE users.id = previous.id
+        RETURNING users.*, previous.keywords;
+    """
+
+    def __init__(self, redis_client=None, min_size: int = 2, max_size: int = 10):
+        self.dsn = build_dsn()
+        self.redis_client = redis_client
+        # Профили для обработчиков бота: запись сразу обновляет кэш строкой из RETURNING
+        self.profiles = ProfileCache()
+        self.batch_size = int(os.getenv('USERS_BATCH_SIZE', 1000))
+        self.pool = AsyncConnectionPool(
+            self.dsn,
+            min_size=min_size,
+            max_size=max_size,
+            open=False,
+            kwargs={'autocommit': True},
+            # Соединение проверяется при выдаче из пула, разорванные заменяются новыми
+            check=AsyncConnectionPool.check_connection,
+            reconnect_timeout=60
+        )
+
+    async def _notify(self, chat_id: str, fields: dict, previous_keywords: str = None):
+        """Публикация события об изменении пользователя для сброса тёплых индексов"""
+        if self.redis_client is None:
+            return
+        event = {'chat_id': chat_id, 'fields': fields}
+        if previous_keywords is not None:
+            event['previous_keywords'] = previous_keywords
+        try:
+            await self.redis_client.publish(self.USERS_CHANNEL, json.dumps(event))
+        except Exception as e:
+            print('Ошибка публикации изменения пользователя:', e)
+
+    async def connect(self):
+        try:
+            await self.pool.open(wait=True)
+            await self.create_tables()
+            print('Пул подключений к базе данных успешно открыт.')
+        except Exception as e:
+            print('Ошибка подключения к базе данных:', e)
+            raise e
+
+    async def disconnect(self):
+        if not self.pool.closed:
+            await self.pool.close()
+            print('Пул подключений к базе данных закрыт.')
+
+    async def _execute(self, query: str, params=None, fetch: str = None, prepare: bool = None):
+        """Выполнение запроса с одной повторной попыткой при обрыве соединения"""
+        for attempt in range(2):
+            try:
+                async with self.pool.connection() as conn:
+                    cur = await conn.execute(query, params, prepare=prepare)
+                    if fetch == 'one':
+                        return await cur.fetchone()
+                    if fetch == 'all':
+                        return await cur.fetchall()
+                    return cur.rowcount
+            except psycopg.OperationalError as e:
+                if attempt:
+                    raise e
+                print('Соединение с базой данных потеряно, повторяем запрос:', e)
+                await self.pool.check()
+
+    async def create_tables(self):
+        try:
+            await self._execute(read_schema(), prepare=False)
+            print('Таблица users и индекс успешно созданы (или уже существуют).')
+        except Exception as e:
+            print('Ошибка при создании таблицы или индекса:', e)
+            raise e
+
+    async def update_user(self, chat_id: str, keywords: str = None, mailing_kwork: bool = None, mailing_fl: bool = None, mailing_freelancer: bool = None):
+        changed = {
+            'keywords': keywords,
+            'mailing_kwork': mailing_kwork,
+            'mailing_fl': mailing_fl,
+            'mailing_freelancer': mailing_freelancer
+        }
+        fields = {k: v for k, v in changed.items() if v is not None}
+        if not fields:
+            print('Нет полей для обновления для пользователя', chat_id)
+            return
+
+        try:
+            user = await self._execute(
+                self.UPDATE_USER_QUERY,
+                (keywords, mailing_kwork, mailing_fl, mailing_freelancer, chat_id),
+                fetch='one',
+                prepare=True
+            )
+            previous_keywords = None
+            if user is not None:
+                user, previous_keywords = user[:-1], user[-1]
+            self.profiles.put(chat_id, user)
+            print(f'Данные пользователя {chat_id} успешно обновлены.')
+        except Exception as e:
+            print('Ошибка при обновлении пользователя:', e)
+            raise e
+
+        await self._notify(chat_id, fields, previous_keywords if 'keywords' in fields else None)
+
+    async def get_user(self, chat_id: str):
+        user = self.profiles.get(chat_id)
+        if user is not None:
+            return user
+        try:
+            user = await self._execute(self.GET_USER_QUERY, (chat_id,), fetch='one', prepare=True)
+            self.profiles.put(chat_id, user)
+            return user
+        except Exception as e:
+            print('Ошибка при получении данных пользователя:', e)
+            return None
+
+    async def add_user(self, chat_id: str, keywords: str = None, mailing_kwork: bool = True, mailing_fl: bool = True, mailing_freelancer: bool = True):
+        try:
+            user = await self._execute(
+                self.ADD_USER_QUERY,
+                (chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer),
+                fetch='one',
+                prepare=True
+            )
+            print(f"Пользователь {chat_id} добавлен (если его ранее не было).")
+        except Exception as e:
+            print("Ошибка при добавлении пользователя:", e)
+            raise e
+
+        if user is None:
+            return
+        self.profiles.put(chat_id, user)
+        await self._notify(chat_id, {
+            'keywords': keywords,
+            'mailing_kwork': mailing_kwork,
+            'mailing_fl': mailing_fl,
+            'mailing_freelancer': mailing_freelancer
+        })
+
+    async def get_chat_ids_for_tokens(self, channel: str, tokens):
+        """chat_id подписчиков платформы, у которых есть ключевое слово из tokens, и пользователей без ключевых слов"""
+        try:
+            rows = await self._execute(match_users_query(channel), (list(tokens),), fetch='all', prepare=True)
+            return [row[0] for row in rows]
+        except Exception as e:
+            print('Ошибка при подборе получателей проекта:', e)
+            return []
+
+    async def iter_users(self, channel: str = None, batch_size: int = None):
+        """Проход по users пачками по batch_size строк через именованный серверный курсор.
+
+        Курсор живёт в транзакции на отдельном соединении из пула,
+        в памяти одновременно не больше одной пачки.
+        """
+        batch_size = batch_size or self.batch_size
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.transaction():
+                    async with conn.cursor(name=f'users_scan_{uuid.uuid4().hex}') as cur:
+                        await cur.execute(users_query(channel))
+                        while rows := await cur.fetchmany(batch_size):
+                            yield rows
+        except Exception as e:
+            print('Ошибка при проходе по пользователям:', e)
+            raise e
+
+    async def _collect_users(self, channel: str = None):
+        return [user async for batch in self.iter_users(channel) for user in batch]
+
+    async def get_users(self):
+        try:
+            return await self._collect_users()
+        except Exception:
+            return []
+
+    async def get_users_for_kwork(self):
+        try:
+            return await self._collect_users('kwork_projects')
+        except Exception:
+            return []
+
+    async def get_users_for_fl(self):
+        try:
+            return await self._collect_users('fl_projects')
+        except Exception:
+            return []
+
+    async def get_users_for_freelancer(self):
+        try:
+            return await self._collect_users('freelancer_projects')
+        except Exception:
+            return []
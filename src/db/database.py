@@ -1,22 +1,97 @@
 import os
+import re
+import json
+import uuid
 import psycopg2
 from psycopg2.extensions import connection as _connection
 from dotenv import load_dotenv
 
+from .profile_cache import ProfileCache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+
+CHANNEL_FLAGS = {
+    'kwork_projects': 'mailing_kwork',
+    'fl_projects': 'mailing_fl',
+    'freelancer_projects': 'mailing_freelancer'
+}
+
+# Получатели проекта одним запросом по частичным индексам платформы: совпавшие
+# по ключевым словам (GIN по keyword_list) и пользователи без ключевых слов
+MATCH_USERS_QUERY = """
+    SELECT chat_id FROM users WHERE {flag} AND keyword_list && %s::text[]
+    UNION
+    SELECT chat_id FROM users WHERE {flag} AND cardinality(keyword_list) = 0;
+"""
+
+TOKEN_PATTERN = re.compile(r'[\w+#]+(?:[.\-][\w+#]+)*')
+
+
+def read_schema():
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        return f.read()
+
+
+def project_tokens(text: str, max_ngram: int = 3):
+    """Слова текста проекта в нижнем регистре и их сочетания до max_ngram слов.
+
+    Сочетания нужны для ключевых слов из нескольких слов («react native»):
+    в keyword_list они хранятся целиком и сравниваются как одна строка.
+    """
+    words = TOKEN_PATTERN.findall((text or '').lower())
+    tokens = set(words)
+    for size in range(2, max_ngram + 1):
+        for i in range(len(words) - size + 1):
+            tokens.add(' '.join(words[i:i + size]))
+    return sorted(tokens)
+
+
+def match_users_query(channel: str) -> str:
+    flag = CHANNEL_FLAGS.get(channel)
+    if flag is None:
+        raise ValueError(f'Неизвестный канал проектов: {channel}')
+    return MATCH_USERS_QUERY.format(flag=flag)
 
-class Database:
-    def __init__(self):
-        load_dotenv()
 
-        dbname = os.getenv('POSTGRES_DB')
-        user = os.getenv('POSTGRES_USER')
-        password = os.getenv('POSTGRES_PASSWORD')
-        host = os.getenv('POSTGRES_HOST')
-        port = os.getenv('POSTGRES_PORT')
-        dsn = f'dbname={dbname} user={user} password={password} host={host} port={port}'
+def users_query(channel: str = None) -> str:
+    """Выборка users целиком или только подписчиков платформы channel"""
+    if channel is None:
+        return 'SELECT * FROM users;'
+    flag = CHANNEL_FLAGS.get(channel)
+    if flag is None:
+        raise ValueError(f'Неизвестный канал проектов: {channel}')
+    return f'SELECT * FROM users WHERE {flag} = TRUE;'
 
-        self.dsn = dsn
+
+def build_dsn():
+    load_dotenv()
+
+    dbname = os.getenv('POSTGRES_DB')
+    user = os.getenv('POSTGRES_USER')
+    password = os.getenv('POSTGRES_PASSWORD')
+    host = os.getenv('POSTGRES_HOST')
+    port = os.getenv('POSTGRES_PORT')
+    return f'dbname={dbname} user={user} password={password} host={host} port={port}'
+
+
+class Database:
+    USERS_CHANNEL = 'users_updates'
+
+    def __init__(self, redis_client=None):
+        self.dsn = build_dsn()
         self.conn: _connection = None
+        self.redis_client = redis_client
+        self.profiles = ProfileCache()
+        self.batch_size = int(os.getenv('USERS_BATCH_SIZE', 1000))
+
+    def _notify(self, chat_id: str, fields: dict):
+        """Публикация события об изменении пользователя для сброса тёплых индексов"""
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.publish(self.USERS_CHANNEL, json.dumps({'chat_id': chat_id, 'fields': fields}))
+        except Exception as e:
+            print('Ошибка публикации изменения пользователя:', e)
 
     def connect(self):
         try:
@@ -35,24 +110,9 @@ class Database:
             self.conn = None
 
     def create_tables(self):
-        create_table_query = '''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                chat_id TEXT UNIQUE,
-                keywords TEXT,
-                mailing_kwork BOOLEAN DEFAULT TRUE,
-                mailing_fl BOOLEAN DEFAULT TRUE,
-                mailing_freelancer BOOLEAN DEFAULT TRUE
-            );
-        '''
-
-        create_index_query = '''
-            CREATE INDEX IF NOT EXISTS idx_users_keywords ON users(keywords);
-        '''
         try:
             with self.conn.cursor() as cur:
-                cur.execute(create_table_query)
-                cur.execute(create_index_query)
+                cur.execute(read_schema())
                 print('Таблица users и индекс успешно созданы (или уже существуют).')
         except Exception as e:
             print('Ошибка при создании таблицы или индекса:', e)
@@ -77,69 +137,119 @@ class Database:
             print('Нет полей для обновления для пользователя', chat_id)
             return
 
-        query = 'UPDATE users SET ' + ', '.join(fields) + ' WHERE chat_id = %s;'
+        query = 'UPDATE users SET ' + ', '.join(fields) + ' WHERE chat_id = %s RETURNING *;'
         values.append(chat_id)
         try:
             with self.conn.cursor() as cur:
                 cur.execute(query, tuple(values))
+                self.profiles.put(chat_id, cur.fetchone())
                 print(f'Данные пользователя {chat_id} успешно обновлены.')
         except Exception as e:
             print('Ошибка при обновлении пользователя:', e)
             raise e
 
+        changed = {
+            'keywords': keywords,
+            'mailing_kwork': mailing_kwork,
+            'mailing_fl': mailing_fl,
+            'mailing_freelancer': mailing_freelancer
+        }
+        self._notify(chat_id, {k: v for k, v in changed.items() if v is not None})
+
     def get_user(self, chat_id: str):
+        user = self.profiles.get(chat_id)
+        if user is not None:
+            return user
+
         query = 'SELECT * FROM users WHERE chat_id = %s;'
         try:
             with self.conn.cursor() as cur:
                 cur.execute(query, (chat_id,))
                 user = cur.fetchone()
+                self.profiles.put(chat_id, user)
                 return user
         except Exception as e:
             print('Ошибка при получении данных пользователя:', e)
             return None
+
     def add_user(self, chat_id: str, keywords: str = None, mailing_kwork: bool = True, mailing_fl: bool = True, mailing_freelancer: bool = True):
         query = """
             INSERT INTO users (chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer)
             VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (chat_id) DO NOTHING;
+            ON CONFLICT (chat_id) DO NOTHING
+            RETURNING *;
         """
         try:
             with self.conn.cursor() as cur:
                 cur.execute(query, (chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer))
+                user = cur.fetchone()
+                inserted = user is not None
+                if inserted:
+                    self.profiles.put(chat_id, user)
                 print(f"Пользователь {chat_id} добавлен (если его ранее не было).")
         except Exception as e:
             print("Ошибка при добавлении пользователя:", e)
             raise e
 
-    def get_users_for_kwork(self):
-        query = 'SELECT * FROM users WHERE mailing_kwork = TRUE;'
+        if not inserted:
+            return
+        self._notify(chat_id, {
+            'keywords': keywords,
+            'mailing_kwork': mailing_kwork,
+            'mailing_fl': mailing_fl,
+            'mailing_freelancer': mailing_freelancer
+        })
+
+    def get_chat_ids_for_tokens(self, channel: str, tokens):
+        """chat_id подписчиков платформы, у которых есть ключевое слово из tokens, и пользователей без ключевых слов"""
         try:
             with self.conn.cursor() as cur:
-                cur.execute(query)
-                users = cur.fetchall()
-                return users
+                cur.execute(match_users_query(channel), (list(tokens),))
+                return [row[0] for row in cur.fetchall()]
         except Exception as e:
-            print('Ошибка при выборке пользователей для Kwork:', e)
+            print('Ошибка при подборе получателей проекта:', e)
             return []
 
-    def get_users_for_fl(self):
-        query = 'SELECT * FROM users WHERE mailing_fl = TRUE;'
+    def iter_users(self, channel: str = None, batch_size: int = None):
+        """Проход по users пачками по batch_size строк через именованный серверный курсор.
+
+        В памяти клиента одновременно не больше одной пачки. Соединение работает
+        в autocommit, поэтому курсор объявляется WITH HOLD.
+        """
+        batch_size = batch_size or self.batch_size
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query)
-                users = cur.fetchall()
-                return users
+            with self.conn.cursor(name=f'users_scan_{uuid.uuid4().hex}', withhold=True) as cur:
+                cur.itersize = batch_size
+                cur.execute(users_query(channel))
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
         except Exception as e:
-            print('Ошибка при выборке пользователей для FL:', e)
+            print('Ошибка при проходе по пользователям:', e)
+            raise e
+
+    def get_users(self):
+        try:
+            return [user for batch in self.iter_users() for user in batch]
+        except Exception:
+            return []
+
+    def get_users_for_kwork(self):
+        try:
+            return [user for batch in self.iter_users('kwork_projects') for user in batch]
+        except Exception:
+            return []
+
+    def get_users_for_fl(self):
+        try:
+            return [user for batch in self.iter_users('fl_projects') for user in batch]
+        except Exception:
             return []
 
     def get_users_for_freelancer(self):
-        query = 'SELECT * FROM users WHERE mailing_freelancer = TRUE;'
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query)
-                users = cur.fetchall()
-                return users
-        except Exception as e:
-            print('Ошибка при выборке пользователей для Freelancer:', e)
+            return [user for batch in self.iter_users('freelancer_projects') for user in batch]
+        except Exception:
             return []
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ..metrics import METRICS
+
+
+class ProfileCache:
+    """LRU-кэш строк users по chat_id с ограниченным временем жизни.
+
+    Обработчики бота читают профиль на каждое нажатие кнопки; запись
+    в БД через Database/AsyncDatabase сразу кладёт в кэш новую строку,
+    поэтому TTL нужен только на случай изменений в обход этого процесса.
+    """
+
+    def __init__(self, size: int = None, ttl: float = None):
+        self.size = size if size is not None else int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+        self.ttl = ttl if ttl is not None else float(os.getenv('PROFILE_CACHE_TTL', 300))
+        self._rows = OrderedDict()   # chat_id -> (expires_at, row)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, chat_id):
+        with self._lock:
+            entry = self._rows.get(chat_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._rows[chat_id]
+                entry = None
+            if entry is None:
+                METRICS.inc('profile_cache_total', result='miss')
+                return None
+            self._rows.move_to_end(chat_id)
+        METRICS.inc('profile_cache_total', result='hit')
+        return entry[1]
+
+    def put(self, chat_id, row):
+        if row is None or self.size <= 0:
+            self.invalidate(chat_id)
+            return
+        with self._lock:
+            self._rows[chat_id] = (time.monotonic() + self.ttl, row)
+            self._rows.move_to_end(chat_id)
+            while len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, chat_id):
+        with self._lock:
+            self._rows.pop(chat_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
@@ -0,0 +1,253 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import psycopg
+
+from .database import build_dsn
+from ..metrics import METRICS
+
+
+ARCHIVE_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'archive_schema.sql')
+
+
+class ProjectArchive:
+    """Архив опубликованных проектов в секционированной по дням таблице projects.
+
+    Парсеры через ProjectPublisher только кладут проекты в очередь (put_nowait),
+    поэтому публикация в Redis не ждёт базу. Фоновый поток забирает проекты
+    пачками и пишет их одним COPY, когда набралось batch_size проектов или
+    прошло flush_ms миллисекунд с первого проекта пачки. COPY идёт во временную
+    таблицу, откуда строки переносятся с ON CONFLICT DO NOTHING: повторная
+    публикация проекта не ломает пачку. Раз в час поток удаляет секции старше
+    retention_days. При переполнении очереди проекты отбрасываются и считаются
+    в archive_dropped_total.
+
+    Ошибки соединения повторяются, пока база не вернётся. Если же пачка
+    max_attempts раз подряд падает по другой причине (данные, которые база
+    не принимает), она делится пополам до отдельных строк: записывается всё,
+    что можно, а плохие строки отбрасываются с reason="flush_error".
+    """
+
+    PARTITION = 'projects_p{day:%Y%m%d}'
+    CREATE_PARTITION_QUERY = """
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF projects
+        FOR VALUES FROM ('{start}') TO ('{end}');
+    """
+    STAGING_QUERY = """
+        CREATE TEMP TABLE IF NOT EXISTS projects_staging (LIKE projects INCLUDING DEFAULTS)
+        ON COMMIT DELETE ROWS;
+    """
+    COPY_QUERY = """
+        COPY projects_staging (source, project_id, title, description, url, budget_min, budget_max, currency, published_at)
+        FROM STDIN
+    """
+    MOVE_QUERY = 'INSERT INTO projects SELECT * FROM projects_staging ON CONFLICT DO NOTHING;'
+    PARTITIONS_QUERY = """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'projects'::regclass;
+    """
+    RETENTION_INTERVAL = 3600
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, batch_size: int = None, flush_ms: int = None, retention_days: int = None, max_queue: int = None,
+                 max_attempts: int = None):
+        self.dsn = build_dsn()
+        self.batch_size = batch_size or int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+        self.flush_interval = (flush_ms or int(os.getenv('ARCHIVE_FLUSH_MS', 2000))) / 1000
+        self.retention_days = retention_days or int(os.getenv('ARCHIVE_RETENTION_DAYS', 90))
+        self.retry_delay = 5
+        self.max_attempts = max_attempts or int(os.getenv('ARCHIVE_MAX_ATTEMPTS', 3))
+        self._failures = 0
+        self.queue = queue.Queue(maxsize=max_queue or int(os.getenv('ARCHIVE_MAX_QUEUE', 50000)))
+        self.pid = os.getpid()
+        self.conn = None
+        self._partitions = set()
+        self._pending = []
+        self._stop = threading.Event()
+        self._thread = None
+        METRICS.gauge_callback('archive_queue_depth', self.queue.qsize)
+
+    @classmethod
+    def shared(cls):
+        """Общий архив процесса для всех публикаций; None, если PROJECT_ARCHIVE=off"""
+        if os.getenv('PROJECT_ARCHIVE', 'on') != 'on':
+            return None
+        with cls._shared_lock:
+            # После fork поток родителя в дочернем процессе не существует
+            if cls._shared is None or cls._shared.pid != os.getpid():
+                cls._shared = cls().start()
+                atexit.register(cls._shared.close)
+            return cls._shared
+
+    def add(self, project):
+        try:
+            self.queue.put_nowait(project)
+        except queue.Full:
+            METRICS.inc('archive_dropped_total', reason='queue_full')
+
+    def add_many(self, projects):
+        for project in projects:
+            self.add(project)
+
+    @staticmethod
+    def text(value):
+        # PostgreSQL не принимает NUL в текстовых полях, а в описаниях с площадок он встречается
+        if value is None:
+            return None
+        return str(value).replace('\x00', '')
+
+    @classmethod
+    def row(cls, project):
+        timestamp = project.timestamp
+        if timestamp is None:
+            # published_at входит в первичный ключ: время публикации дало бы новую строку
+            # на каждую повторную публикацию, начало суток (UTC) одинаково для них всех
+            now = datetime.now(timezone.utc)
+            published_at = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+        else:
+            published_at = datetime.fromtimestamp(float(timestamp), timezone.utc)
+        budget = project.budget
+        return (
+            project.source, cls.text(project.id), cls.text(project.title), cls.text(project.description),
+            cls.text(project.url), budget.minimum, budget.maximum, cls.text(budget.currency), published_at
+        )
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg.connect(self.dsn, autocommit=True)
+            with open(ARCHIVE_SCHEMA_PATH, encoding='utf-8') as f:
+                self.conn.execute(f.read())
+            self.conn.execute(self.STAGING_QUERY)
+            self._partitions.clear()
+        return self.conn
+
+    def _ensure_partitions(self, conn, days):
+        for day in days - self._partitions:
+            conn.execute(self.CREATE_PARTITION_QUERY.format(
+                name=self.PARTITION.format(day=day),
+                start=f'{day.isoformat()} 00:00+00',
+                end=f'{(day + timedelta(days=1)).isoformat()} 00:00+00'
+            ))
+            self._partitions.add(day)
+
+    def oldest_day(self) -> date:
+        """Первый день (UTC), который ещё хранится; секции и проекты раньше него не нужны"""
+        return datetime.now(timezone.utc).date() - timedelta(days=self.retention_days)
+
+    def flush(self):
+        """Запись накопленной пачки одним COPY; при ошибке пачка остаётся до следующей попытки"""
+        oldest = self.oldest_day()
+        rows = [row for row in map(self.row, self._pending) if row[-1].date() >= oldest]
+        if rows:
+            try:
+                self._write(rows)
+            except psycopg.OperationalError:
+                raise
+            except Exception as e:
+                self._failures += 1
+                if self._failures < self.max_attempts:
+                    raise
+                print(f'Архив проектов: пачка из {len(rows)} не записана {self._failures} раз ({e}), ищем плохие строки', flush=True)
+                self._write_isolating(rows)
+        self._pending = []
+        self._failures = 0
+
+    def _write(self, rows):
+        conn = self._connection()
+        with METRICS.timer('archive_flush_seconds'):
+            with conn.transaction():
+                self._ensure_partitions(conn, {row[-1].date() for row in rows})
+                with conn.cursor() as cur:
+                    with cur.copy(self.COPY_QUERY) as copy:
+                        for row in rows:
+                            copy.write_row(row)
+                    cur.execute(self.MOVE_QUERY)
+        METRICS.inc('archive_rows_total', len(rows))
+
+    def _write_isolating(self, rows):
+        """Запись половинами до отдельных строк; ошибка соединения прерывает поиск, пачка останется целиком"""
+        try:
+            self._write(rows)
+        except psycopg.OperationalError:
+            raise
+        except Exception as e:
+            if len(rows) == 1:
+                METRICS.inc('archive_dropped_total', reason='flush_error')
+                print(f'Архив проектов: проект {rows[0][0]}/{rows[0][1]} отброшен: {e}', flush=True)
+                return
+            # Уже записанные половины при повторе не задвоятся: перенос идёт с ON CONFLICT DO NOTHING
+            middle = len(rows) // 2
+            self._write_isolating(rows[:middle])
+            self._write_isolating(rows[middle:])
+
+    def drop_old_partitions(self):
+        """Удаление секций, целиком вышедших за срок хранения"""
+        oldest = self.oldest_day()
+        conn = self._connection()
+        dropped = []
+        for (name,) in conn.execute(self.PARTITIONS_QUERY).fetchall():
+            try:
+                day = datetime.strptime(name, 'projects_p%Y%m%d').date()
+            except ValueError:
+                continue
+            if day < oldest:
+                conn.execute(f'DROP TABLE IF EXISTS {name};')
+                self._partitions.discard(day)
+                dropped.append(name)
+        if dropped:
+            print(f'Архив проектов: удалены секции {", ".join(dropped)}', flush=True)
+        return dropped
+
+    def _collect(self):
+        """Добор пачки из очереди до batch_size проектов или истечения flush_interval"""
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self._pending.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+    def _run(self):
+        next_retention = 0.0
+        while True:
+            stopping = self._stop.is_set()
+            self._collect()
+            try:
+                if self._pending:
+                    self.flush()
+                if time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + self.RETENTION_INTERVAL
+                    self.drop_old_partitions()
+            except Exception as e:
+                print(f'Ошибка записи архива проектов ({len(self._pending)} в пачке): {e}', flush=True)
+                if self.conn is not None:
+                    self.conn.close()
+                if stopping or self._stop.wait(self.retry_delay):
+                    return
+            if stopping and self.queue.empty() and not self._pending:
+                return
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='ProjectArchive', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = 10):
+        """Дописывает очередь и останавливает поток"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.conn is not None:
+            self.conn.close()
@@ -0,0 +1,41 @@
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    chat_id TEXT UNIQUE,
+    keywords TEXT,
+    mailing_kwork BOOLEAN DEFAULT TRUE,
+    mailing_fl BOOLEAN DEFAULT TRUE,
+    mailing_freelancer BOOLEAN DEFAULT TRUE
+);
+
+-- Нормализованные ключевые слова: keywords в нижнем регистре, разбитые по запятым,
+-- без пробелов по краям и пустых элементов. Поддерживается триггером при любой записи keywords.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS keyword_list TEXT[];
+
+CREATE OR REPLACE FUNCTION users_keyword_list() RETURNS trigger AS $$
+BEGIN
+    NEW.keyword_list := ARRAY(
+        SELECT DISTINCT btrim(keyword)
+        FROM unnest(string_to_array(lower(COALESCE(NEW.keywords, '')), ',')) AS keyword
+        WHERE btrim(keyword) <> ''
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_users_keyword_list
+    BEFORE INSERT OR UPDATE OF keywords ON users
+    FOR EACH ROW EXECUTE FUNCTION users_keyword_list();
+
+-- Миграция существующих строк: UPDATE keywords запускает триггер
+UPDATE users SET keywords = keywords WHERE keyword_list IS NULL;
+
+-- B-tree по всей строке keywords не помогал ни одному запросу
+DROP INDEX IF EXISTS idx_users_keywords;
+
+-- Подбор получателей: GIN по ключевым словам только среди подписанных на платформу
+CREATE INDEX IF NOT EXISTS idx_users_keywords_kwork ON users USING GIN (keyword_list) WHERE mailing_kwork;
+CREATE INDEX IF NOT EXISTS idx_users_keywords_fl ON users USING GIN (keyword_list) WHERE mailing_fl;
+CREATE INDEX IF NOT EXISTS idx_users_keywords_freelancer ON users USING GIN (keyword_list) WHERE mailing_freelancer;
+
+-- Пользователи без ключевых слов получают все проекты платформы
+CREATE INDEX IF NOT EXISTS idx_users_catch_all ON users (chat_id) WHERE cardinality(keyword_list) = 0;
@@ -0,0 +1,3 @@
+from .project_bus import ProjectPublisher, ProjectConsumer
+
+__all__ = ['ProjectPublisher', 'ProjectConsumer']
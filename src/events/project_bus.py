@@ -0,0 +1,279 @@
+import json
+import os
+import socket
+import time
+
+from redis.exceptions import ResponseError
+
+from ..db.project_archive import ProjectArchive
+from ..metrics import METRICS
+from ..models import Project
+from ..models.project import get_wire_format
+
+
+def get_transport():
+    transport = os.getenv('EVENT_TRANSPORT', 'streams')
+    if transport not in ('streams', 'pubsub'):
+        raise ValueError(f'Неизвестный EVENT_TRANSPORT: {transport}')
+    return transport
+
+
+class ProjectPublisher:
+    """Публикация проектов от парсеров: Redis Stream с обрезкой по MAXLEN или pub/sub."""
+
+    def __init__(self, redis_client, transport: str = None):
+        self.redis_client = redis_client
+        self.transport = transport or get_transport()
+        self.stream = os.getenv('PROJECTS_STREAM', 'projects')
+        self.maxlen = int(os.getenv('PROJECTS_STREAM_MAXLEN', 10000))
+        # msgpack — компактный бинарный Project, json — прежний формат для старых потребителей
+        self.wire_format = get_wire_format()
+        # Архив в PostgreSQL пишется фоновым потоком, публикация только ставит проекты в очередь
+        self.archive = ProjectArchive.shared()
+
+    def publish(self, channel: str, message):
+        self.publish_many(channel, [message])
+
+    def publish_many(self, channel: str, messages):
+        messages = list(messages)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for message in messages:
+            if isinstance(message, Project):
+                data = message.encode(self.wire_format)
+            else:
+                data = json.dumps(message)
+            if self.transport == 'streams':
+                pipe.xadd(self.stream, {'channel': channel, 'data': data}, maxlen=self.maxlen, approximate=True)
+            else:
+                pipe.publish(channel, data)
+        pipe.execute()
+        METRICS.inc('redis_roundtrips_total', component='publisher')
+        if self.archive is not None:
+            self.archive.add_many(message for message in messages if isinstance(message, Project))
+
+
+class ProjectConsumer:
+    """Асинхронное чтение проектов для NotificationService.
+
+    data отдаётся байтами как есть: это msgpack или JSON, разбирает их Project.decode.
+
+    В режиме streams чтение идёт через группу потребителей: сначала дочитываются
+    собственные неподтверждённые записи, записи упавших потребителей
+    периодически забираются через XAUTOCLAIM, а подтверждение (XACK) делается
+    вызовом ack() после доставки. В режиме pubsub ack ничего не делает.
+    Имя потребителя по умолчанию — хост и pid, чтобы процессы одного хоста
+    не читали чужие неподтверждённые записи; записи упавшего процесса заберёт
+    XAUTOCLAIM, а с постоянным EVENT_CONSUMER их сразу дочитает перезапущенный.
+
+    Группа шарда, появившегося при перераспределении, создаётся не с '$',
+    а с позиции самой отстающей живой группы рассылки (PROJECTS_GROUP и её
+    шардов в пределах shard_count): иначе проекты, опубликованные до её
+    создания, не получили бы перешедшие к новому шарду пользователи. Какие
+    из этих проектов они уже получили от прежнего шарда, решает ShardHandoff.
+    """
+
+    def __init__(self, redis_client, channels, group: str = None, consumer: str = None, transport: str = None,
+                 family: str = None, shard_count: int = None):
+        self.redis_client = redis_client
+        self.channels = list(channels)
+        self.transport = transport or get_transport()
+        self.stream = os.getenv('PROJECTS_STREAM', 'projects')
+        # Группы рассылки: базовая (шард 0) и группы шардов base-N, читающие тот же поток
+        self.family = family or os.getenv('PROJECTS_GROUP', 'notifications')
+        self.group = group or self.family
+        # Группы шардов с номером не меньше shard_count остались от уменьшения числа шардов
+        self.shard_count = shard_count
+        self.consumer = consumer or os.getenv('EVENT_CONSUMER') or f'{socket.gethostname()}-{os.getpid()}'
+        self.batch_size = int(os.getenv('PROJECTS_READ_COUNT', 100))
+        self.block_ms = 5000
+        self.claim_idle_ms = int(os.getenv('PROJECTS_CLAIM_IDLE_MS', 600000))
+        self.claim_interval = 60
+        self._inflight = set()
+
+    @staticmethod
+    def parse_id(entry_id):
+        """id записи потока как пара чисел — для сравнения позиций"""
+        if isinstance(entry_id, bytes):
+            entry_id = entry_id.decode('utf-8')
+        ms, _, seq = entry_id.partition('-')
+        return int(ms), int(seq or 0)
+
+    def family_shard(self, group: str):
+        """Номер шарда группы рассылки или None для посторонней группы"""
+        if group == self.family:
+            return 0
+        prefix = f'{self.family}-'
+        if group.startswith(prefix) and group[len(prefix):].isdigit():
+            return int(group[len(prefix):])
+        return None
+
+    async def group_positions(self, shard_count: int = None) -> dict:
+        """last-delivered-id групп рассылки по номерам шардов; shard_count ограничивает номера"""
+        shard_count = self.shard_count if shard_count is None else shard_count
+        try:
+            groups = await self.redis_client.xinfo_groups(self.stream)
+        except ResponseError:
+            return {}
+        positions = {}
+        for info in groups:
+            name = info.get('name')
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+            shard_id = self.family_shard(name)
+            if shard_id is None or (shard_count is not None and shard_id >= shard_count):
+                continue
+            position = info.get('last-delivered-id')
+            positions[shard_id] = position.decode('utf-8') if isinstance(position, bytes) else position
+        return positions
+
+    async def _start_id(self):
+        """Позиция новой группы: last-delivered-id самой отстающей живой группы рассылки или '$', если их нет"""
+        own = self.family_shard(self.group)
+        if own is None:
+            return '$'
+        positions = [position for shard_id, position in (await self.group_positions()).items() if shard_id != own]
+        if not positions:
+            return '$'
+        return min(positions, key=self.parse_id)
+
+    async def ensure_group(self):
+        """Создаёт группу, если её нет; возвращает позицию, с которой она создана, иначе None"""
+        try:
+            start_id = await self._start_id()
+            await self.redis_client.xgroup_create(self.stream, self.group, id=start_id, mkstream=True)
+            print(f'Создана группа потребителей {self.group} для потока {self.stream} с позиции {start_id}', flush=True)
+            return start_id
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        return None
+
+    async def destroy_group(self, group: str = None):
+        group = group or self.group
+        try:
+            if await self.redis_client.xgroup_destroy(self.stream, group):
+                print(f'Удалена группа потребителей {group} потока {self.stream}', flush=True)
+        except ResponseError as e:
+            print(f'Ошибка удаления группы {group}: {e}', flush=True)
+
+    async def consume(self):
+        """Асинхронный генератор троек (entry_id, channel, data)"""
+        if self.transport == 'pubsub':
+            async for item in self._consume_pubsub():
+                yield item
+        else:
+            async for item in self._consume_streams():
+                yield item
+
+    async def ack(self, entry_id):
+        if entry_id is None:
+            return
+        self._inflight.discard(entry_id)
+        try:
+            await self.redis_client.xack(self.stream, self.group, entry_id)
+            METRICS.inc('redis_roundtrips_total', component='consumer')
+        except Exception as e:
+            print(f'Ошибка подтверждения записи {entry_id}: {e}', flush=True)
+
+    def _decode(self, entry_id, fields):
+        if isinstance(entry_id, bytes):
+            entry_id = entry_id.decode('utf-8')
+        channel = fields.get(b'channel', b'').decode('utf-8')
+        return entry_id, channel, fields.get(b'data', b'')
+
+    async def _consume_pubsub(self):
+        pubsub = self.redis_client.pubsub()
+        await pubsub.subscribe(*self.channels)
+        print(f'Подписались на каналы: {", ".join(self.channels)}', flush=True)
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                channel = message.get('channel')
+                if isinstance(channel, bytes):
+                    channel = channel.decode('utf-8')
+                yield None, channel, message.get('data')
+        finally:
+            try:
+                await pubsub.unsubscribe(*self.channels)
+                await pubsub.close()
+            except Exception as e:
+                print(f'Ошибка закрытия pubsub: {e}', flush=True)
+
+    async def _consume_streams(self):
+        await self.ensure_group()
+        print(f'Читаем поток {self.stream} в группе {self.group} как {self.consumer}', flush=True)
+
+        # Сначала собственные записи, полученные до рестарта и не подтверждённые
+        pending_from = '0'
+        next_claim = 0.0
+        while True:
+            if time.monotonic() >= next_claim:
+                next_claim = time.monotonic() + self.claim_interval
+                for entry_id, fields in await self._claim_stale():
+                    item = self._accept(entry_id, fields)
+                    if item:
+                        yield item
+
+            read_id = pending_from or '>'
+            try:
+                response = await self.redis_client.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {self.stream: read_id},
+                    count=self.batch_size,
+                    block=None if pending_from else self.block_ms
+                )
+            except ResponseError as e:
+                if 'NOGROUP' not in str(e):
+                    raise
+                # Группу удалил шард, выведенный из работы при уменьшении их числа
+                print(f'Группа {self.group} потока {self.stream} удалена, чтение остановлено', flush=True)
+                return
+            METRICS.inc('redis_roundtrips_total', component='consumer')
+            entries = response[0][1] if response else []
+            if pending_from:
+                if not entries:
+                    pending_from = None
+                    continue
+                pending_from = entries[-1][0]
+
+            for entry_id, fields in entries:
+                item = self._accept(entry_id, fields)
+                if item:
+                    yield item
+
+    def _accept(self, entry_id, fields):
+        if isinstance(entry_id, bytes):
+            entry_id = entry_id.decode('utf-8')
+        if not fields:
+            # Запись уже вытеснена MAXLEN, доставлять нечего
+            self._inflight.add(entry_id)
+            return entry_id, None, None
+        if entry_id in self._inflight:
+            return None
+        self._inflight.add(entry_id)
+        return self._decode(entry_id, fields)
+
+    async def _claim_stale(self):
+        """Записи, которые слишком долго висят у других (вероятно, упавших) потребителей"""
+        claimed = []
+        start_id = '0-0'
+        try:
+            while True:
+                response = await self.redis_client.xautoclaim(
+                    self.stream, self.group, self.consumer,
+                    min_idle_time=self.claim_idle_ms,
+                    start_id=start_id,
+                    count=self.batch_size
+                )
+                METRICS.inc('redis_roundtrips_total', component='consumer')
+                start_id, entries = response[0], response[1]
+                claimed.extend(entries)
+                if start_id in (b'0-0', '0-0') or not entries:
+                    break
+        except ResponseError as e:
+            print(f'Ошибка XAUTOCLAIM: {e}', flush=True)
+        if claimed:
+            print(f'Забрано {len(claimed)} зависших записей потока {self.stream}', flush=True)
+        return claimed
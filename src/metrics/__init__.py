@@ -0,0 +1,5 @@
+from .registry import MetricsRegistry, METRICS
+from .flusher import MetricsFlusher
+from .exporter import MetricsExporter
+
+__all__ = ['MetricsRegistry', 'METRICS', 'MetricsFlusher', 'MetricsExporter']
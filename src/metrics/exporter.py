@@ -0,0 +1,143 @@
+import json
+import os
+
+from aiohttp import web
+
+from .flusher import MetricsFlusher
+
+
+PREFIX = 'freelancescout_'
+
+METRIC_HELP = {
+    'fetch_seconds': 'Время загрузки данных источника',
+    'parse_seconds': 'Время разбора ответа источника',
+    'bytes_downloaded_total': 'Байт загружено от источника',
+    'fl_not_modified_total': 'Ответов 304 на условный запрос RSS FL',
+    'items_fetched_total': 'Проектов получено от источника',
+    'items_new_total': 'Новых проектов опубликовано',
+    'items_duplicate_total': 'Проектов отброшено как уже виденные',
+    'redis_roundtrips_total': 'Обращений к Redis по компонентам',
+    'match_seconds': 'Время подбора получателей проекта',
+    'recipients_per_project': 'Число получателей одного проекта',
+    'send_seconds': 'Время отправки одного уведомления в Telegram',
+    'telegram_errors_total': 'Ошибки Telegram по типам',
+    'delivery_queue_depth': 'Задач в очереди доставки',
+    'profile_cache_total': 'Обращения к кэшу профилей пользователей (hit/miss)',
+    'archive_rows_total': 'Проектов записано в архив PostgreSQL',
+    'archive_flush_seconds': 'Время записи одной пачки архива (COPY)',
+    'archive_dropped_total': 'Проектов не попало в архив из-за переполнения очереди',
+    'archive_queue_depth': 'Проектов в очереди записи архива',
+    'recent_projects': 'Проектов в окне недавних для досылки и /search',
+    'backfill_projects_total': 'Проектов дослано после смены ключевых слов',
+}
+
+
+def with_process_label(key: str, process: str) -> str:
+    pairs = [tuple(pair) for pair in json.loads(key)]
+    pairs.append(('process', process))
+    return json.dumps(sorted(pairs))
+
+
+def combine(snapshots):
+    """Снимки процессов в один набор серий с меткой process.
+
+    Счётчики не складываются: снимок перезапущенного или упавшего процесса
+    исчезает по TTL, и сумма уменьшалась бы, что Prometheus принимает за сброс.
+    Серии каждого процесса монотонны сами по себе, суммирование — в PromQL:
+    sum without (process) (rate(...)).
+    """
+    combined = {'counters': {}, 'gauges': {}, 'histograms': {}}
+    for process, snapshot in snapshots:
+        for kind in combined:
+            for name, series in snapshot.get(kind, {}).items():
+                target = combined[kind].setdefault(name, {})
+                for key, value in series.items():
+                    target[with_process_label(key, process)] = value
+    return combined
+
+
+def escape_label_value(value) -> str:
+    """Экранирование значения метки по текстовому формату Prometheus: \\, \" и \\n"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(key: str, extra=None) -> str:
+    pairs = [tuple(pair) for pair in json.loads(key)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+def render(combined) -> str:
+    """Текстовый формат Prometheus"""
+    lines = []
+
+    def header(name, kind):
+        lines.append(f'# HELP {PREFIX}{name} {METRIC_HELP.get(name, name)}')
+        lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+    for kind, prom_type in (('counters', 'counter'), ('gauges', 'gauge')):
+        for name, series in sorted(combined[kind].items()):
+            header(name, prom_type)
+            for key, value in sorted(series.items()):
+                lines.append(f'{PREFIX}{name}{format_labels(key)} {value}')
+
+    for name, series in sorted(combined['histograms'].items()):
+        header(name, 'histogram')
+        for key, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                cumulative += count
+                lines.append(f'{PREFIX}{name}_bucket{format_labels(key, ("le", bound))} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{format_labels(key)} {histogram["sum"]}')
+            lines.append(f'{PREFIX}{name}_count{format_labels(key)} {histogram["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """HTTP-эндпоинт /metrics с метриками всех процессов, собранными из Redis"""
+
+    def __init__(self, redis_client, host: str = None, port: int = None):
+        self.redis_client = redis_client
+        # 127.0.0.1 — только локальный Prometheus; 0.0.0.0 — скрейп из-за пределов хоста или контейнера
+        self.host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+        self.port = port or int(os.getenv('METRICS_PORT', 9108))
+        self._runner = None
+
+    async def collect(self):
+        names = await self.redis_client.smembers(MetricsFlusher.PROCESSES_KEY)
+        if not names:
+            return []
+
+        names = sorted(name.decode('utf-8') if isinstance(name, bytes) else name for name in names)
+        values = await self.redis_client.mget([MetricsFlusher.KEY.format(name=name) for name in names])
+        snapshots = []
+        stale = []
+        for name, value in zip(names, values):
+            if value is None:
+                stale.append(name)
+                continue
+            snapshots.append((name, json.loads(value)))
+        if stale:
+            await self.redis_client.srem(MetricsFlusher.PROCESSES_KEY, *stale)
+        return snapshots
+
+    async def handle_metrics(self, request):
+        body = render(combine(await self.collect()))
+        return web.Response(text=body, content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f'Метрики доступны на http://{self.host}:{self.port}/metrics', flush=True)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
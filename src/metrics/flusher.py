@@ -0,0 +1,51 @@
+import json
+import os
+import socket
+import threading
+
+from .registry import METRICS
+
+
+class MetricsFlusher:
+    """Периодически сохраняет снимок метрик процесса в Redis.
+
+    Каждый процесс (бот, процессы ApplicationParser, worker.py) пишет свой
+    снимок в metrics:process:{name} с TTL в несколько интервалов и
+    регистрируется в множестве metrics:processes. Экспортёр отдаёт снимки
+    всех живых процессов с меткой process; снимок упавшего процесса исчезает по TTL.
+    """
+
+    KEY = 'metrics:process:{name}'
+    PROCESSES_KEY = 'metrics:processes'
+
+    def __init__(self, redis_client, role: str, registry=None, interval: float = None):
+        self.redis_client = redis_client
+        self.registry = registry or METRICS
+        self.name = f'{role}-{socket.gethostname()}-{os.getpid()}'
+        self.key = self.KEY.format(name=self.name)
+        self.interval = interval or float(os.getenv('METRICS_FLUSH_INTERVAL', 10))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.set(self.key, json.dumps(self.registry.snapshot()), ex=int(self.interval * 3) + 1)
+        pipe.sadd(self.PROCESSES_KEY, self.name)
+        pipe.execute()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f'Ошибка сохранения метрик {self.name}: {e}', flush=True)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='MetricsFlusher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
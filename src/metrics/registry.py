@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class MetricsRegistry:
+    """Счётчики, gauge и гистограммы одного процесса.
+
+    Значения хранятся под ключом из отсортированных меток, поэтому снимок
+    (snapshot) сериализуется в JSON и отдаётся экспортёром вместе с метриками
+    других процессов под меткой process. Методы потокобезопасны: парсеры пишут метрики
+    из потоков.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._gauge_callbacks = {}
+
+    @staticmethod
+    def labels_key(labels: dict) -> str:
+        return json.dumps(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self.labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[self.labels_key(labels)] = value
+
+    def gauge_callback(self, name: str, func):
+        """Gauge, значение которого вычисляется при снятии снимка"""
+        with self._lock:
+            self._gauge_callbacks[name] = func
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = self.labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * (len(buckets) + 1),
+                    'sum': 0.0,
+                    'count': 0
+                }
+            histogram['counts'][bisect_left(histogram['buckets'], value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            callbacks = list(self._gauge_callbacks.items())
+            snapshot = {
+                'counters': {name: dict(series) for name, series in self._counters.items()},
+                'gauges': {name: dict(series) for name, series in self._gauges.items()},
+                'histograms': {
+                    name: {key: {**h, 'counts': list(h['counts'])} for key, h in series.items()}
+                    for name, series in self._histograms.items()
+                }
+            }
+        for name, func in callbacks:
+            try:
+                snapshot['gauges'].setdefault(name, {})[self.labels_key({})] = func()
+            except Exception as e:
+                print(f'Ошибка вычисления метрики {name}: {e}', flush=True)
+        return snapshot
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,3 @@
+from .project import Project, Budget
+
+__all__ = ['Project', 'Budget']
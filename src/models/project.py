@@ -0,0 +1,140 @@
+import json
+import os
+from typing import NamedTuple, Optional
+
+import msgpack
+
+
+# Канал уведомлений для каждой площадки
+CHANNELS = {
+    'fl': 'fl_projects',
+    'kwork': 'kwork_projects',
+    'freelancer': 'freelancer_projects'
+}
+SOURCES = {channel: source for source, channel in CHANNELS.items()}
+
+# Версия бинарного формата: первый элемент массива msgpack
+WIRE_VERSION = 1
+
+
+def get_wire_format():
+    wire_format = os.getenv('PROJECT_WIRE_FORMAT', 'msgpack')
+    if wire_format not in ('msgpack', 'json'):
+        raise ValueError(f'Неизвестный PROJECT_WIRE_FORMAT: {wire_format}')
+    return wire_format
+
+
+def to_number(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Budget(NamedTuple):
+    """Бюджет в числах: строки площадок ('3000.00') приводятся к float"""
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    currency: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, budget) -> 'Budget':
+        if not budget:
+            return cls()
+        return cls(to_number(budget.get('minimum')), to_number(budget.get('maximum')), budget.get('currency'))
+
+    def to_dict(self) -> dict:
+        return {'minimum': self.minimum, 'maximum': self.maximum, 'currency': self.currency}
+
+
+class Project:
+    """Проект с любой площадки в том виде, в каком его публикуют парсеры.
+
+    На провод уходит массивом msgpack без имён полей:
+    [версия, source, id, title, description, url, minimum, maximum, currency, timestamp].
+    decode принимает и прежний JSON-объект, канал которого задаёт source.
+    """
+
+    __slots__ = ('source', 'id', 'title', 'description', 'url', 'budget', 'timestamp')
+
+    def __init__(self, source: str, id, title: str = None, description: str = None, url: str = None,
+                 budget: Budget = None, timestamp: float = None):
+        self.source = source
+        self.id = id
+        self.title = title
+        self.description = description
+        self.url = url
+        self.budget = budget or Budget()
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'Project({self.source!r}, {self.id!r}, {self.title!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Project):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    @property
+    def channel(self) -> str:
+        return CHANNELS[self.source]
+
+    @property
+    def text(self) -> str:
+        """Текст для подбора получателей: только заголовок и описание, без ключей и ссылок"""
+        return f'{self.title or ""} {self.description or ""}'
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'url': self.url,
+            'budget': self.budget.to_dict(),
+            'timestamp': self.timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, source: str, data: dict) -> 'Project':
+        return cls(
+            source,
+            data.get('id'),
+            data.get('title'),
+            data.get('description'),
+            data.get('url'),
+            Budget.from_dict(data.get('budget')),
+            data.get('timestamp')
+        )
+
+    def encode(self, wire_format: str = 'msgpack') -> bytes:
+        if wire_format == 'json':
+            return json.dumps(self.to_dict()).encode('utf-8')
+        budget = self.budget
+        return msgpack.packb([
+            WIRE_VERSION, self.source, self.id, self.title, self.description, self.url,
+            budget.minimum, budget.maximum, budget.currency, self.timestamp
+        ])
+
+    @classmethod
+    def decode(cls, data, channel: str = None) -> 'Project':
+        """Проект из msgpack или JSON; ValueError, если данные не разбираются"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if data[:1] == b'{':
+            try:
+                return cls.from_dict(SOURCES.get(channel), json.loads(data))
+            except (ValueError, AttributeError) as e:
+                raise ValueError(f'Некорректный JSON проекта: {e}') from e
+
+        try:
+            fields = msgpack.unpackb(data)
+        except Exception as e:
+            raise ValueError(f'Некорректный msgpack проекта: {e}') from e
+        if not isinstance(fields, list) or not fields:
+            raise ValueError('Некорректный проект: ожидался массив msgpack')
+        if fields[0] != WIRE_VERSION:
+            raise ValueError(f'Неподдерживаемая версия формата проекта: {fields[0]}')
+        _, source, project_id, title, description, url, minimum, maximum, currency, timestamp = fields
+        return cls(source, project_id, title, description, url, Budget(minimum, maximum, currency), timestamp)
@@ -1,3 +1,10 @@
+from .keyword_matcher import KeywordMatcher
+from .stem_matcher import StemMatcher
+from .subscriber_index import SubscriberIndex
+from .delivery_scheduler import DeliveryScheduler, TokenBucket
+from .sharding import ShardAssignment, ShardHandoff
+from .message_renderer import MessageRenderer, PreparedMessage
+from .recent_projects import RecentProjectsIndex
 from .notification_service import NotificationService
 
-__all__ = ['NotificationService']
+__all__ = ['KeywordMatcher', 'StemMatcher', 'SubscriberIndex', 'DeliveryScheduler', 'TokenBucket', 'ShardAssignment', 'ShardHandoff', 'MessageRenderer', 'PreparedMessage', 'RecentProjectsIndex', 'NotificationService']
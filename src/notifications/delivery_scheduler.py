@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+from aiogram.enums import ParseMode
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError
+)
+
+from ..metrics import METRICS
+
+
+class TokenBucket:
+    """Глобальный лимит отправки: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        # Токены копятся только после паузы, иначе сразу за ней ушла бы полная пачка capacity
+        self._updated = self._paused_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DeliveryJob:
+    __slots__ = ('chat_id', 'text', 'reply_markup', 'label', 'attempts', 'on_complete')
+
+    def __init__(self, chat_id, text, reply_markup=None, label='', on_complete=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.reply_markup = reply_markup
+        self.label = label
+        self.attempts = 0
+        self.on_complete = on_complete
+
+
+class DeliveryScheduler:
+    """Пул воркеров отправки уведомлений поверх общей очереди.
+
+    Постановка в очередь не блокирует приём проектов. Отправка ограничена
+    глобальным token bucket и минимальным интервалом между сообщениями
+    в один чат; TelegramRetryAfter и временные ошибки приводят к
+    повторной постановке задачи, а не к потере сообщения.
+    """
+
+    def __init__(self, bot, workers: int = 16, rate: float = 30, per_chat_interval: float = 1.0, max_attempts: int = 5):
+        self.bot = bot
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_attempts = max_attempts
+
+        self.queue = asyncio.Queue()
+        self._chat_ready_at = {}
+        self._delayed = set()
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for handle in self._delayed:
+            handle.cancel()
+        self._delayed.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def qsize(self):
+        return self.queue.qsize() + len(self._delayed)
+
+    def submit(self, chat_id, text, reply_markup=None, label='', on_complete=None):
+        """on_complete вызывается, когда задача доставлена или окончательно отброшена"""
+        self.queue.put_nowait(DeliveryJob(chat_id, text, reply_markup, label, on_complete))
+
+    @staticmethod
+    def _complete(job: DeliveryJob):
+        if job.on_complete is None:
+            return
+        try:
+            job.on_complete()
+        except Exception as e:
+            print(f'Ошибка обработчика завершения доставки: {e}', flush=True)
+
+    def _reschedule(self, job: DeliveryJob, delay: float):
+        loop = asyncio.get_running_loop()
+        handle = None
+
+        def put_back():
+            self._delayed.discard(handle)
+            self.queue.put_nowait(job)
+
+        handle = loop.call_later(delay, put_back)
+        self._delayed.add(handle)
+
+    async def _worker(self, number: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._deliver(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Ошибка воркера доставки {number}: {e}', flush=True)
+                self._complete(job)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, job: DeliveryJob):
+        now = time.monotonic()
+        ready_at = self._chat_ready_at.get(job.chat_id, 0.0)
+        if ready_at > now:
+            self._reschedule(job, ready_at - now)
+            return
+
+        # Место в чате занимается до ожидания токена: другая задача того же чата уйдёт на повтор
+        self._chat_ready_at[job.chat_id] = now + self.per_chat_interval
+        await self.bucket.acquire()
+        self._chat_ready_at[job.chat_id] = time.monotonic() + self.per_chat_interval
+        job.attempts += 1
+        try:
+            with METRICS.timer('send_seconds'):
+                await self.bot.send_message(
+                    job.chat_id,
+                    job.text,
+                    reply_markup=job.reply_markup,
+                    parse_mode=ParseMode.HTML
+                )
+            print(f'Уведомление отправлено пользователю {job.chat_id} с данными проекта: {job.label}', flush=True)
+            self._complete(job)
+        except TelegramRetryAfter as e:
+            METRICS.inc('telegram_errors_total', type=type(e).__name__)
+            # Флуд-контроль Telegram: притормаживаем все отправки и повторяем задачу
+            print(f'Превышен лимит Telegram, повтор через {e.retry_after} с для {job.chat_id}', flush=True)
+            self.bucket.pause(e.retry_after)
+            self._chat_ready_at[job.chat_id] = time.monotonic() + e.retry_after
+            self._reschedule(job, e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            METRICS.inc('telegram_errors_total', type=type(e).__name__)
+            print(f'Уведомление пользователю {job.chat_id} не может быть доставлено: {e}', flush=True)
+            self._complete(job)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            METRICS.inc('telegram_errors_total', type=type(e).__name__)
+            if job.attempts >= self.max_attempts:
+                print(f'Ошибка отправки уведомления пользователю {job.chat_id}: {e}', flush=True)
+                self._complete(job)
+                return
+            self._reschedule(job, 2 ** job.attempts)
+        finally:
+            self._cleanup_chat_limits()
+
+    def _cleanup_chat_limits(self):
+        if len(self._chat_ready_at) < 10000:
+            return
+        now = time.monotonic()
+        self._chat_ready_at = {chat_id: ready_at for chat_id, ready_at in self._chat_ready_at.items() if ready_at > now}
@@ -0,0 +1,162 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик по ключевым словам всех пользователей.
+
+    Каждое ключевое слово хранится в автомате один раз и отображается
+    на множество chat_id, которые на него подписаны. Текст проекта
+    сканируется за один проход, результатом сразу являются получатели.
+    """
+
+    # Доля "мёртвых" ключевых слов, после которой автомат пересобирается с нуля
+    COMPACT_RATIO = 0.5
+
+    def __init__(self):
+        self._subscribers = {}       # keyword -> set(chat_id)
+        self._user_keywords = {}     # chat_id -> frozenset(keyword)
+        self._catch_all = set()      # пользователи без ключевых слов получают всё
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._terminal = {}          # keyword -> node
+        self._dead = 0
+        self._dirty = False
+
+    @staticmethod
+    def parse_keywords(keywords):
+        if not keywords:
+            return frozenset()
+        return frozenset(kw.strip().lower() for kw in keywords.split(',') if kw.strip())
+
+    def __len__(self):
+        return len(self._user_keywords) + len(self._catch_all)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._user_keywords or chat_id in self._catch_all
+
+    def clear(self):
+        self.__init__()
+
+    def load(self, users):
+        """Загрузка пар (chat_id, keywords) с последующей однократной сборкой автомата."""
+        for chat_id, keywords in users:
+            self.set_user(chat_id, keywords)
+        self._build()
+
+    def set_user(self, chat_id, keywords):
+        new_keywords = self.parse_keywords(keywords)
+        old_keywords = self._user_keywords.get(chat_id, frozenset())
+        if chat_id in self._catch_all and not new_keywords:
+            return
+
+        self._catch_all.discard(chat_id)
+        for kw in old_keywords - new_keywords:
+            self._unsubscribe(chat_id, kw)
+        for kw in new_keywords - old_keywords:
+            self._subscribe(chat_id, kw)
+
+        if new_keywords:
+            self._user_keywords[chat_id] = new_keywords
+        else:
+            self._user_keywords.pop(chat_id, None)
+            self._catch_all.add(chat_id)
+
+    def remove_user(self, chat_id):
+        self._catch_all.discard(chat_id)
+        for kw in self._user_keywords.pop(chat_id, frozenset()):
+            self._unsubscribe(chat_id, kw)
+
+    def _subscribe(self, chat_id, keyword):
+        subscribers = self._subscribers.get(keyword)
+        if subscribers is None:
+            subscribers = self._subscribers[keyword] = set()
+            if keyword in self._terminal:
+                # Слово уже есть в автомате, достаточно вернуть ему подписчиков
+                self._dead -= 1
+            else:
+                self._insert(keyword)
+        subscribers.add(chat_id)
+
+    def _unsubscribe(self, chat_id, keyword):
+        subscribers = self._subscribers.get(keyword)
+        if subscribers is None:
+            return
+        subscribers.discard(chat_id)
+        if not subscribers:
+            # Узел остаётся в автомате до ближайшего уплотнения
+            del self._subscribers[keyword]
+            self._dead += 1
+            if self._dead > len(self._terminal) * self.COMPACT_RATIO:
+                self._dirty = True
+
+    def _insert(self, keyword):
+        node = 0
+        for ch in keyword:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._terminal[keyword] = node
+        self._dirty = True
+
+    def _build(self):
+        """Пересборка суффиксных ссылок и выходов; мёртвые слова отбрасываются."""
+        if self._dead:
+            self._goto, self._fail, self._output = [{}], [0], [()]
+            self._terminal = {}
+            self._dead = 0
+            for keyword in self._subscribers:
+                self._insert(keyword)
+
+        goto, fail = self._goto, self._fail
+        output = [[] for _ in goto]
+        for keyword, node in self._terminal.items():
+            output[node].append(keyword)
+
+        queue = deque()
+        for node in goto[0].values():
+            fail[node] = 0
+            queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                output[child].extend(output[fail[child]])
+                queue.append(child)
+
+        self._output = [tuple(out) for out in output]
+        self._dirty = False
+
+    def match_keywords(self, text):
+        if self._dirty:
+            self._build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+    def match(self, text):
+        """Множество chat_id, чьи ключевые слова встречаются в тексте (плюс подписчики без фильтра)."""
+        recipients = set(self._catch_all)
+        subscribers = self._subscribers
+        for keyword in self.match_keywords(text):
+            users = subscribers.get(keyword)
+            if users:
+                recipients |= users
+        return recipients
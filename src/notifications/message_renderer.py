@@ -0,0 +1,148 @@
+import json
+import os
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from ..metrics import METRICS
+from ..models import Project, Budget
+
+
+SOURCES = {
+    'fl_projects': ('🟢', 'FL'),
+    'kwork_projects': ('🔘', 'Kwork'),
+    'freelancer_projects': ('⚪', 'Freelancer'),
+}
+
+
+class PreparedMessage(NamedTuple):
+    """Готовое уведомление о проекте, общее для всех получателей"""
+    project_id: Optional[str]
+    channel: str
+    text: str
+    url: str
+    title: str
+    keyboard: Optional[InlineKeyboardMarkup]
+
+
+class MessageRenderer:
+    """Разбор и рендер проекта один раз на всю рассылку.
+
+    Готовые тексты кэшируются в памяти (LRU) и в Redis по id проекта, поэтому
+    повторная доставка и перечитывание потока после рестарта не рендерят
+    проект заново.
+    """
+
+    KEY = 'rendered:{channel}:{project_id}'
+    MAX_DESC_LENGTH = 200
+
+    def __init__(self, redis_client, ttl: int = None, local_size: int = 1000):
+        self.redis_client = redis_client
+        self.ttl = ttl or int(os.getenv('RENDERED_TTL', 86400))
+        self.local_size = local_size
+        self._local = OrderedDict()
+
+    @staticmethod
+    def format_value(value):
+        try:
+            value_float = float(value)
+            if value_float.is_integer():
+                return int(value_float)
+            else:
+                return round(value_float, 2)
+        except Exception:
+            return value
+
+    @classmethod
+    def format_budget(cls, project_budget: Budget) -> str:
+        if not project_budget:
+            return 'Бюджет не указан'
+
+        min_budget = project_budget.minimum
+        max_budget = project_budget.maximum
+        currency = project_budget.currency or ''
+
+        if min_budget is not None:
+            min_budget = cls.format_value(min_budget)
+        if max_budget is not None:
+            max_budget = cls.format_value(max_budget)
+
+        if min_budget and max_budget:
+            if min_budget == max_budget:
+                return f'Бюджет: {min_budget} {currency}'
+            return f'Бюджет: {min_budget} - {max_budget} {currency}'
+        elif min_budget:
+            return f'Бюджет: {min_budget} {currency}'
+        elif max_budget:
+            return f'Бюджет: {max_budget} {currency}'
+        return 'Бюджет не указан'
+
+    @classmethod
+    def render_text(cls, project: Project, channel: str):
+        """Текст уведомления, ссылка и заголовок проекта"""
+        project_title = project.title or 'Без названия'
+        project_desc = project.description or ''
+        project_url = project.url or ''
+
+        if len(project_desc) > cls.MAX_DESC_LENGTH:
+            project_desc = project_desc[:cls.MAX_DESC_LENGTH].rstrip()
+            project_desc += '...'
+
+        source_emoji, source_text = SOURCES.get(channel, ('', ''))
+        note_emoji = '📝'
+
+        message_text = (
+            f'{source_emoji} <b>{project_title}</b> ({source_text})\n\n'
+            f'{note_emoji} {project_desc}\n\n'
+            f'{cls.format_budget(project.budget)}'
+        )
+        return message_text, project_url, project_title
+
+    @staticmethod
+    def build(project_id, channel: str, text: str, url: str, title: str) -> PreparedMessage:
+        keyboard = None
+        if url:
+            keyboard = InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text='Перейти к проекту', url=url)]
+            ])
+        return PreparedMessage(project_id, channel, text, url, title, keyboard)
+
+    def _remember(self, key, message: PreparedMessage):
+        self._local[key] = message
+        self._local.move_to_end(key)
+        if len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def prepare(self, channel: str, project: Project) -> PreparedMessage:
+        project_id = project.id
+        if project_id is None:
+            return self.build(None, channel, *self.render_text(project, channel))
+
+        key = self.KEY.format(channel=channel, project_id=project_id)
+        message = self._local.get(key)
+        if message is not None:
+            self._local.move_to_end(key)
+            return message
+
+        cached = None
+        try:
+            cached = await self.redis_client.get(key)
+            METRICS.inc('redis_roundtrips_total', component='renderer')
+        except Exception as e:
+            print(f'Ошибка чтения кэша уведомления {key}: {e}', flush=True)
+
+        if cached:
+            rendered = json.loads(cached)
+            message = self.build(project_id, channel, rendered['text'], rendered['url'], rendered['title'])
+        else:
+            message = self.build(project_id, channel, *self.render_text(project, channel))
+            try:
+                rendered = {'text': message.text, 'url': message.url, 'title': message.title}
+                await self.redis_client.set(key, json.dumps(rendered, ensure_ascii=False), ex=self.ttl)
+                METRICS.inc('redis_roundtrips_total', component='renderer')
+            except Exception as e:
+                print(f'Ошибка записи кэша уведомления {key}: {e}', flush=True)
+
+        self._remember(key, message)
+        return message
@@ -1,160 +1,386 @@
 import asyncio
 import json
-import redis.asyncio as redis
+import os
 
-from aiogram import Bot, Dispatcher, html
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+from .subscriber_index import SubscriberIndex
+from .keyword_matcher import KeywordMatcher
+from .stem_matcher import StemMatcher
+from .delivery_scheduler import DeliveryScheduler
+from .message_renderer import MessageRenderer
+from .sharding import ShardAssignment, ShardHandoff
+from .recent_projects import RecentProjectsIndex
+from ..events import ProjectConsumer
+from ..models import Project
+from ..db.database import project_tokens
+from ..metrics import METRICS
+
+
+RECIPIENT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
 
 
 class NotificationService:
-    def __init__(self, redis_client, db, dp, bot):
+    def __init__(self, redis_client, db, dp, bot, shard: ShardAssignment = None, recent: RecentProjectsIndex = None):
         self.redis_client = redis_client
         self.db = db
         self.dp = dp
         self.bot = bot
         self.channels = ['fl_projects', 'kwork_projects', 'freelancer_projects']
+        self.users_channel = db.USERS_CHANNEL
+        self.shard = shard or ShardAssignment()
+        # memory — тёплый индекс в процессе по подстрокам, stems — он же по основам слов,
+        # database — подбор получателей запросом к PostgreSQL
+        self.matching = os.getenv('KEYWORD_MATCHING', 'memory')
+        if self.matching not in ('memory', 'stems', 'database'):
+            raise ValueError(f'Неизвестный KEYWORD_MATCHING: {self.matching}')
+        matcher = StemMatcher() if self.matching == 'stems' else None
+        self.index = SubscriberIndex(owns=self.shard.owns, matcher=matcher)
+        self.renderer = MessageRenderer(redis_client)
+        self.scheduler = DeliveryScheduler(
+            bot,
+            workers=int(os.getenv('DELIVERY_WORKERS', 16)),
+            rate=float(os.getenv('DELIVERY_RATE', 30))
+        )
+        METRICS.gauge_callback('delivery_queue_depth', self.scheduler.qsize)
+        self.consumer = ProjectConsumer(
+            redis_client,
+            self.channels,
+            group=self.shard.consumer_group(os.getenv('PROJECTS_GROUP', 'notifications')),
+            shard_count=self.shard.shard_count
+        )
+        # Проекты за последние сутки: досылка после смены ключевых слов и /search
+        self.recent = recent or RecentProjectsIndex()
+        self.backfill_limit = int(os.getenv('BACKFILL_LIMIT', 5))
+        self._listen_task = None
+        # Изменения пользователей, пришедшие во время загрузки индекса; None — загрузки нет
+        self._pending_updates = None
+        self._loading_shard = None
+        # Последняя запись потока, получатели которой подобраны; отметка для ShardHandoff
+        self._last_entry = None
+        self.handoff = None
+        self.handoff_timeout = float(os.getenv('SHARD_HANDOFF_TIMEOUT', 60))
+        self._handoff_task = None
 
-    @staticmethod
-    def format_project_message(data: str, channel: str):
+    async def load_index(self, shard: ShardAssignment = None):
+        """Загрузка индекса подписчиков шарда shard (по умолчанию — текущего)"""
+        shard = shard or self.shard
+        if self.matching == 'database':
+            print(f'Получатели подбираются в базе данных, индекс не загружается (шард {shard})', flush=True)
+            return
+        # Новый индекс наполняется пачками серверного курсора и подменяет текущий целиком,
+        # чтобы проекты, пришедшие во время загрузки, не видели половину подписчиков
+        index = SubscriberIndex(owns=shard.owns, matcher=type(self.index.matcher)())
+        self._pending_updates = []
+        self._loading_shard = shard
         try:
-            project = json.loads(data)
+            async for users in self.db.iter_users():
+                index.add_users(users)
         except Exception as e:
-            return data, '', ''
-        
-        project_title = project.get('title', 'Без названия')
-        project_desc = project.get('description', '')
-        project_url = project.get('url', '')
-        project_budget = project.get('budget', {})
-
-        max_desc_length = 200
-        if len(project_desc) > max_desc_length:
-            project_desc = project_desc[:max_desc_length].rstrip()
-            project_desc += '...'
-
-        if project_budget:
-            min_budget = project_budget.get('minimum')
-            max_budget = project_budget.get('maximum')
-            currency = project_budget.get('currency', '')
-
-            def format_value(value):
+            print(f'Ошибка загрузки индекса подписчиков: {e}', flush=True)
+            return
+        finally:
+            pending, self._pending_updates = self._pending_updates, None
+            self._loading_shard = None
+        index.finish_load()
+        # Строки курсора могли прочитаться раньше изменений, пришедших во время загрузки
+        for chat_id, fields in pending:
+            index.apply(chat_id, fields)
+        self.index = index
+        print(f'Индекс подписчиков загружен: {len(self.index)} пользователей (шард {shard})', flush=True)
+
+    async def handle_rebalance(self, data: str):
+        try:
+            shard_count = int(data)
+        except ValueError:
+            print(f'Некорректное число шардов: {data}', flush=True)
+            return
+        if shard_count == self.shard.shard_count:
+            return
+
+        previous_count = self.shard.shard_count
+        streams = self.consumer.transport == 'streams'
+        if self.shard.shard_id >= shard_count:
+            self.shard.resize(shard_count)
+            position = self._last_entry
+            print(f'Шард {self.shard} больше не нужен, воркер останавливается', flush=True)
+            if streams:
+                # Отметка для новых владельцев пользователей, затем группа больше не нужна
+                await self._record_handoff(position, previous_count)
+                await self.consumer.destroy_group()
+            if self._listen_task:
+                self._listen_task.cancel()
+            return
+
+        print(f'Перераспределение пользователей: шард {self.shard.shard_id}/{shard_count}', flush=True)
+        # Индекс новой доли собирается заранее, а разбиение меняется вместе с подменой индекса:
+        # записи до отметки разобраны по прежнему разбиению, после — по новому
+        await self.load_index(ShardAssignment(self.shard.shard_id, shard_count))
+        self.shard.resize(shard_count)
+        self.consumer.shard_count = shard_count
+        if streams:
+            position = self._last_entry
+            self._start_handoff(previous_count, position)
+            await self._record_handoff(position, previous_count)
+
+    async def _record_handoff(self, position, previous_count: int):
+        if position is None:
+            # С запуска не разобрано ни одной записи — отметкой служит позиция группы
+            position = (await self.consumer.group_positions(previous_count)).get(self.shard.shard_id)
+        if position is not None:
+            await ShardHandoff.record(self.redis_client, self.shard.shard_id, position)
+
+    def _start_handoff(self, previous_count: int, position):
+        """Придерживает проекты перешедшим пользователям до отметок их прежних шардов"""
+        if self._handoff_task:
+            self._handoff_task.cancel()
+        self.handoff = ShardHandoff(self.shard.shard_id, previous_count, self.consumer.parse_id)
+        if not self.handoff.marks:
+            self.handoff = None
+            return
+        self._handoff_task = asyncio.create_task(self._take_over(self.handoff, position))
+
+    async def _take_over(self, handoff: ShardHandoff, position):
+        marks = await handoff.wait_marks(self.redis_client, self.handoff_timeout)
+        missing = [shard_id for shard_id in handoff.marks if shard_id not in marks]
+        if missing:
+            print(f'Нет отметок передачи от шардов {missing}, берутся позиции их групп', flush=True)
+            groups = await self.consumer.group_positions(handoff.previous_count)
+            for shard_id in missing:
+                # Без группы прежний шард ничего не доставлял: достаточно своей позиции
+                marks[shard_id] = groups.get(shard_id) or position
+        # Граница дочитывания и отметки фиксируются без переключения задач
+        last = self._last_entry or position
+        handoff.resolve({shard_id: mark for shard_id, mark in marks.items() if mark is not None})
+        print(f'Передача пользователей шарду {self.shard}: отметки {marks}, дочитывание до {last}', flush=True)
+        if last is not None:
+            await self._replay_handoff(handoff, marks, last)
+
+    async def _replay_handoff(self, handoff: ShardHandoff, marks: dict, last: str):
+        """Проекты между отметкой прежнего шарда и позицией этого, которые перешедшие пользователи не получили"""
+        pending = {shard_id: mark for shard_id, mark in marks.items()
+                   if mark is not None and handoff.parse_id(mark) < handoff.parse_id(last)}
+        if not pending:
+            return
+        start = '(' + min(pending.values(), key=handoff.parse_id)
+        delivered = 0
+        while True:
+            entries = await self.redis_client.xrange(self.consumer.stream, min=start, max=last, count=1000)
+            METRICS.inc('redis_roundtrips_total', component='handoff')
+            for entry_id, fields in entries:
+                entry_id = entry_id.decode('utf-8') if isinstance(entry_id, bytes) else entry_id
+                channel = fields.get(b'channel', b'').decode('utf-8')
                 try:
-                    value_float = float(value)
-                    if value_float.is_integer():
-                        return int(value_float)
-                    else:
-                        return round(value_float, 2)
-                except Exception:
-                    return value
-
-            if min_budget is not None:
-                min_budget = format_value(min_budget)
-            if max_budget is not None:
-                max_budget = format_value(max_budget)
-
-            if min_budget and max_budget:
-                if min_budget == max_budget:
-                    budget_str = f'Бюджет: {min_budget} {currency}'
-                else:
-                    budget_str = f'Бюджет: {min_budget} - {max_budget} {currency}'
-            elif min_budget:
-                budget_str = f'Бюджет: {min_budget} {currency}'
-            elif max_budget:
-                budget_str = f'Бюджет: {max_budget} {currency}'
-            else:
-                budget_str = 'Бюджет не указан'
-        else:
-            budget_str = 'Бюджет не указан'
-
-
-        if channel == 'fl_projects':
-            source_emoji = '🟢'
-            source_text = 'FL'
-        elif channel == 'kwork_projects':
-            source_emoji = '🔘'
-            source_text = 'Kwork'
-        elif channel == 'freelancer_projects':
-            source_emoji = '⚪'
-            source_text = 'Freelancer'
-        else:
-            source_emoji = ''
-            source_text = ''
-
-        note_emoji = '📝'
-
-        message_text = (
-            f'{source_emoji} <b>{project_title}</b> ({source_text})\n\n'
-            f'{note_emoji} {project_desc}\n\n'
-            f'{budget_str}'
-        )
-        return message_text, project_url, project_title
+                    project = Project.decode(fields.get(b'data', b''), channel)
+                except ValueError:
+                    continue
+                position = handoff.parse_id(entry_id)
+                recipients = []
+                for chat_id in await self.find_recipients(channel, project):
+                    shard_id = handoff.source(chat_id)
+                    if shard_id in pending and position > handoff.marks[shard_id]:
+                        recipients.append(chat_id)
+                if not recipients:
+                    continue
+                prepared = await self.renderer.prepare(channel, project)
+                for chat_id in recipients:
+                    try:
+                        self.scheduler.submit(chat_id, prepared.text, reply_markup=prepared.keyboard, label=prepared.title)
+                        delivered += 1
+                    except Exception as e:
+                        print(f'Ошибка постановки в очередь для {chat_id} при передаче шарда: {e}', flush=True)
+            if len(entries) < 1000:
+                break
+            start = '(' + entry_id
+        METRICS.inc('handoff_deliveries_total', delivered)
+        print(f'Перешедшим пользователям дослано уведомлений: {delivered}', flush=True)
 
-    async def listen(self):
-        pubsub = self.redis_client.pubsub()
-        await pubsub.subscribe(*self.channels)
-        print(f'Подписались на каналы: {', '.join(self.channels)}', flush=True)
+    async def handle_user_update(self, data: str):
         try:
-            async for message in pubsub.listen():
-                if message.get('type') == 'message':
-                    channel = message.get('channel')
-                    data = message.get('data')
-                    if isinstance(channel, bytes):
-                        channel = channel.decode('utf-8')
-                    if isinstance(data, bytes):
-                        data = data.decode('utf-8')
-
-                    if channel == 'fl_projects':
-                        users = self.db.get_users_for_fl()
-                    elif channel == 'kwork_projects':
-                        users = self.db.get_users_for_kwork()
-                    elif channel == 'freelancer_projects':
-                        users = self.db.get_users_for_freelancer()
-                    else:
-                        users = []
-
-                    eligible_users = []
-                    for user in users:
-                        chat_id = user[1]
-                        keywords = user[2]
-                        msg_text = data.lower()
-                        if keywords and keywords.strip():
-                            keyword_list = [kw.strip().lower() for kw in keywords.split(',') if kw.strip()]
-                            if any(kw in msg_text for kw in keyword_list):
-                                eligible_users.append(user)
-                        else:
-                            eligible_users.append(user)
-
-                    for user in eligible_users:
-                        chat_id = user[1]
-                        try:
-                            message_text, project_url, project_title = self.format_project_message(data, channel)
-
-                            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                                [InlineKeyboardButton(text='Перейти к проекту', url=project_url)]
-                            ])
-
-                            await self.bot.send_message(
-                                chat_id,
-                                message_text,
-                                reply_markup=keyboard,
-                                parse_mode=ParseMode.HTML
-                            )
-                            print(f'Уведомление отправлено пользователю {chat_id} с данными проекта: {project_title}', flush=True)
-                        except Exception as e:
-                            print(f'Ошибка отправки уведомления пользователю {chat_id}: {e}', flush=True)
+            event = json.loads(data)
+            chat_id = event['chat_id']
+            fields = event.get('fields', {})
+            previous_keywords = event.get('previous_keywords')
+        except Exception as e:
+            print(f'Некорректное событие изменения пользователя: {e}', flush=True)
+            return
 
-        except asyncio.CancelledError:
-            print('Служба уведомлений прервана.', flush=True)
-        finally:
+        # Кэш профилей этого процесса не видит записей бота, строка пользователя устарела
+        self.db.profiles.invalidate(chat_id)
+        owned = self.shard.owns(chat_id)
+        # Во время перераспределения изменение нужно и индексу будущей доли
+        loading = self._loading_shard is not None and self._loading_shard.owns(chat_id)
+        if not owned and not loading:
+            return
+        keywords = fields.get('keywords')
+        if self.matching != 'database':
+            await self._apply_user_update(chat_id, fields)
+        if keywords and owned:
+            await self.backfill(chat_id, keywords, previous_keywords)
+
+    async def _apply_user_update(self, chat_id, fields):
+        if chat_id not in self.index:
+            # Частичное обновление неизвестного пользователя: берём полную запись из БД
+            user = await self.db.get_user(chat_id)
+            if user is None:
+                return
+            fields = {
+                'keywords': user[2],
+                'mailing_kwork': user[3],
+                'mailing_fl': user[4],
+                'mailing_freelancer': user[5]
+            }
+        self.index.apply(chat_id, fields)
+        if self._pending_updates is not None:
+            self._pending_updates.append((chat_id, fields))
+
+    async def backfill(self, chat_id, keywords: str, previous_keywords: str = None):
+        """Лучшие совпадения за окно недавних проектов сразу после смены ключевых слов.
+
+        Проекты, подходящие под прежние ключевые слова, пользователь уже получал,
+        поэтому ищется только по добавленным словам, а найденное прежними словами
+        тем же matcher, что и в рассылке, пропускается. Без прежних ключевых слов
+        пользователь получал все проекты своих площадок — досылать нечего.
+        """
+        if not self.backfill_limit:
+            return
+        excluded = None
+        if previous_keywords is not None:
+            previous = KeywordMatcher.parse_keywords(previous_keywords)
+            added = KeywordMatcher.parse_keywords(keywords) - previous
+            if not previous or not added:
+                return
+            keywords = ', '.join(sorted(added))
+            excluded = type(self.index.matcher)()
+            excluded.load([(chat_id, previous_keywords)])
+        user = await self.db.get_user(chat_id)
+        if user is None:
+            return
+        # Столбцы mailing_kwork, mailing_fl, mailing_freelancer в порядке CHANNEL_FLAGS
+        channels = [channel for channel, enabled in zip(SubscriberIndex.CHANNEL_FLAGS, user[3:6]) if enabled]
+        found = self.recent.search(keywords, channels, limit=self.backfill_limit, exclude=excluded)
+        # Отобранные проекты уходят в порядке поступления, как в обычной рассылке
+        for item in sorted(found, key=lambda item: item.seq):
+            prepared = await self.renderer.prepare(item.channel, item.project)
             try:
-                await pubsub.unsubscribe(*self.channels)
+                self.scheduler.submit(chat_id, prepared.text, reply_markup=prepared.keyboard, label=prepared.title)
             except Exception as e:
-                print(f'Ошибка отписки от каналов: {e}', flush=True)
+                print(f'Ошибка постановки досылки в очередь для {chat_id}: {e}', flush=True)
+                return
+        METRICS.inc('backfill_projects_total', len(found))
+        if found:
+            print(f'Пользователю {chat_id} дослано проектов за окно: {len(found)}', flush=True)
+
+    async def listen_user_updates(self, subscribed: asyncio.Event):
+        pubsub = self.redis_client.pubsub()
+        await pubsub.subscribe(self.users_channel, ShardAssignment.CHANNEL)
+        subscribed.set()
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                channel = message.get('channel')
+                data = message.get('data')
+                if isinstance(channel, bytes):
+                    channel = channel.decode('utf-8')
+                if isinstance(data, bytes):
+                    data = data.decode('utf-8')
+                if channel == ShardAssignment.CHANNEL:
+                    await self.handle_rebalance(data)
+                else:
+                    await self.handle_user_update(data)
+        finally:
             try:
+                await pubsub.unsubscribe(self.users_channel, ShardAssignment.CHANNEL)
                 await pubsub.close()
             except Exception as e:
                 print(f'Ошибка закрытия pubsub: {e}', flush=True)
 
+    def _ack_when_delivered(self, entry_id, recipients: int):
+        """Колбэк завершения доставки: XACK, когда обработаны все получатели проекта"""
+        remaining = recipients
+
+        def on_complete():
+            nonlocal remaining
+            remaining -= 1
+            if remaining == 0:
+                asyncio.create_task(self.consumer.ack(entry_id))
+
+        return on_complete
+
+    async def find_recipients(self, channel: str, project: Project):
+        if self.matching == 'database':
+            chat_ids = await self.db.get_chat_ids_for_tokens(channel, project_tokens(project.text))
+            return {chat_id for chat_id in chat_ids if self.shard.owns(chat_id)}
+        return self.index.recipients(channel, project.text)
+
+    async def handle_project(self, entry_id, channel: str, data):
+        """data — Project или его msgpack/JSON из потока; разбирается один раз на проект"""
+        try:
+            project = data if isinstance(data, Project) else Project.decode(data, channel)
+        except ValueError as e:
+            print(f'Проект из {channel} пропущен: {e}', flush=True)
+            await self.consumer.ack(entry_id)
+            return
+
+        self.recent.add(channel, project)
+        with METRICS.timer('match_seconds'):
+            eligible_users = await self.find_recipients(channel, project)
+        if entry_id is not None:
+            self._last_entry = entry_id
+            if self.handoff is not None:
+                handoff = self.handoff
+                eligible_users = {chat_id for chat_id in eligible_users if handoff.allows(chat_id, entry_id)}
+                if handoff.finished(entry_id):
+                    self.handoff = None
+        METRICS.observe('recipients_per_project', len(eligible_users), buckets=RECIPIENT_BUCKETS)
+        if not eligible_users:
+            await self.consumer.ack(entry_id)
+            return
+
+        # Проект разбирается и рендерится один раз, все получатели разделяют готовое сообщение
+        prepared = await self.renderer.prepare(channel, project)
+
+        on_complete = self._ack_when_delivered(entry_id, len(eligible_users)) if entry_id else None
+        for chat_id in eligible_users:
+            try:
+                self.scheduler.submit(chat_id, prepared.text, reply_markup=prepared.keyboard, label=prepared.title, on_complete=on_complete)
+            except Exception as e:
+                print(f'Ошибка постановки уведомления в очередь для {chat_id}: {e}', flush=True)
+                if on_complete:
+                    on_complete()
+
+    async def listen(self):
+        self._listen_task = asyncio.current_task()
+        subscribed = asyncio.Event()
+        updates_task = asyncio.create_task(self.listen_user_updates(subscribed))
+        await subscribed.wait()
+        # Подписка оформлена до загрузки, поэтому изменения во время загрузки не потеряются
+        await self.load_index()
+        if self.consumer.transport == 'streams':
+            await self._join_shards()
+        await self.recent.warm(self.consumer)
+        self.scheduler.start()
+        try:
+            async for entry_id, channel, data in self.consumer.consume():
+                if channel is None:
+                    await self.consumer.ack(entry_id)
+                    continue
+                await self.handle_project(entry_id, channel, data)
+        except asyncio.CancelledError:
+            print('Служба уведомлений прервана.', flush=True)
+        finally:
+            updates_task.cancel()
+            if self._handoff_task:
+                self._handoff_task.cancel()
+            await self.scheduler.stop()
+
+    async def _join_shards(self):
+        """Новая группа шарда после перераспределения: её пользователи пришли из других шардов"""
+        start_id = await self.consumer.ensure_group()
+        if start_id is None or start_id == '$':
+            return
+        previous_count = int(await self.redis_client.get(ShardAssignment.PREVIOUS_KEY) or 0)
+        if previous_count and previous_count != self.shard.shard_count:
+            self._start_handoff(previous_count, start_id)
+
     async def run(self):
         await self.listen()
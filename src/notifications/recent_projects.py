@@ -0,0 +1,138 @@
+import heapq
+import os
+import time
+from collections import Counter, deque
+from typing import NamedTuple
+
+from .stem_matcher import StemMatcher, text_stems
+from ..models import Project
+from ..metrics import METRICS
+
+
+class RecentProject(NamedTuple):
+    seq: int
+    added_at: float
+    channel: str
+    project: Project
+    stems: frozenset
+
+
+class RecentProjectsIndex:
+    """Проекты за последние window секунд с обратным индексом основа -> проекты.
+
+    Кольцевой буфер хранит проекты в порядке поступления и не больше max_items;
+    устаревшие вытесняются с головы при добавлении и поиске, вместе с их
+    записями в индексе. Ключевые слова ищутся по основам, как в StemMatcher:
+    фраза находит проект, если в нём есть все её основы. Выдача упорядочена
+    по числу совпавших ключевых слов, затем от новых к старым. Используется
+    для досылки проектов после смены ключевых слов и для команды /search —
+    без обращения к PostgreSQL и площадкам.
+    """
+
+    def __init__(self, window: int = None, max_items: int = None):
+        self.window = window or int(os.getenv('RECENT_WINDOW', 86400))
+        self.max_items = max_items or int(os.getenv('RECENT_MAX_ITEMS', 20000))
+        self._items = deque()        # RecentProject в порядке поступления
+        self._by_seq = {}            # seq -> RecentProject
+        self._by_key = {}            # (channel, id проекта) -> seq
+        self._postings = {}          # основа -> set(seq)
+        self._seq = 0
+        METRICS.gauge_callback('recent_projects', self.__len__)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, channel: str, project: Project, added_at: float = None):
+        """Проект из потока; повторная доставка того же проекта не дублирует его"""
+        key = (channel, project.id)
+        if key in self._by_key:
+            return
+        added_at = time.time() if added_at is None else added_at
+        self._seq += 1
+        item = RecentProject(self._seq, added_at, channel, project, text_stems(project.text))
+        self._items.append(item)
+        self._by_seq[item.seq] = item
+        self._by_key[key] = item.seq
+        for stem in item.stems:
+            self._postings.setdefault(stem, set()).add(item.seq)
+        self.evict(added_at)
+
+    def evict(self, now: float = None):
+        oldest = (time.time() if now is None else now) - self.window
+        items = self._items
+        while items and (items[0].added_at < oldest or len(items) > self.max_items):
+            item = items.popleft()
+            del self._by_seq[item.seq]
+            self._by_key.pop((item.channel, item.project.id), None)
+            for stem in item.stems:
+                postings = self._postings[stem]
+                postings.discard(item.seq)
+                if not postings:
+                    del self._postings[stem]
+
+    def _matches(self, phrases):
+        """seq проектов для каждой фразы (набора основ), найденной в окне"""
+        for stems in phrases:
+            postings = [self._postings.get(stem) for stem in stems]
+            if not all(postings):
+                continue
+            postings.sort(key=len)
+            yield postings[0].intersection(*postings[1:])
+
+    def search(self, keywords: str, channels=None, limit: int = 10, exclude=None):
+        """Список RecentProject по строке ключевых слов через запятую, лучшие первыми.
+
+        exclude — matcher с прежними ключевыми словами пользователя, тот же, что
+        в рассылке (KeywordMatcher или StemMatcher): найденные им проекты
+        пользователь уже получал, и они пропускаются.
+        """
+        self.evict()
+        scores = Counter()
+        for matched in self._matches(StemMatcher.parse_keywords(keywords)):
+            scores.update(matched)
+
+        if channels is not None:
+            channels = set(channels)
+            scores = {seq: score for seq, score in scores.items() if self._by_seq[seq].channel in channels}
+        if exclude is not None:
+            scores = {seq: score for seq, score in scores.items() if not exclude.match(self._by_seq[seq].project.text)}
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [self._by_seq[seq] for seq, _ in best]
+
+    async def warm(self, consumer):
+        """Начальное наполнение из Redis Stream после рестарта: записи за окно, если поток их ещё хранит"""
+        if consumer.transport != 'streams':
+            return
+        start = str(int((time.time() - self.window) * 1000))
+        loaded = 0
+        try:
+            while True:
+                entries = await consumer.redis_client.xrange(consumer.stream, min=start, max='+', count=1000)
+                METRICS.inc('redis_roundtrips_total', component='recent')
+                for entry_id, fields in entries:
+                    if isinstance(entry_id, bytes):
+                        entry_id = entry_id.decode('utf-8')
+                    channel = fields.get(b'channel', b'').decode('utf-8')
+                    try:
+                        project = Project.decode(fields.get(b'data', b''), channel)
+                    except ValueError:
+                        continue
+                    self.add(channel, project, added_at=int(entry_id.split('-')[0]) / 1000)
+                    loaded += 1
+                if len(entries) < 1000:
+                    break
+                start = '(' + entry_id
+        except Exception as e:
+            print(f'Ошибка загрузки недавних проектов из потока {consumer.stream}: {e}', flush=True)
+        print(f'Недавние проекты загружены из потока: {loaded}, в окне {len(self)}', flush=True)
+
+    async def follow(self, consumer):
+        """Наполнение без рассылки: для /search в процессе бота, когда рассылку ведут воркеры"""
+        await self.warm(consumer)
+        async for entry_id, channel, data in consumer.consume():
+            if channel is not None:
+                try:
+                    self.add(channel, Project.decode(data, channel))
+                except ValueError as e:
+                    print(f'Проект из {channel} не попал в недавние: {e}', flush=True)
+            await consumer.ack(entry_id)
@@ -0,0 +1,121 @@
+import asyncio
+import zlib
+
+
+class ShardAssignment:
+    """Доля пользователей, за рассылку которым отвечает воркер уведомлений.
+
+    Пользователи делятся по crc32(chat_id) % shard_count — хэш стабилен между
+    процессами и машинами. Текущее число шардов хранится в Redis, изменение
+    рассылается всем воркерам через pub/sub.
+    """
+
+    KEY = 'notifications:shards'
+    # Число шардов до последнего перераспределения и отметки передачи пользователей (ShardHandoff)
+    PREVIOUS_KEY = 'notifications:shards:previous'
+    HANDOFF_KEY = 'notifications:handoff'
+    CHANNEL = 'notifications_rebalance'
+
+    def __init__(self, shard_id: int = 0, shard_count: int = 1):
+        if not 0 <= shard_id < shard_count:
+            raise ValueError(f'Шард {shard_id} вне диапазона 0..{shard_count - 1}')
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+
+    def __repr__(self):
+        return f'{self.shard_id}/{self.shard_count}'
+
+    @staticmethod
+    def shard_of(chat_id, shard_count: int) -> int:
+        return zlib.crc32(str(chat_id).encode('utf-8')) % shard_count
+
+    def resize(self, shard_count: int):
+        self.shard_count = shard_count
+
+    @property
+    def active(self) -> bool:
+        return self.shard_id < self.shard_count
+
+    def consumer_group(self, base: str) -> str:
+        # Каждый шард читает поток своей группой и поэтому получает все проекты;
+        # имя зависит только от номера шарда, чтобы смена числа шардов не теряла очередь
+        if self.shard_id == 0:
+            return base
+        return f'{base}-{self.shard_id}'
+
+    def owns(self, chat_id) -> bool:
+        return self.shard_count == 1 or self.shard_of(chat_id, self.shard_count) == self.shard_id
+
+
+class ShardHandoff:
+    """Передача пользователей новому шарду при смене числа шардов.
+
+    Группа каждого шарда читает поток со своей позиции, поэтому без передачи
+    перешедший пользователь получил бы проекты между позициями прежней и новой
+    групп дважды (новая группа отстаёт) или не получил бы их вовсе (новая
+    группа впереди). Поэтому в момент переключения каждый воркер записывает
+    в HANDOFF_KEY отметку — id последней записи, получателей которой он подобрал
+    по прежнему разбиению. Новый владелец доставляет перешедшему пользователю
+    только записи после отметки его прежнего шарда: более ранние пропускает,
+    а уже пройденные им самим дочитывает из потока (replay в NotificationService).
+    Пока отметки нет, проекты таким пользователям придерживаются и потом
+    тоже дочитываются.
+
+    Остающееся окно: если воркер прежнего шарда не записал отметку за
+    SHARD_HANDOFF_TIMEOUT секунд (не запущен, упал), берётся last-delivered-id
+    его группы — записи, которые он прочитал, но не успел разобрать (до
+    PROJECTS_READ_COUNT), перешедшие пользователи не получат. Записи, вытесненные
+    из потока по MAXLEN до дочитывания, тоже теряются, а два перераспределения
+    подряд, пока первое не завершилось, могут дать и повторы, и пропуски.
+    """
+
+    def __init__(self, shard_id: int, previous_count: int, parse_id):
+        self.shard_id = shard_id
+        self.previous_count = previous_count
+        # parse_id(entry_id) -> сравнимая позиция (ProjectConsumer.parse_id)
+        self.parse_id = parse_id
+        # прежний шард -> позиция его отметки; None — отметки ещё нет
+        self.marks = {shard_id: None for shard_id in range(previous_count) if shard_id != self.shard_id}
+
+    def source(self, chat_id):
+        """Прежний шард перешедшего к этому шарду пользователя или None"""
+        shard_id = ShardAssignment.shard_of(chat_id, self.previous_count)
+        return shard_id if shard_id in self.marks else None
+
+    def allows(self, chat_id, entry_id) -> bool:
+        shard_id = self.source(chat_id)
+        if shard_id is None:
+            return True
+        mark = self.marks[shard_id]
+        return mark is not None and self.parse_id(entry_id) > mark
+
+    def resolve(self, marks: dict):
+        """marks — прежний шард -> id записи с его отметкой"""
+        for shard_id, entry_id in marks.items():
+            if shard_id in self.marks:
+                self.marks[shard_id] = self.parse_id(entry_id)
+
+    def finished(self, entry_id) -> bool:
+        """Все отметки получены и поток прочитан дальше любой из них"""
+        if any(mark is None for mark in self.marks.values()):
+            return False
+        return all(self.parse_id(entry_id) >= mark for mark in self.marks.values())
+
+    @staticmethod
+    async def record(redis_client, shard_id: int, entry_id: str):
+        await redis_client.hset(ShardAssignment.HANDOFF_KEY, str(shard_id), entry_id)
+        await redis_client.expire(ShardAssignment.HANDOFF_KEY, 86400)
+
+    async def wait_marks(self, redis_client, timeout: float) -> dict:
+        """Отметки прежних шардов из Redis; недождавшиеся за timeout секунд в результат не входят"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            stored = await redis_client.hgetall(ShardAssignment.HANDOFF_KEY)
+            marks = {}
+            for shard_id, entry_id in stored.items():
+                shard_id = int(shard_id)
+                if shard_id in self.marks:
+                    marks[shard_id] = entry_id.decode('utf-8') if isinstance(entry_id, bytes) else entry_id
+            if len(marks) == len(self.marks) or asyncio.get_running_loop().time() >= deadline:
+                return marks
+            await asyncio.sleep(0.5)
@@ -0,0 +1,147 @@
+import os
+import re
+from functools import lru_cache
+
+import snowballstemmer
+
+from ..db.database import TOKEN_PATTERN
+
+
+CYRILLIC = re.compile('[а-яё]')
+
+_russian = snowballstemmer.stemmer('russian')
+_english = snowballstemmer.stemmer('english')
+
+
+_stem_cache = None
+
+
+def _stem_word(word: str) -> str:
+    stemmer = _russian if CYRILLIC.search(word) else _english
+    return stemmer.stemWord(word)
+
+
+def stem_cache():
+    """stem с LRU-кэшем; STEM_CACHE_SIZE читается при первом вызове, когда .env уже загружен"""
+    global _stem_cache
+    if _stem_cache is None:
+        _stem_cache = lru_cache(maxsize=int(os.getenv('STEM_CACHE_SIZE', 100000)))(_stem_word)
+    return _stem_cache
+
+
+def stem(word: str) -> str:
+    """Основа слова в нижнем регистре; повторяющиеся слова проектов берутся из кэша"""
+    return stem_cache()(word)
+
+
+def text_stems(text: str) -> frozenset:
+    cached = stem_cache()
+    return frozenset(cached(word) for word in TOKEN_PATTERN.findall((text or '').lower()))
+
+
+def keyword_stems(keyword: str) -> tuple:
+    """Ключевое слово (или фраза) как упорядоченный набор основ: «парсеры сайтов» -> ('парсер', 'сайт')"""
+    cached = stem_cache()
+    return tuple(sorted({cached(word) for word in TOKEN_PATTERN.findall(keyword.lower())}))
+
+
+class StemMatcher:
+    """Индекс основа -> подписчики для сопоставления с учётом морфологии.
+
+    Ключевые слова приводятся к основам один раз при сохранении пользователя,
+    текст проекта — один раз на проект, после чего совпадение сводится
+    к пересечению множеств: «сайт» находит «сайты» и «сайтов». Стеммер Snowball
+    отбрасывает окончания, но не словообразовательные суффиксы: «парсер»
+    и «парсинг» остаются разными основами.
+    Фраза из нескольких слов совпадает, если в проекте есть все её основы.
+    Интерфейс повторяет KeywordMatcher.
+    """
+
+    def __init__(self):
+        self._subscribers = {}       # stems -> set(chat_id)
+        self._by_stem = {}           # первая основа -> set(stems)
+        self._user_keywords = {}     # chat_id -> frozenset(stems)
+        self._catch_all = set()
+
+    @staticmethod
+    def parse_keywords(keywords):
+        if not keywords:
+            return frozenset()
+        stems = (keyword_stems(kw) for kw in keywords.split(','))
+        return frozenset(s for s in stems if s)
+
+    def __len__(self):
+        return len(self._user_keywords) + len(self._catch_all)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._user_keywords or chat_id in self._catch_all
+
+    def clear(self):
+        self.__init__()
+
+    def load(self, users):
+        for chat_id, keywords in users:
+            self.set_user(chat_id, keywords)
+
+    def set_user(self, chat_id, keywords):
+        new_keywords = self.parse_keywords(keywords)
+        old_keywords = self._user_keywords.get(chat_id, frozenset())
+        if chat_id in self._catch_all and not new_keywords:
+            return
+
+        self._catch_all.discard(chat_id)
+        for stems in old_keywords - new_keywords:
+            self._unsubscribe(chat_id, stems)
+        for stems in new_keywords - old_keywords:
+            self._subscribe(chat_id, stems)
+
+        if new_keywords:
+            self._user_keywords[chat_id] = new_keywords
+        else:
+            self._user_keywords.pop(chat_id, None)
+            self._catch_all.add(chat_id)
+
+    def remove_user(self, chat_id):
+        self._catch_all.discard(chat_id)
+        for stems in self._user_keywords.pop(chat_id, frozenset()):
+            self._unsubscribe(chat_id, stems)
+
+    def _subscribe(self, chat_id, stems):
+        subscribers = self._subscribers.get(stems)
+        if subscribers is None:
+            subscribers = self._subscribers[stems] = set()
+            self._by_stem.setdefault(stems[0], set()).add(stems)
+        subscribers.add(chat_id)
+
+    def _unsubscribe(self, chat_id, stems):
+        subscribers = self._subscribers.get(stems)
+        if subscribers is None:
+            return
+        subscribers.discard(chat_id)
+        if not subscribers:
+            del self._subscribers[stems]
+            phrases = self._by_stem[stems[0]]
+            phrases.discard(stems)
+            if not phrases:
+                del self._by_stem[stems[0]]
+
+    def match_keywords(self, text):
+        project_stems = text_stems(text)
+        found = set()
+        by_stem = self._by_stem
+        for s in project_stems:
+            phrases = by_stem.get(s)
+            if not phrases:
+                continue
+            for stems in phrases:
+                if len(stems) == 1 or project_stems.issuperset(stems):
+                    found.add(stems)
+        return found
+
+    def match(self, text):
+        """Множество chat_id, чьи ключевые слова есть среди основ текста (плюс подписчики без фильтра)."""
+        recipients = set(self._catch_all)
+        subscribers = self._subscribers
+        for stems in self.match_keywords(text):
+            recipients |= subscribers[stems]
+        return recipients
@@ -0,0 +1,286 @@
+from array import array
+from itertools import compress
+
+from .keyword_matcher import KeywordMatcher
+
+
+# '0'/'1' двоичной записи -> байты 0/1 для itertools.compress
+BITS_TO_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def bitmap_of(ids, size):
+    """Битовая карта из номеров: биты выставляются в bytearray, а не сдвигами большого целого"""
+    buffer = bytearray((size + 7) // 8)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class SubscriberIndex:
+    """Тёплый индекс подписчиков: участие в рассылках по платформам и ключевые слова.
+
+    Загружается из БД один раз при старте и далее поддерживается событиями
+    об изменении пользователей, которые публикует Database.
+
+    Данные хранятся по столбцам: chat_id заменяются плотными номерами,
+    участие в рассылке — битовая карта (целое Python) на платформу. Номера
+    слов всех пользователей лежат подряд в одном массиве keyword_data
+    (CSR): у пользователя только начало и длина своего отрезка, без
+    собственного объекта-массива. Отрезок, который после изменения стал
+    длиннее, переписывается в конец; освободившиеся места собираются
+    уплотнением, когда их становится больше половины массива. Подписчики слова хранятся
+    массивом номеров, пока он меньше битовой карты, и битовой картой после.
+    Получатели проекта — пересечение карты платформы с объединением карт
+    совпавших слов. Сами слова в тексте ищет matcher (KeywordMatcher или
+    StemMatcher), подписчиками в нём выступают номера слов.
+    """
+
+    CHANNEL_FLAGS = {
+        'kwork_projects': 'mailing_kwork',
+        'fl_projects': 'mailing_fl',
+        'freelancer_projects': 'mailing_freelancer'
+    }
+
+    def __init__(self, owns=None, matcher=None):
+        # owns(chat_id) -> bool: индекс хранит только пользователей своего шарда
+        self.owns = owns
+        # KeywordMatcher (подстроки) или StemMatcher (основы слов)
+        self.matcher = matcher if matcher is not None else KeywordMatcher()
+        self._reset()
+
+    def _reset(self):
+        self.matcher.clear()
+        self.ids = {}                # chat_id -> номер пользователя
+        self.chat_ids = []           # номер пользователя -> chat_id
+        self.keyword_data = array('I')   # номера слов всех пользователей отрезками подряд
+        self.keyword_start = array('I')  # номер пользователя -> начало отрезка в keyword_data
+        self.keyword_count = array('H')  # номер пользователя -> длина отрезка
+        self._garbage = 0                # мест в keyword_data, не принадлежащих ни одному отрезку
+        self._free_ids = []
+        self.platforms = {channel: 0 for channel in self.CHANNEL_FLAGS}
+        self.catch_all = 0           # пользователи без ключевых слов получают всё
+
+        self.keyword_ids = {}        # нормализованное слово -> номер слова
+        self.keywords = []           # номер слова -> нормализованное слово
+        self.postings = []           # номер слова -> array номеров или битовая карта подписчиков
+        self._free_keywords = []
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, chat_id):
+        return chat_id in self.ids
+
+    def load(self, users):
+        """users — строки таблицы users: (id, chat_id, keywords, mailing_kwork, mailing_fl, mailing_freelancer)"""
+        self.clear()
+        self.add_users(users)
+        self.finish_load()
+
+    def clear(self):
+        self._reset()
+
+    def add_users(self, users):
+        """Очередная пачка строк users при потоковой загрузке; автомат собирается в finish_load.
+
+        Карты платформ и подписчиков без ключевых слов дополняются один раз на пачку.
+        """
+        flags = {channel: [] for channel in self.CHANNEL_FLAGS}
+        catch_all = []
+        for user in users:
+            chat_id = user[1]
+            if self.owns and not self.owns(chat_id):
+                continue
+            if chat_id in self.ids:
+                self.apply(chat_id, {
+                    'keywords': user[2],
+                    'mailing_kwork': user[3],
+                    'mailing_fl': user[4],
+                    'mailing_freelancer': user[5]
+                })
+                continue
+            user_id = self._user_id(chat_id)
+            if not self._subscribe(user_id, user[2]):
+                catch_all.append(user_id)
+            # Столбцы mailing_kwork, mailing_fl, mailing_freelancer в порядке CHANNEL_FLAGS
+            for members, enabled in zip(flags.values(), user[3:6]):
+                if enabled:
+                    members.append(user_id)
+
+        size = len(self.chat_ids)
+        self.catch_all |= bitmap_of(catch_all, size)
+        for channel, members in flags.items():
+            self.platforms[channel] |= bitmap_of(members, size)
+
+    def finish_load(self):
+        self.matcher.load(())
+        self.loaded = True
+
+    def apply(self, chat_id, fields):
+        if self.owns and not self.owns(chat_id):
+            return
+        user_id = self._user_id(chat_id)
+        if 'keywords' in fields:
+            self._set_keywords(user_id, fields['keywords'])
+        self._set_flags(user_id, fields)
+
+    def remove(self, chat_id):
+        user_id = self.ids.pop(chat_id, None)
+        if user_id is None:
+            return
+        self._set_keywords(user_id, '')
+        mask = ~(1 << user_id)
+        self.catch_all &= mask
+        for channel in self.platforms:
+            self.platforms[channel] &= mask
+        self.chat_ids[user_id] = None
+        self._free_ids.append(user_id)
+
+    def _user_id(self, chat_id):
+        user_id = self.ids.get(chat_id)
+        if user_id is not None:
+            return user_id
+        if self._free_ids:
+            user_id = self._free_ids.pop()
+            self.chat_ids[user_id] = chat_id
+        else:
+            user_id = len(self.chat_ids)
+            self.chat_ids.append(chat_id)
+            self.keyword_start.append(0)
+            self.keyword_count.append(0)
+        self.ids[chat_id] = user_id
+        return user_id
+
+    def _keyword_id(self, key, raw):
+        keyword_id = self.keyword_ids.get(key)
+        if keyword_id is not None:
+            return keyword_id
+        if self._free_keywords:
+            keyword_id = self._free_keywords.pop()
+            self.keywords[keyword_id] = key
+        else:
+            keyword_id = len(self.postings)
+            self.keywords.append(key)
+            self.postings.append(None)
+        self.postings[keyword_id] = array('I')
+        self.keyword_ids[key] = keyword_id
+        self.matcher.set_user(keyword_id, raw)
+        return keyword_id
+
+    def _release_keyword(self, keyword_id):
+        self.matcher.remove_user(keyword_id)
+        del self.keyword_ids[self.keywords[keyword_id]]
+        self.keywords[keyword_id] = None
+        self._free_keywords.append(keyword_id)
+
+    def _keyword_ids(self, keywords):
+        keyword_ids = set()
+        parse = self.matcher.parse_keywords
+        for raw in (keywords or '').split(','):
+            for key in parse(raw):
+                keyword_ids.add(self._keyword_id(key, raw))
+        return keyword_ids
+
+    def _add_posting(self, keyword_id, user_id):
+        posting = self.postings[keyword_id]
+        if isinstance(posting, int):
+            self.postings[keyword_id] = posting | 1 << user_id
+            return
+        posting.append(user_id)
+        # Массив по 4 байта на номер становится больше карты на всех пользователей
+        if len(posting) * 32 > len(self.chat_ids):
+            self.postings[keyword_id] = bitmap_of(posting, len(self.chat_ids))
+
+    def _remove_posting(self, keyword_id, user_id):
+        posting = self.postings[keyword_id]
+        if isinstance(posting, int):
+            posting = self.postings[keyword_id] = posting & ~(1 << user_id)
+        else:
+            posting.remove(user_id)
+        if not posting:
+            self._release_keyword(keyword_id)
+
+    def _subscribe(self, user_id, keywords):
+        """Подписка нового пользователя на слова; False — ключевых слов нет, пользователь получает всё"""
+        keyword_ids = self._keyword_ids(keywords)
+        for keyword_id in keyword_ids:
+            self._add_posting(keyword_id, user_id)
+        self._store_keywords(user_id, keyword_ids)
+        return bool(keyword_ids)
+
+    def _set_keywords(self, user_id, keywords):
+        new_ids = self._keyword_ids(keywords)
+        old_ids = set(self.user_keyword_ids(user_id))
+        for keyword_id in new_ids - old_ids:
+            self._add_posting(keyword_id, user_id)
+        for keyword_id in old_ids - new_ids:
+            self._remove_posting(keyword_id, user_id)
+
+        self._store_keywords(user_id, new_ids)
+        bit = 1 << user_id
+        if new_ids:
+            self.catch_all &= ~bit
+        else:
+            self.catch_all |= bit
+
+    def user_keyword_ids(self, user_id):
+        start = self.keyword_start[user_id]
+        return self.keyword_data[start:start + self.keyword_count[user_id]]
+
+    def _store_keywords(self, user_id, keyword_ids):
+        """Запись номеров слов пользователя: на место прежнего отрезка, если влезают, иначе в конец"""
+        keyword_ids = sorted(keyword_ids)
+        count = self.keyword_count[user_id]
+        if len(keyword_ids) <= count:
+            start = self.keyword_start[user_id]
+            self.keyword_data[start:start + len(keyword_ids)] = array('I', keyword_ids)
+            self._garbage += count - len(keyword_ids)
+        else:
+            self.keyword_start[user_id] = len(self.keyword_data)
+            self.keyword_data.extend(keyword_ids)
+            self._garbage += count
+        self.keyword_count[user_id] = len(keyword_ids)
+        if self._garbage > 1024 and self._garbage * 2 > len(self.keyword_data):
+            self._compact()
+
+    def _compact(self):
+        data = array('I')
+        for user_id, count in enumerate(self.keyword_count):
+            start = self.keyword_start[user_id]
+            self.keyword_start[user_id] = len(data)
+            data.extend(self.keyword_data[start:start + count])
+        self.keyword_data = data
+        self._garbage = 0
+
+    def _set_flags(self, user_id, fields):
+        bit = 1 << user_id
+        for channel, flag in self.CHANNEL_FLAGS.items():
+            if flag not in fields:
+                continue
+            if fields[flag]:
+                self.platforms[channel] |= bit
+            else:
+                self.platforms[channel] &= ~bit
+
+    def decode(self, bitmap):
+        """chat_id по установленным битам карты: двоичная запись переводится в байты 0/1 для compress"""
+        flags = format(bitmap, 'b')[::-1].encode().translate(BITS_TO_FLAGS)
+        return set(compress(self.chat_ids, flags))
+
+    def recipients(self, channel, text):
+        members = self.platforms.get(channel)
+        if not members:
+            return set()
+        matched = self.catch_all
+        sparse = []
+        postings = self.postings
+        for keyword_id in self.matcher.match(text):
+            posting = postings[keyword_id]
+            if isinstance(posting, int):
+                matched |= posting
+            else:
+                sparse.extend(posting)
+        if sparse:
+            matched |= bitmap_of(sparse, len(self.chat_ids))
+        return self.decode(matched & members)
@@ -2,5 +2,7 @@ from .application_parser import ApplicationParser
 from .fl_parser import FlParser
 from .freelancer_parser import FreelancerParser
 from .kwork_parser import KworkParser
+from .ingestion_runtime import IngestionRuntime
+from .poll_scheduler import PollScheduler
 
-__all__ = ['ApplicationParser', 'FlParser', 'FreelancerParser', 'KworkParser']
+__all__ = ['ApplicationParser', 'FlParser', 'FreelancerParser', 'KworkParser', 'IngestionRuntime', 'PollScheduler']
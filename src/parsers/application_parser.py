@@ -1,6 +1,7 @@
 from .fl_parser import FlParser
 from .kwork_parser import KworkParser
 from .freelancer_parser import FreelancerParser
+from ..metrics import MetricsFlusher
 
 import time
 from multiprocessing import Process, Event
@@ -43,6 +44,8 @@ class ApplicationParser:
 
     def _run_parser(self, parser_class, redis_client):
         """Внутренний метод для запуска парсера"""
+        # Метрики дочернего процесса собирает экспортёр в процессе бота через Redis
+        MetricsFlusher(redis_client, parser_class.__name__).start()
         parser = parser_class(redis_client)
         while not self.shutdown_event.is_set():
             try:
@@ -0,0 +1,173 @@
+import time
+import psutil
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+
+class BrowserSession:
+    """Долгоживущий headless Chrome, переиспользуемый между опросами.
+
+    Драйвер создаётся один раз и проверяется перед каждым использованием.
+    Картинки, шрифты и стили не загружаются. Браузер пересоздаётся после
+    max_pages страниц или при превышении max_rss_mb памяти дерева процессов.
+    """
+
+    # Параллельная загрузка страниц через fetch() внутри уже открытой вкладки:
+    # запросы идут с теми же cookies и без отдельного браузера на каждую страницу
+    FETCH_MANY_SCRIPT = '''
+        const urls = arguments[0];
+        const done = arguments[arguments.length - 1];
+        Promise.all(urls.map(url =>
+            fetch(url, {credentials: 'include'}).then(r => r.text()).catch(() => '')
+        )).then(done);
+    '''
+
+    BLOCKED_URLS = [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css'
+    ]
+
+    def __init__(self, max_pages: int = 50, max_rss_mb: int = 600, page_load_timeout: int = 30):
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.page_load_timeout = page_load_timeout
+
+        self.driver = None
+        self.pages = 0
+        self.restarts = 0
+        self.peak_rss_mb = 0.0
+        self.last_fetch_seconds = 0.0
+
+    @staticmethod
+    def build_options():
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.stylesheets": 2
+        })
+        chrome_options.page_load_strategy = 'eager'
+        return chrome_options
+
+    def _start(self):
+        driver = webdriver.Chrome(options=self.build_options())
+        driver.set_page_load_timeout(self.page_load_timeout)
+        driver.set_script_timeout(self.page_load_timeout)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.BLOCKED_URLS})
+        except Exception as e:
+            print('Не удалось включить блокировку ресурсов в браузере:', e)
+        self.driver = driver
+        self.pages = 0
+        self.restarts += 1
+
+    def _process_tree(self):
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None) if service else None
+        if process is None:
+            return []
+        try:
+            root = psutil.Process(process.pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def rss_mb(self):
+        total = 0
+        for proc in self._process_tree():
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def is_healthy(self):
+        if self.driver is None:
+            return False
+        try:
+            return self.driver.execute_script('return 1;') == 1
+        except Exception:
+            return False
+
+    def quit(self):
+        if self.driver is None:
+            return
+        processes = self._process_tree()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print('Ошибка при закрытии браузера:', e)
+        # Добиваем chromedriver и дочерние процессы Chrome, если quit не справился
+        for proc in processes:
+            try:
+                if proc.is_running():
+                    proc.kill()
+            except psutil.Error:
+                continue
+        psutil.wait_procs(processes, timeout=3)
+        self.driver = None
+
+    def _ensure_driver(self):
+        if self.driver is not None and self.pages >= self.max_pages:
+            print(f'Браузер обработал {self.pages} страниц, перезапуск')
+            self.quit()
+        elif self.driver is not None and not self.is_healthy():
+            print('Браузер не отвечает, перезапуск')
+            self.quit()
+
+        if self.driver is None:
+            self._start()
+        return self.driver
+
+    def fetch(self, url: str, scroll: bool = True):
+        started = time.perf_counter()
+        for attempt in range(2):
+            driver = self._ensure_driver()
+            try:
+                driver.get(url)
+                if scroll:
+                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                html = driver.page_source
+                break
+            except WebDriverException as e:
+                self.quit()
+                if attempt:
+                    raise e
+                print('Ошибка браузера, повтор с новым драйвером:', e)
+
+        self.pages += 1
+        self.last_fetch_seconds = time.perf_counter() - started
+
+        rss = self.rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        if rss > self.max_rss_mb:
+            print(f'Браузер занимает {rss:.0f} МБ, перезапуск')
+            self.quit()
+        return html
+
+    def fetch_many(self, urls):
+        """HTML нескольких страниц одним пакетом; требует, чтобы вкладка уже была на том же сайте"""
+        if not urls:
+            return []
+        started = time.perf_counter()
+        driver = self._ensure_driver()
+        if not driver.current_url.startswith('http'):
+            # Браузер только что перезапущен: контекста сайта нет, загружаем по одной
+            return [self.fetch(url) for url in urls]
+        try:
+            pages = driver.execute_async_script(self.FETCH_MANY_SCRIPT, list(urls))
+        except WebDriverException as e:
+            print('Ошибка пакетной загрузки страниц:', e)
+            self.quit()
+            return ['' for _ in urls]
+
+        self.pages += len(urls)
+        self.last_fetch_seconds = time.perf_counter() - started
+        return pages
@@ -1,19 +1,27 @@
 import os
 import time
 import threading
-import json
 import redis
 import re
 import requests
 import feedparser
 from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
+from datetime import timezone
 from email.utils import parsedate_to_datetime
 
+from .ingestion_cursor import IngestionCursor
+from .poll_scheduler import PollScheduler
+from .seen_store import SeenStore
+from ..events import ProjectPublisher
+from ..metrics import METRICS
+from ..models import Project, Budget
+
+
 class FlParser:
     URL = None
+    TIMEOUT = (5, 20)
 
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, start: bool = True):
         self.redis_client = redis_client
         self.update_event = threading.Event()
 
@@ -22,36 +30,97 @@ class FlParser:
         if not FlParser.URL:
             raise ValueError("FL_URL не задан в переменных окружения!")
 
-        listener = threading.Thread(
-            target=self._listen_for_updates,
-            name="RedisListener",
-            daemon=True
-        )
-        listener.start()
+        self.cursor = IngestionCursor(redis_client, 'fl', initial_window=int(os.getenv('CURSOR_INITIAL_WINDOW', 300)))
+        self.seen = SeenStore(redis_client, 'fl', ttl=int(os.getenv('SEEN_TTL', 86400)))
+        self.publisher = ProjectPublisher(redis_client)
+        self.schedule = PollScheduler.from_env('fl')
+        self.session = self.create_session()
+        self.etag = None
+        self.last_modified = None
+        # Валидаторы последнего ответа 200; сохраняются только после обработки ленты
+        self._pending_validators = None
 
-        self.run()
+        # start=False — парсер управляется снаружи (IngestionRuntime)
+        if start:
+            listener = threading.Thread(
+                target=self._listen_for_updates,
+                name="RedisListener",
+                daemon=True
+            )
+            listener.start()
 
-    @classmethod
-    def fetch_rss_feed(cls):
-        headers = {
+            self.run()
+
+    @staticmethod
+    def create_session():
+        session = requests.Session()
+        session.headers.update({
             'User-Agent': (
                 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
                 'AppleWebKit/537.36 (KHTML, like Gecko) '
                 'Chrome/115.0.0.0 Safari/537.36'
-            )
-        }
+            ),
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        return session
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def handle_response(self, status, headers, content):
+        self._pending_validators = None
+        if status == 304:
+            METRICS.inc('fl_not_modified_total', source='fl')
+            return None
+        if status != 200:
+            print(f'Ошибка запроса: {status}')
+            return None
+
+        self._pending_validators = (headers.get('ETag'), headers.get('Last-Modified'))
+        METRICS.inc('bytes_downloaded_total', int(headers.get('Content-Length') or len(content)), source='fl')
+        return content
+
+    def commit_validators(self):
+        """ETag и Last-Modified запоминаются, когда лента разобрана и опубликована:
+        иначе следующий опрос получил бы 304 и необработанные элементы пропали бы"""
+        if self._pending_validators is None:
+            return
+        self.etag, self.last_modified = self._pending_validators
+        self._pending_validators = None
+
+    def fetch_rss_feed(self):
+        """Сырые байты RSS; None, если лента не изменилась (304) или запрос не удался"""
+        try:
+            with METRICS.timer('fetch_seconds', source='fl'):
+                response = self.session.get(self.URL, headers=self.conditional_headers(), timeout=self.TIMEOUT)
+        except Exception as e:
+            print('Ошибка запроса:', e)
+            return None
+        return self.handle_response(response.status_code, response.headers, response.content)
+
+    async def fetch_rss_feed_async(self, http):
+        headers = dict(self.session.headers)
+        headers.update(self.conditional_headers())
         try:
-            response = requests.get(cls.URL, headers=headers)
-            if response.status_code == 200:
-                feed = feedparser.parse(response.content)
-                return feed
-            else:
-                print(f'Ошибка запроса: {response.status_code}')
-                return None
+            with METRICS.timer('fetch_seconds', source='fl'):
+                async with http.get(self.URL, headers=headers) as response:
+                    content = await response.read()
+            return self.handle_response(response.status, response.headers, content)
         except Exception as e:
             print('Ошибка запроса:', e)
             return None
 
+    @classmethod
+    def parse_rss(cls, content):
+        """Разбор RSS в структуру ленты; без состояния, поэтому может выполняться в пуле процессов"""
+        return cls.get_structured_feed(feedparser.parse(content))
+
     @staticmethod
     def get_structured_feed(feed):
         if not feed or not feed.entries:
@@ -84,28 +153,34 @@ class FlParser:
         }
 
     @staticmethod
-    def filter_recent_items(data, minutes=5):
-        recent_items = []
-        now = datetime.now(timezone.utc)
-        
+    def parse_pub_date(pub_date_str):
+        if not pub_date_str:
+            return None
+        try:
+            pub_dt = parsedate_to_datetime(pub_date_str)
+            if pub_dt.tzinfo is None:
+                pub_dt = pub_dt.replace(tzinfo=timezone.utc)
+            return pub_dt.timestamp()
+        except Exception as e:
+            print(f'Ошибка преобразования даты {pub_date_str}:', e)
+            return None
+
+    @staticmethod
+    def item_id(item):
+        return item.get('guid') or item.get('link')
+
+    @classmethod
+    def filter_new_items(cls, data, cursor):
+        new_items = []
         for item in data.get('items', []):
-            pub_date_str = item.get('pubDate')
-            if not pub_date_str:
+            ts = cls.parse_pub_date(item.get('pubDate'))
+            if ts is None or not cls.item_id(item):
                 continue
-            try:
-                pub_dt = parsedate_to_datetime(pub_date_str)
-                if pub_dt.tzinfo is None:
-                    pub_dt = pub_dt.replace(tzinfo=timezone.utc)
-                else:
-                    pub_dt = pub_dt.astimezone(timezone.utc)
-            except Exception as e:
-                print(f'Ошибка преобразования даты {pub_date_str}:', e)
-                continue
-            
-            if now - pub_dt <= timedelta(minutes=minutes):
-                recent_items.append(item)
-        
-        data['items'] = recent_items
+            if cursor.is_new(ts, cls.item_id(item)):
+                item['timestamp'] = ts
+                new_items.append(item)
+
+        data['items'] = new_items
         return data
 
     @staticmethod
@@ -124,45 +199,60 @@ class FlParser:
                 print(f'Ошибка преобразования бюджета {num_str}:', e)
         return {'minimum': None, 'maximum': None, 'currency': None}
 
-    def publish_to_redis(self, message: dict, channel: str = 'fl_projects'):
-        self.redis_client.publish(channel, json.dumps(message))
+    def publish_to_redis(self, message: Project, channel: str = 'fl_projects'):
+        self.publisher.publish(channel, message)
 
     def fl_parser_run(self):
-        feed = self.fetch_rss_feed()
-        if not feed:
-            print('RSS лента не получена.')
-            return
+        content = self.fetch_rss_feed()
+        if content is None:
+            return 0
+
+        with METRICS.timer('parse_seconds', source='fl'):
+            structured_data = self.parse_rss(content)
+        new_items = self.process_feed(structured_data)
+        self.commit_validators()
+        return new_items
+
+    async def poll(self, runtime):
+        content = await self.fetch_rss_feed_async(runtime.http)
+        if content is None:
+            return 0
 
-        structured_data = self.get_structured_feed(feed)
-        recent_data = self.filter_recent_items(structured_data, minutes=5)
+        with METRICS.timer('parse_seconds', source='fl'):
+            structured_data = await runtime.run_cpu(self.parse_rss, content)
+        new_items = await runtime.run_io(self.process_feed, structured_data)
+        self.commit_validators()
+        return new_items
+
+    def build_message(self, item):
+        title = item.get('title')
+        description = item.get('description')
+        url = item.get('link')
+
+        budget = self.parse_budget(title)
+        if budget['minimum'] is None:
+            budget = self.parse_budget(description)
+
+        return Project('fl', self.item_id(item), title, description, url, Budget.from_dict(budget), item.get('timestamp'))
+
+    def process_feed(self, structured_data):
+        """Публикует новые элементы фида и возвращает их число"""
+        METRICS.inc('items_fetched_total', len(structured_data.get('items', [])) if structured_data else 0, source='fl')
+        recent_data = self.filter_new_items(structured_data, self.cursor)
         
+        new_ids = set()
         if recent_data and recent_data.get('items'):
-            for item in recent_data['items']:
-                project_id = item.get('guid') or item.get('link')
-                if not project_id:
-                    continue
-
-                redis_key = f'fl:{project_id}'
-                if self.redis_client.exists(redis_key):
-                    continue
-
-                title = item.get('title')
-                description = item.get('description')
-                url = item.get('link')
-
-                budget = self.parse_budget(title)
-                if budget['minimum'] is None:
-                    budget = self.parse_budget(description)
-                
-                message = {
-                    'id': project_id,
-                    'title': title,
-                    'description': description,
-                    'url': url,
-                    'budget': budget
-                }
-                self.publish_to_redis(message, channel='fl_projects')
-                self.redis_client.set(redis_key, '1', ex=360)
+            new_ids = set(self.seen.filter_new(self.item_id(item) for item in recent_data['items']))
+            messages = [self.build_message(item) for item in recent_data['items'] if self.item_id(item) in new_ids]
+            if messages:
+                self.publisher.publish_many('fl_projects', messages)
+            # Отметка только после публикации: при ошибке проекты возьмутся на следующем опросе
+            self.seen.mark(new_ids)
+
+            METRICS.inc('items_new_total', len(new_ids), source='fl')
+            METRICS.inc('items_duplicate_total', len(recent_data['items']) - len(new_ids), source='fl')
+            self.cursor.advance((item['timestamp'], self.item_id(item)) for item in recent_data['items'])
+        return len(new_ids)
 
     def _listen_for_updates(self):
         pubsub = self.redis_client.pubsub()
@@ -174,12 +264,18 @@ class FlParser:
 
     def run(self):
         while True:
-            triggered = self.update_event.wait(timeout=300)
-            if triggered:
-                self.update_event.clear()
-
+            new_items = 0
             try:
-                self.fl_parser_run()
+                new_items = self.fl_parser_run()
             except Exception as e:
                 print('Ошибка запроса:', e)
 
+            self.schedule.record(new_items)
+            self.schedule.log()
+            self.schedule.publish(self.redis_client)
+
+            triggered = self.update_event.wait(timeout=self.schedule.next_delay())
+            if triggered:
+                self.update_event.clear()
+                time.sleep(self.schedule.budget_delay())
+
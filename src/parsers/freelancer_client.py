@@ -0,0 +1,83 @@
+import math
+
+from freelancersdk.session import Session
+from freelancersdk.resources.projects.projects import search_projects
+from freelancersdk.resources.projects.exceptions import ProjectsNotFoundException
+from freelancersdk.resources.projects.helpers import create_search_projects_filter
+
+
+class FreelancerClient:
+    """Инкрементальный клиент API Freelancer.com поверх одной SDK-сессии.
+
+    Сессия (и keep-alive соединение requests под ней) создаётся один раз.
+    Запрашиваются только проекты, обновлённые после отметки курсора (from_time);
+    если всплеск не помещается в одну страницу, страницы дочитываются по offset,
+    пока API не вернёт всё до total_count или не закончится лимит max_pages.
+    Детали проекта и пользователя не запрашиваются, compact убирает пустые поля —
+    в ответе остаются id, title, описание, seo_url, бюджет, валюта и submitdate.
+    """
+
+    def __init__(self, oauth_token: str, url: str, page_size: int = 50, max_pages: int = 10):
+        self.session = Session(oauth_token=oauth_token, url=url)
+        self.session.session.hooks['response'].append(self._count_response)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.stats = {
+            'requests': 0,
+            'bytes_downloaded': 0,
+            'projects': 0
+        }
+
+    def _count_response(self, response, *args, **kwargs):
+        self.stats['requests'] += 1
+        self.stats['bytes_downloaded'] += len(response.content)
+
+    def search_page(self, from_time: float, offset: int):
+        search_filter = create_search_projects_filter(
+            sort_field='time_updated',
+            or_search_query=False,
+            from_time=math.floor(from_time)
+        )
+        search_filter['compact'] = 'true'
+        return search_projects(
+            self.session,
+            query='',
+            search_filter=search_filter,
+            limit=self.page_size,
+            offset=offset,
+            active_only=True
+        )
+
+    def fetch_since(self, from_time: float):
+        """Все проекты, обновлённые не раньше from_time; None, если API вернул ошибку"""
+        projects = []
+        offset = 0
+        for _ in range(self.max_pages):
+            try:
+                result = self.search_page(from_time, offset)
+            except ProjectsNotFoundException as e:
+                print(f'Error message: {e.message}')
+                print(f'Server response: {e.error_code}')
+                # Частичный всплеск не отдаём: курсор не должен перескочить недочитанные страницы
+                return None
+
+            page = result.get('projects') or []
+            projects.extend(page)
+            offset += len(page)
+            total = result.get('total_count') or 0
+            if len(page) < self.page_size or offset >= total:
+                break
+        else:
+            print(f'Freelancer: всплеск больше {self.max_pages} страниц по {self.page_size}, увеличьте FLN_MAX_PAGES')
+
+        self.stats['projects'] += len(projects)
+        return {'projects': projects}
+
+    def log_stats(self):
+        print(
+            f"API Freelancer: запросов {self.stats['requests']}, "
+            f"загружено {self.stats['bytes_downloaded']} байт, проектов {self.stats['projects']}"
+        )
+
+    def close(self):
+        self.session.session.close()
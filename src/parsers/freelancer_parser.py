@@ -1,20 +1,22 @@
 import os
 import time
 import threading
-import json
 import redis
 from dotenv import load_dotenv
 
-from freelancersdk.session import Session
-from freelancersdk.resources.projects.projects import search_projects
-from freelancersdk.resources.projects.exceptions import ProjectsNotFoundException
-from freelancersdk.resources.projects.helpers import create_search_projects_filter
+from .freelancer_client import FreelancerClient
+from .ingestion_cursor import IngestionCursor
+from .poll_scheduler import PollScheduler
+from .seen_store import SeenStore
+from ..events import ProjectPublisher
+from ..metrics import METRICS
+from ..models import Project, Budget
 
 
 class FreelancerParser:
     URL = None
 
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, start: bool = True):
         self.redis_client = redis_client
         self.update_event = threading.Event()
 
@@ -25,95 +27,102 @@ class FreelancerParser:
         self.oauth_token = os.getenv('FLN_OAUTH_TOKEN')
         if not self.oauth_token:
             raise ValueError("FLN_OAUTH_TOKEN не задана в переменных окружения!")
-
-        listener = threading.Thread(
-            target=self._listen_for_updates,
-            name="RedisListener",
-            daemon=True
+        self.cursor = IngestionCursor(redis_client, 'freelancer', initial_window=int(os.getenv('CURSOR_INITIAL_WINDOW', 300)))
+        self.seen = SeenStore(redis_client, 'freelancer', ttl=int(os.getenv('SEEN_TTL', 86400)))
+        self.publisher = ProjectPublisher(redis_client)
+        self.schedule = PollScheduler.from_env('freelancer')
+        self.client = FreelancerClient(
+            self.oauth_token,
+            self.URL,
+            page_size=int(os.getenv('FLN_PAGE_SIZE', 50)),
+            max_pages=int(os.getenv('FLN_MAX_PAGES', 10))
         )
-        listener.start()
 
-        self.run()
+        # start=False — парсер управляется снаружи (IngestionRuntime)
+        if start:
+            listener = threading.Thread(
+                target=self._listen_for_updates,
+                name="RedisListener",
+                daemon=True
+            )
+            listener.start()
 
-    def get_projects(self):
-        session = Session(oauth_token=self.oauth_token, url=self.URL)
-        query = ''
-        search_filter = create_search_projects_filter(
-            sort_field='time_updated',
-            or_search_query=False,
-        )
+            self.run()
 
-        try:
-            p = search_projects(
-                session,
-                query=query,
-                search_filter=search_filter
-            )
-        except ProjectsNotFoundException as e:
-            print(f'Error message: {e.message}')
-            print(f'Server response: {e.error_code}')
-            return None
-        else:
-            return p
+    def get_projects(self):
+        # Проект, опубликованный после отметки курсора, обновлён не раньше неё
+        # JSON ответа разбирает SDK внутри запроса, поэтому parse_seconds для Freelancer не пишется
+        with METRICS.timer('fetch_seconds', source='freelancer'):
+            data = self.client.fetch_since(self.cursor.ts)
+        self.client.log_stats()
+        return data
+
+    @staticmethod
+    def filter_new_projects(projects, cursor):
+        new_projects = []
+        for project in projects:
+            project_time = project.get('submitdate')
+            if project_time and project.get('id') and cursor.is_new(project_time, project['id']):
+                new_projects.append(project)
+        return new_projects
 
-    def get_recent_projects(self, interval_seconds=360):
+    def get_new_projects(self):
         data = self.get_projects()
         if data is None:
             return []
-        recent_projects = []
-        now = time.time()
-
-        projects = data.get('projects', [])
-        for project in projects:
-            project_time = project.get('submitdate', 0)
-            if now - project_time <= interval_seconds:
-                recent_projects.append(project)
-        return recent_projects
+        METRICS.inc('items_fetched_total', len(data.get('projects', [])), source='freelancer')
+        return self.filter_new_projects(data.get('projects', []), self.cursor)
 
-    def publish_to_redis(self, message: dict, channel: str = 'freelancer_projects'):
-        self.redis_client.publish(channel, json.dumps(message))
+    def publish_to_redis(self, message: Project, channel: str = 'freelancer_projects'):
+        self.publisher.publish(channel, message)
 
     def freelancer_parser_run(self):
-        recent = self.get_recent_projects()
+        return self.process_projects(self.get_new_projects())
+
+    async def poll(self, runtime):
+        # freelancersdk синхронный, запрос выполняется в потоке
+        return await runtime.run_io(self.freelancer_parser_run)
+
+    def close(self):
+        self.client.close()
+
+    def build_message(self, project):
+        title = project.get('title')
+        description = project.get('description') or project.get('preview_description')
+        seo_url = project.get('seo_url')
+        if seo_url:
+            url = f'{self.URL}/projects/{seo_url}'
+        else:
+            url = project.get('url', '')
+
+        budget_obj = project.get('budget', {})
+        budget = {
+            'minimum': budget_obj.get('minimum'),
+            'maximum': budget_obj.get('maximum')
+        }
+        currency = project.get('currency')
+        if currency:
+            budget['currency'] = currency.get('sign')
+        else:
+            budget['currency'] = None
+
+        return Project('freelancer', project['id'], title, description, url, Budget.from_dict(budget), project.get('submitdate'))
+
+    def process_projects(self, recent):
+        """Публикует новые проекты и возвращает их число"""
+        new_ids = set()
         if recent:
-            for project in recent:
-                project_id = project.get('id')
-                if not project_id:
-                    continue
-
-                redis_key = f'freelancer:{project_id}'
-                if self.redis_client.exists(redis_key):
-                    continue
-
-                title = project.get('title')
-                description = project.get('description') or project.get('preview_description')
-                seo_url = project.get('seo_url')
-                if seo_url:
-                    url = f'{self.URL}/projects/{seo_url}'
-                else:
-                    url = project.get('url', '')
-
-                budget_obj = project.get('budget', {})
-                budget = {
-                    'minimum': budget_obj.get('minimum'),
-                    'maximum': budget_obj.get('maximum')
-                }
-                currency = project.get('currency')
-                if currency:
-                    budget['currency'] = currency.get('sign')
-                else:
-                    budget['currency'] = None
-
-                message = {
-                    'id': project_id,
-                    'title': title,
-                    'description': description,
-                    'url': url,
-                    'budget': budget
-                }
-
-                self.publish_to_redis(message, channel='freelancer_projects')
-                self.redis_client.set(redis_key, '1', ex=360)
+            new_ids = set(self.seen.filter_new(project['id'] for project in recent))
+            messages = [self.build_message(project) for project in recent if project['id'] in new_ids]
+            if messages:
+                self.publisher.publish_many('freelancer_projects', messages)
+            # Отметка только после публикации: при ошибке проекты возьмутся на следующем опросе
+            self.seen.mark(new_ids)
+
+            METRICS.inc('items_new_total', len(new_ids), source='freelancer')
+            METRICS.inc('items_duplicate_total', len(recent) - len(new_ids), source='freelancer')
+            self.cursor.advance((project['submitdate'], project['id']) for project in recent)
+        return len(new_ids)
 
     def _listen_for_updates(self):
         pubsub = self.redis_client.pubsub()
@@ -125,11 +134,17 @@ class FreelancerParser:
 
     def run(self):
         while True:
-            triggered = self.update_event.wait(timeout=300)
-            if triggered:
-                self.update_event.clear()
-
+            new_items = 0
             try:
-                self.freelancer_parser_run()
+                new_items = self.freelancer_parser_run()
             except Exception as e:
                 print('Ошибка запроса:', e)
+
+            self.schedule.record(new_items)
+            self.schedule.log()
+            self.schedule.publish(self.redis_client)
+
+            triggered = self.update_event.wait(timeout=self.schedule.next_delay())
+            if triggered:
+                self.update_event.clear()
+                time.sleep(self.schedule.budget_delay())
@@ -0,0 +1,60 @@
+import json
+import time
+
+from ..metrics import METRICS
+
+
+class IngestionCursor:
+    """Отметка последнего обработанного элемента источника, хранящаяся в Redis.
+
+    Отметка — время публикации последнего элемента и id всех элементов с этим
+    же временем (чтобы не потерять и не повторить элементы с одинаковой датой).
+    Новым считается всё, что опубликовано позже отметки, сколько бы времени
+    ни прошло с прошлого опроса.
+    """
+
+    KEY = 'cursor:{source}'
+
+    def __init__(self, redis_client, source: str, initial_window: int = 300):
+        self.redis_client = redis_client
+        self.source = source
+        self.key = self.KEY.format(source=source)
+        self.initial_window = initial_window
+        self.ts = None
+        self.ids = set()
+        self.load()
+
+    def load(self):
+        data = self.redis_client.hgetall(self.key)
+        METRICS.inc('redis_roundtrips_total', component='cursor')
+        if data:
+            self.ts = float(data[b'ts'])
+            self.ids = set(json.loads(data.get(b'ids', b'[]')))
+        else:
+            # Первый запуск: берём только то, что появилось за последние initial_window секунд
+            self.ts = time.time() - self.initial_window
+            self.ids = set()
+
+    def is_new(self, ts: float, item_id) -> bool:
+        if ts > self.ts:
+            return True
+        return ts == self.ts and str(item_id) not in self.ids
+
+    def reached(self, ts: float) -> bool:
+        """Элемент с таким временем уже не новее отметки — дальше в прошлое идти незачем"""
+        return ts <= self.ts
+
+    def advance(self, items):
+        """Сдвиг отметки по обработанным элементам: items — пары (ts, id)"""
+        ts, ids = self.ts, set(self.ids)
+        for item_ts, item_id in items:
+            if item_ts > ts:
+                ts, ids = item_ts, {str(item_id)}
+            elif item_ts == ts:
+                ids.add(str(item_id))
+
+        if ts == self.ts and ids == self.ids:
+            return
+        self.ts, self.ids = ts, ids
+        self.redis_client.hset(self.key, mapping={'ts': repr(ts), 'ids': json.dumps(sorted(ids))})
+        METRICS.inc('redis_roundtrips_total', component='cursor')
@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+
+from .fl_parser import FlParser
+from .kwork_parser import KworkParser
+from .freelancer_parser import FreelancerParser
+
+
+class IngestionRuntime:
+    """Сбор проектов со всех источников корутинами в одном event loop.
+
+    Источник — любой класс, который создаётся как factory(redis_client, start=False)
+    и реализует async poll(runtime), возвращающий число новых проектов; необязательный
+    close() вызывается при остановке, а атрибут schedule (PollScheduler) задаёт
+    адаптивный интервал опроса вместо фиксированного interval.
+    Внутри poll источник пользуется общими ресурсами среды:
+      - runtime.http — общая aiohttp-сессия;
+      - runtime.run_cpu(func, *args) — небольшой пул процессов для тяжёлого разбора;
+      - runtime.run_io(func, *args) — поток для синхронных клиентов (Redis, Selenium, SDK).
+    """
+
+    UPDATES_CHANNEL = 'data_updates'
+
+    def __init__(self, redis_client, redis_client_asyncio, sources=None, interval: int = 300, cpu_workers: int = 1):
+        self.redis_client = redis_client
+        self.redis_client_asyncio = redis_client_asyncio
+        self.source_factories = sources or [FlParser, KworkParser, FreelancerParser]
+        self.interval = interval
+        self.cpu_workers = cpu_workers
+
+        self.http = None
+        self.cpu_pool = None
+        self.sources = []
+        self._triggers = {}
+        self._tasks = []
+
+    async def run_cpu(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, func, *args)
+
+    async def run_io(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    def _create_sources(self):
+        sources = []
+        for factory in self.source_factories:
+            try:
+                sources.append(factory(self.redis_client, start=False))
+                print(f'Источник {factory.__name__} подключён')
+            except Exception as e:
+                print(f'Не удалось создать источник {factory.__name__}: {e}')
+        return sources
+
+    def _close_sources(self):
+        for source in self.sources:
+            close = getattr(source, 'close', None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                print(f'Ошибка при остановке источника {type(source).__name__}: {e}')
+
+    async def _listen_for_updates(self):
+        pubsub = self.redis_client_asyncio.pubsub()
+        await pubsub.subscribe(self.UPDATES_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    print('Получено сообщение data_updates — внеочередной опрос всех источников')
+                    for trigger in self._triggers.values():
+                        trigger.set()
+        finally:
+            try:
+                await pubsub.unsubscribe(self.UPDATES_CHANNEL)
+                await pubsub.close()
+            except Exception as e:
+                print(f'Ошибка закрытия pubsub: {e}')
+
+    async def _run_source(self, source):
+        name = type(source).__name__
+        trigger = self._triggers[name] = asyncio.Event()
+        # Источник без PollScheduler опрашивается с фиксированным интервалом
+        schedule = getattr(source, 'schedule', None)
+        while True:
+            new_items = 0
+            try:
+                new_items = await source.poll(self)
+            except Exception as e:
+                print(f'Ошибка источника {name}:', e)
+
+            delay = self.interval
+            if schedule is not None:
+                schedule.record(new_items)
+                schedule.log()
+                await self.run_io(schedule.publish, self.redis_client)
+                delay = schedule.next_delay()
+
+            try:
+                await asyncio.wait_for(trigger.wait(), timeout=delay)
+                if schedule is not None:
+                    await asyncio.sleep(schedule.budget_delay())
+            except asyncio.TimeoutError:
+                pass
+            trigger.clear()
+
+    async def run(self):
+        self.http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30, connect=5))
+        # forkserver: дочерние процессы не наследуют потоки и соединения event loop
+        self.cpu_pool = ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            mp_context=multiprocessing.get_context('forkserver')
+        )
+        try:
+            self.sources = await self.run_io(self._create_sources)
+            self._tasks = [asyncio.create_task(self._run_source(source)) for source in self.sources]
+            self._tasks.append(asyncio.create_task(self._listen_for_updates()))
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            print('Сбор проектов остановлен.')
+        finally:
+            await self.stop()
+            await self.run_io(self._close_sources)
+            await self.http.close()
+            self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
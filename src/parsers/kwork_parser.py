@@ -9,14 +9,22 @@ import feedparser
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
 from email.utils import parsedate_to_datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+
+from .browser_session import BrowserSession
+from .ingestion_cursor import IngestionCursor
+from .poll_scheduler import PollScheduler
+from .seen_store import SeenStore
+from ..events import ProjectPublisher
+from ..metrics import METRICS
+from ..models import Project, Budget
 
 
 class KworkParser:
     URL = None
+    MSK = timezone(timedelta(hours=3))
+    JSON_DECODER = json.JSONDecoder()
 
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, start: bool = True):
         self.redis_client = redis_client
         self.update_event = threading.Event()
 
@@ -25,45 +33,41 @@ class KworkParser:
         if not KworkParser.URL:
             raise ValueError("KWORK_URL не задана в переменных окружения!")
 
-        listener = threading.Thread(
-            target=self._listen_for_updates,
-            name="RedisListener",
-            daemon=True
+        self.browser = BrowserSession(
+            max_pages=int(os.getenv('KWORK_BROWSER_MAX_PAGES', 50)),
+            max_rss_mb=int(os.getenv('KWORK_BROWSER_MAX_RSS_MB', 600))
         )
-        listener.start()
-
-        self.run()
+        self.crawl_max_pages = int(os.getenv('KWORK_CRAWL_MAX_PAGES', 10))
+        self.crawl_concurrency = int(os.getenv('KWORK_CRAWL_CONCURRENCY', 3))
+        self.cursor = IngestionCursor(redis_client, 'kwork', initial_window=int(os.getenv('CURSOR_INITIAL_WINDOW', 300)))
+        self.seen = SeenStore(redis_client, 'kwork', ttl=int(os.getenv('SEEN_TTL', 86400)))
+        self.publisher = ProjectPublisher(redis_client)
+        self.schedule = PollScheduler.from_env('kwork')
+
+        # start=False — парсер управляется снаружи (IngestionRuntime)
+        if start:
+            listener = threading.Thread(
+                target=self._listen_for_updates,
+                name="RedisListener",
+                daemon=True
+            )
+            listener.start()
+
+            self.run()
+
+    def page_url(self, page=1):
+        return f"{self.URL}?a=1&view=0&page={page}"
 
     def fetch_page_html(self, page=1):
-        url = f"{self.URL}?a=1&view=0&page={page}"
-
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(url)
-
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-        html = driver.page_source
-        driver.quit()
-        return html
-
-    @staticmethod
-    def extract_json_object(text, start_index):
-        counter = 0
-        for i, char in enumerate(text[start_index:], start=start_index):
-            if char == '{':
-                counter += 1
-            elif char == '}':
-                counter -= 1
-                if counter == 0:
-                    return text[start_index:i+1]
-        return ""
-
-    def extract_projects_from_json(self, html):
+        with METRICS.timer('fetch_seconds', source='kwork'):
+            return self.browser.fetch(self.page_url(page))
+
+    def fetch_pages_html(self, pages):
+        with METRICS.timer('fetch_seconds', source='kwork'):
+            return self.browser.fetch_many([self.page_url(p) for p in pages])
+
+    @classmethod
+    def extract_projects_from_json(cls, html):
         key = '"wantsListData":'
         index = html.find(key)
         if index == -1:
@@ -75,13 +79,10 @@ class KworkParser:
             print("Не найдено начало JSON объекта после wantsListData.")
             return []
         
-        json_text = self.extract_json_object(html, start_index)
-        if not json_text:
-            print("Не удалось извлечь балансированный JSON.")
-            return []
-        
         try:
-            data = json.loads(json_text)
+            # raw_decode разбирает объект прямо с найденной позиции и сам находит его конец
+            with METRICS.timer('parse_seconds', source='kwork'):
+                data, _ = cls.JSON_DECODER.raw_decode(html, start_index)
         except json.JSONDecodeError as e:
             print("Ошибка при декодировании JSON:", e)
             return []
@@ -90,62 +91,103 @@ class KworkParser:
         projects = pagination.get("data", [])
         return projects
 
-    @staticmethod
-    def filter_recent_projects(projects, minutes=5):
-        recent_projects = []
-        now = datetime.now(timezone.utc)
-
+    @classmethod
+    def parse_project_date(cls, project):
+        date_str = project.get("date_create")
+        if not date_str:
+            return None
+        try:
+            dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+            return dt.replace(tzinfo=cls.MSK).timestamp()
+        except Exception as e:
+            print(f"Ошибка преобразования даты '{date_str}':", e)
+            return None
+
+    @classmethod
+    def filter_new_projects(cls, projects, cursor):
+        new_projects = []
+        for pr in projects:
+            ts = cls.parse_project_date(pr)
+            if ts is not None and pr.get("id") and cursor.is_new(ts, pr.get("id")):
+                pr["timestamp"] = ts
+                new_projects.append(pr)
+        return new_projects
+
+    @classmethod
+    def reached_cursor(cls, projects, cursor):
+        """Страница уже содержит проекты не новее отметки — дальше листать незачем"""
         for pr in projects:
-            date_str = pr.get("date_create")
-            if not date_str:
-                continue
-            try:
-                dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                dt = dt.replace(tzinfo=timezone(timedelta(hours=3)))
-            except Exception as e:
-                print(f"Ошибка преобразования даты '{date_str}':", e)
-                continue
-            
-            if now - dt <= timedelta(minutes=minutes):
-                recent_projects.append(pr)
-        return recent_projects
-
-    def publish_to_redis(self, message: dict, channel: str = "kwork_projects"):
-        self.redis_client.publish(channel, json.dumps(message))
+            ts = cls.parse_project_date(pr)
+            if ts is not None and cursor.reached(ts):
+                return True
+        return False
+
+    def crawl_projects(self, cursor):
+        """Проекты новее отметки со всех страниц ленты; страницы после первой грузятся пачками"""
+        page_projects = self.extract_projects_from_json(self.fetch_page_html(1))
+        collected = list(page_projects)
+        next_page = 2
+
+        while page_projects and not self.reached_cursor(page_projects, cursor) and next_page <= self.crawl_max_pages:
+            pages = list(range(next_page, min(next_page + self.crawl_concurrency, self.crawl_max_pages + 1)))
+            next_page = pages[-1] + 1
+            for html in self.fetch_pages_html(pages):
+                page_projects = self.extract_projects_from_json(html) if html else []
+                collected.extend(page_projects)
+                if not page_projects or self.reached_cursor(page_projects, cursor):
+                    break
+
+        METRICS.inc('items_fetched_total', len(collected), source='kwork')
+        unique = {}
+        for pr in self.filter_new_projects(collected, cursor):
+            unique.setdefault(pr["id"], pr)
+        return list(unique.values())
+
+    def publish_to_redis(self, message: Project, channel: str = "kwork_projects"):
+        self.publisher.publish(channel, message)
 
     def kwork_parser_run(self):
-        page = 1
-        html = self.fetch_page_html(page)
-        projects = self.extract_projects_from_json(html)
-        
-        if projects:
-            recent_projects = self.filter_recent_projects(projects, minutes=5)
-            if recent_projects:
-                for proj in recent_projects:
-                    project_id = proj.get("id")
-                    if not project_id:
-                        continue
-                    
-                    redis_key = f"kwork:{project_id}"
-                    if self.redis_client.exists(redis_key):
-                        continue
-
-                    budget = {
-                        "minimum": proj.get("priceLimit"),
-                        "maximum": proj.get("possiblePriceLimit"),
-                        "currency": "₽"
-                    }
-
-                    message = {
-                        "id": project_id,
-                        "title": proj.get("name"),
-                        "description": proj.get("description"),
-                        "url": f"{self.URL}/{project_id}",
-                        "budget": budget
-                    }
-
-                    self.publish_to_redis(message, channel="kwork_projects")
-                    self.redis_client.set(redis_key, "1", ex=360)
+        return self.process_projects(self.crawl_projects(self.cursor))
+
+    async def poll(self, runtime):
+        # Selenium синхронный: обход страниц выполняется в потоке, разбор JSON и так на C
+        return await runtime.run_io(self.kwork_parser_run)
+
+    def close(self):
+        self.browser.quit()
+
+    def build_message(self, proj):
+        budget = Budget.from_dict({
+            "minimum": proj.get("priceLimit"),
+            "maximum": proj.get("possiblePriceLimit"),
+            "currency": "₽"
+        })
+
+        return Project(
+            "kwork",
+            proj["id"],
+            proj.get("name"),
+            proj.get("description"),
+            f"{self.URL}/{proj['id']}",
+            budget,
+            proj.get("timestamp")
+        )
+
+    def process_projects(self, recent_projects):
+        """Публикует новые проекты и возвращает их число"""
+        new_ids = set()
+        if recent_projects:
+            new_ids = set(self.seen.filter_new(proj["id"] for proj in recent_projects))
+            messages = [self.build_message(proj) for proj in recent_projects if proj["id"] in new_ids]
+            if messages:
+                self.publisher.publish_many("kwork_projects", messages)
+            # Отметка только после публикации: при ошибке проекты возьмутся на следующем опросе
+            self.seen.mark(new_ids)
+
+            METRICS.inc('items_new_total', len(new_ids), source='kwork')
+            METRICS.inc('items_duplicate_total', len(recent_projects) - len(new_ids), source='kwork')
+            self.cursor.advance((proj["timestamp"], proj["id"]) for proj in recent_projects)
+        return len(new_ids)
 
     def _listen_for_updates(self):
         pubsub = self.redis_client.pubsub()
@@ -156,12 +198,21 @@ class KworkParser:
                 self.update_event.set()
 
     def run(self):
-        while True:
-            triggered = self.update_event.wait(timeout=300)
-            if triggered:
-                self.update_event.clear()
-
-            try:
-                self.kwork_parser_run()
-            except Exception as e:
-                print('Ошибка запроса:', e)
+        try:
+            while True:
+                new_items = 0
+                try:
+                    new_items = self.kwork_parser_run()
+                except Exception as e:
+                    print('Ошибка запроса:', e)
+
+                self.schedule.record(new_items)
+                self.schedule.log()
+                self.schedule.publish(self.redis_client)
+
+                triggered = self.update_event.wait(timeout=self.schedule.next_delay())
+                if triggered:
+                    self.update_event.clear()
+                    time.sleep(self.schedule.budget_delay())
+        finally:
+            self.browser.quit()
@@ -0,0 +1,141 @@
+import os
+import time
+from collections import deque
+
+from ..metrics import METRICS
+
+
+class PollScheduler:
+    """Адаптивный интервал опроса одного источника.
+
+    После каждого опроса обновляется EWMA скорости появления проектов —
+    новых проектов в секунду за фактически прошедший с прошлого опроса
+    интервал, так что внеочередные опросы по data_updates не искажают оценку.
+    Интервал подстраивается так, чтобы за опрос приходило около target_items
+    проектов: при потоке заказов он сокращается, при простое растёт в backoff
+    раз, оставаясь в пределах [min_interval, max_interval]. Сверху действует
+    бюджет запросов к источнику: не больше max_requests_per_hour за скользящий час,
+    в том числе для внеочередных опросов по data_updates.
+
+    Текущее состояние публикуется в Redis-хэш poll:{source} (см. /polling).
+    """
+
+    KEY = 'poll:{source}'
+    SOURCES_KEY = 'poll:sources'
+
+    def __init__(self, source: str, min_interval: float = 30, max_interval: float = 600,
+                 max_requests_per_hour: int = 60, target_items: float = 1.0,
+                 alpha: float = 0.3, backoff: float = 1.5, initial_interval: float = 300):
+        if min_interval > max_interval:
+            raise ValueError(f'Для {source}: min_interval больше max_interval')
+        self.source = source
+        self.key = self.KEY.format(source=source)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_requests_per_hour = max_requests_per_hour
+        self.target_items = target_items
+        self.alpha = alpha
+        self.backoff = backoff
+
+        self.interval = self._clamp(initial_interval)
+        self.ewma_rate = None        # новых проектов в секунду
+        self.last_items = 0
+        self.last_elapsed = None
+        self._last_poll = None
+        self.polls = 0
+        self._requests = deque()
+
+    @classmethod
+    def from_env(cls, source: str):
+        """Настройки POLL_* с возможностью переопределить их для источника: POLL_FL_MIN_INTERVAL и т.п."""
+        def setting(name, default):
+            value = os.getenv(f'POLL_{source.upper()}_{name}') or os.getenv(f'POLL_{name}')
+            return float(value) if value else default
+
+        return cls(
+            source,
+            min_interval=setting('MIN_INTERVAL', 30),
+            max_interval=setting('MAX_INTERVAL', 600),
+            max_requests_per_hour=int(setting('MAX_REQUESTS_PER_HOUR', 60)),
+            target_items=setting('TARGET_ITEMS', 1.0)
+        )
+
+    def _clamp(self, interval: float) -> float:
+        # Бюджет задаёт нижнюю границу среднего интервала
+        floor = max(self.min_interval, 3600 / self.max_requests_per_hour)
+        return min(self.max_interval, max(floor, interval))
+
+    @property
+    def rate_per_hour(self) -> float:
+        """Наблюдаемая скорость появления проектов"""
+        if self.ewma_rate is None:
+            return 0.0
+        return self.ewma_rate * 3600
+
+    def _expire_requests(self, now: float):
+        while self._requests and self._requests[0] <= now - 3600:
+            self._requests.popleft()
+
+    def budget_delay(self) -> float:
+        """Сколько секунд ждать, прежде чем бюджет позволит следующий запрос"""
+        now = time.monotonic()
+        self._expire_requests(now)
+        if len(self._requests) < self.max_requests_per_hour:
+            return 0.0
+        return self._requests[0] + 3600 - now
+
+    def record(self, new_items: int):
+        """Учесть завершённый опрос и пересчитать интервал"""
+        now = time.monotonic()
+        self._requests.append(now)
+        self.polls += 1
+        self.last_items = new_items or 0
+        # Первый опрос собирает проекты за неизвестный срок, считаем его за текущий интервал
+        elapsed = self.interval if self._last_poll is None else now - self._last_poll
+        self._last_poll = now
+        self.last_elapsed = max(elapsed, 1.0)
+
+        rate = self.last_items / self.last_elapsed
+        if self.ewma_rate is None:
+            self.ewma_rate = rate
+        else:
+            self.ewma_rate = self.alpha * rate + (1 - self.alpha) * self.ewma_rate
+
+        # Сокращаем интервал сразу, а увеличиваем не быстрее чем в backoff раз за опрос
+        if self.ewma_rate * self.interval < 0.05:
+            interval = self.interval * self.backoff
+        else:
+            interval = min(self.interval * self.backoff, self.target_items / self.ewma_rate)
+        self.interval = self._clamp(interval)
+
+    def next_delay(self) -> float:
+        return max(self.interval, self.budget_delay())
+
+    def snapshot(self) -> dict:
+        self._expire_requests(time.monotonic())
+        return {
+            'interval': round(self.interval, 1),
+            'rate_per_hour': round(self.rate_per_hour, 2),
+            'last_items': self.last_items,
+            'last_elapsed': round(self.last_elapsed or 0.0, 1),
+            'polls': self.polls,
+            'requests_last_hour': len(self._requests),
+            'max_requests_per_hour': self.max_requests_per_hour,
+            'updated_at': int(time.time())
+        }
+
+    def log(self):
+        print(
+            f'Опрос {self.source}: новых {self.last_items} за {self.last_elapsed:.0f} с, '
+            f'~{self.rate_per_hour:.1f} проектов/ч, следующий через {self.interval:.0f} с'
+        )
+
+    def publish(self, redis_client):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(self.key, mapping=self.snapshot())
+            pipe.sadd(self.SOURCES_KEY, self.source)
+            pipe.execute()
+            METRICS.inc('redis_roundtrips_total', component='poll_scheduler')
+        except Exception as e:
+            print(f'Не удалось сохранить состояние опроса {self.source}: {e}')
@@ -0,0 +1,79 @@
+import hashlib
+from collections import OrderedDict
+
+from ..metrics import METRICS
+
+
+class SeenStore:
+    """Общий для парсеров учёт уже опубликованных проектов.
+
+    Проверка целой пачки идентификаторов — один MGET, отметка — один конвейер
+    SET, и ставится она только после успешной публикации: если XADD/PUBLISH
+    упал, проекты снова считаются новыми на следующем опросе. Доставка —
+    «хотя бы один раз»: если упала сама отметка, проект опубликуется повторно.
+    Длинные идентификаторы (например, URL из RSS FL) хэшируются в ключи
+    фиксированной длины; перед Redis стоит локальный LRU недавно виденных ключей.
+    """
+
+    KEY = 'seen:{namespace}:{digest}'
+    MAX_PLAIN_ID_LENGTH = 24
+
+    def __init__(self, redis_client, namespace: str, ttl: int = 86400, local_size: int = 10000):
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local = OrderedDict()
+
+    def key(self, item_id) -> str:
+        item_id = str(item_id)
+        if len(item_id) > self.MAX_PLAIN_ID_LENGTH:
+            item_id = hashlib.blake2b(item_id.encode('utf-8'), digest_size=12).hexdigest()
+        return self.KEY.format(namespace=self.namespace, digest=item_id)
+
+    def _remember(self, key):
+        self._local[key] = True
+        self._local.move_to_end(key)
+        if len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def filter_new(self, ids):
+        """Идентификаторы, которых ещё не было; отметку после успешной публикации ставит mark"""
+        pending = []
+        seen_in_batch = set()
+        for item_id in ids:
+            key = self.key(item_id)
+            if key in self._local:
+                self._local.move_to_end(key)
+                continue
+            if key in seen_in_batch:
+                continue
+            seen_in_batch.add(key)
+            pending.append((item_id, key))
+
+        if not pending:
+            return []
+
+        values = self.redis_client.mget([key for _, key in pending])
+        METRICS.inc('redis_roundtrips_total', component='seen_store')
+
+        new_ids = []
+        for (item_id, key), value in zip(pending, values):
+            if value is None:
+                new_ids.append(item_id)
+            else:
+                self._remember(key)
+        return new_ids
+
+    def mark(self, ids):
+        """Отметка опубликованных id одним конвейером SET"""
+        keys = [self.key(item_id) for item_id in ids]
+        if not keys:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(key, '1', ex=self.ttl)
+        pipe.execute()
+        METRICS.inc('redis_roundtrips_total', component='seen_store')
+        for key in keys:
+            self._remember(key)
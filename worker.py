@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from os import getenv
+from dotenv import load_dotenv
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+
+from src import REDIS_CLIENT, REDIS_CLIENT_ASYNCIO
+from src import AsyncDatabase
+from src import NotificationService
+from src.notifications import ShardAssignment
+from src.events import ProjectConsumer
+from src.metrics import MetricsFlusher
+
+load_dotenv()
+TOKEN = getenv("BOT_TOKEN")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Воркер рассылки уведомлений для своей доли пользователей")
+    parser.add_argument("--shard", type=int, default=int(getenv("SHARD_ID", 0)), help="номер шарда этого воркера")
+    parser.add_argument("--shards", type=int, default=None, help="общее число шардов: задаёт его, если в Redis ещё нет значения, иначе должно с ним совпадать")
+    parser.add_argument("--rebalance", type=int, default=None, metavar="N", help="задать новое число шардов для всех воркеров и выйти")
+    return parser.parse_args()
+
+
+async def rebalance(redis_client, shard_count: int):
+    previous_count = int(await redis_client.get(ShardAssignment.KEY) or getenv("SHARD_COUNT", 1))
+    # Группы шардов, оставшиеся от прежнего уменьшения, хранят давнюю позицию —
+    # новые шарды должны создать их заново
+    consumer = ProjectConsumer(redis_client, [])
+    for shard_id in range(previous_count, shard_count):
+        await consumer.destroy_group(ShardAssignment(shard_id, shard_count).consumer_group(consumer.family))
+    # Отметки передачи пользователей воркеры запишут заново (ShardHandoff)
+    await redis_client.delete(ShardAssignment.HANDOFF_KEY)
+    await redis_client.set(ShardAssignment.PREVIOUS_KEY, previous_count)
+    await redis_client.set(ShardAssignment.KEY, shard_count)
+    await redis_client.publish(ShardAssignment.CHANNEL, shard_count)
+    logging.info(f"Число шардов изменено с {previous_count} на {shard_count}")
+
+
+async def main(args) -> None:
+    redis_client = REDIS_CLIENT_ASYNCIO
+
+    if args.rebalance is not None:
+        await rebalance(redis_client, args.rebalance)
+        return
+
+    if args.shards is not None:
+        # --shards только задаёт начальное значение; менять его у запущенных воркеров — дело --rebalance
+        await redis_client.set(ShardAssignment.KEY, args.shards, nx=True)
+    stored = await redis_client.get(ShardAssignment.KEY)
+    shard_count = int(stored or getenv("SHARD_COUNT", 1))
+    if args.shards is not None and args.shards != shard_count:
+        logging.error(
+            f"--shards {args.shards} не совпадает с числом шардов в Redis ({shard_count}); "
+            f"для изменения используйте --rebalance {args.shards}"
+        )
+        sys.exit(1)
+    shard = ShardAssignment(args.shard, shard_count)
+
+    bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    db = AsyncDatabase(redis_client)
+    await db.connect()
+
+    notification_service = NotificationService(redis_client, db, None, bot, shard=shard)
+    MetricsFlusher(REDIS_CLIENT, f"notifier-{shard.shard_id}").start()
+    listen_task = asyncio.create_task(notification_service.listen())
+
+    loop = asyncio.get_running_loop()
+    for signame in ('SIGINT', 'SIGTERM'):
+        loop.add_signal_handler(getattr(signal, signame), listen_task.cancel)
+
+    logging.info(f"Воркер уведомлений запущен, шард {shard}")
+    try:
+        await listen_task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await bot.session.close()
+        await db.disconnect()
+        logging.info("Воркер уведомлений остановлен")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stdout
+    )
+
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        logging.info("Завершение по Ctrl+C")